@@ -15,12 +15,13 @@ if (profilingOn):
 from pygyro.model.layout                        import LayoutSwapper, getLayoutHandler
 from pygyro.model.grid                          import Grid
 from pygyro.initialisation.setups               import setupCylindricalGrid, setupFromFile
-from pygyro.advection.advection                 import FluxSurfaceAdvection, VParallelAdvection, PoloidalAdvection, ParallelGradient
+from pygyro.advection.advection                 import FluxSurfaceAdvection, VParallelAdvection, PoloidalAdvection, ParallelGradient, set_num_threads
 from pygyro.poisson.poisson_solver              import DensityFinder, QuasiNeutralitySolver
 from pygyro.splines.splines                     import Spline2D
 from pygyro.splines.spline_interpolators        import SplineInterpolator2D
 from pygyro.utilities.savingTools               import setupSave
 from pygyro.diagnostics.diagnostic_collector    import DiagnosticCollector
+from pygyro.backends                            import active_backends
 
 loop_start = 0
 loop_time = 0
@@ -45,6 +46,9 @@ parser.add_argument('-f', dest='foldername',nargs=1,type=str,
 parser.add_argument('-s', dest='saveStep',nargs=1,type=int,
                     default=[5],
                    help='Number of time steps between writing output')
+parser.add_argument('-t', dest='nThreads',nargs=1,type=int,
+                    default=[None],
+                   help='Number of threads used by each process in the advection steps')
 
 def my_print(rank,*args,**kwargs):
     if (rank==0):
@@ -61,6 +65,9 @@ saveStepCut = saveStep-1
 
 tEnd = args.tEnd[0]
 
+if (args.nThreads[0] is not None):
+    set_num_threads(args.nThreads[0])
+
 stopTime = args.tMax[0]
 
 if (len(foldername)>0):
@@ -76,6 +83,8 @@ if (len(constantFile)==0):
 comm = MPI.COMM_WORLD
 rank = comm.Get_rank()
 
+my_print(rank,"backends:",active_backends())
+
 if (loadable):
     my_print(rank,"ready to setup from loadable")
     
@@ -135,10 +144,10 @@ remapperRho = getLayoutHandler( comm, layout_poisson, nprocs, distribFunc.eta_gr
 my_print(rank,"remappers done")
 
 phi = Grid(distribFunc.eta_grid[:3],distribFunc.getSpline(slice(0,3)),
-            remapperPhi,'mode_solve',comm,dtype=np.complex128)
+            remapperPhi,'mode_solve',comm,dtype=np.float64)
 my_print(rank,"phi done")
 rho = Grid(distribFunc.eta_grid[:3],distribFunc.getSpline(slice(0,3)),
-            remapperRho,'v_parallel_2d',comm,dtype=np.complex128)
+            remapperRho,'v_parallel_2d',comm,dtype=np.float64)
 my_print(rank,"rho done")
 
 density = DensityFinder(6,distribFunc.getSpline(3),distribFunc.eta_grid,constants)
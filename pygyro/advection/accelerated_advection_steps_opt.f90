@@ -5,17 +5,23 @@ use mod_initialiser_funcs, only: fEq
 use mod_spline_eval_funcs, only: &
   eval_spline_2d_cross , &
   eval_spline_2d_scalar, &
+  eval_spline_2d_multi , &
   eval_spline_1d_scalar, &
   eval_spline_1d_vector
 
 implicit none
 
 public :: &
+  poloidal_velocity, &
+  poloidal_advection_feet_rk, &
+  poloidal_advection_step_expl_core, &
   poloidal_advection_step_expl, &
+  poloidal_advection_step_impl_core, &
   poloidal_advection_step_impl, &
+  poloidal_advection_step_batch, &
   v_parallel_advection_eval_step, &
-  get_lagrange_vals, &
-  flux_advection
+  v_parallel_advection_eval_step_batch, &
+  set_num_threads
 
 private
 
@@ -23,7 +29,249 @@ private
 contains
 !++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
-pure subroutine poloidal_advection_step_expl(n0_f, n1_f, f, dt, v, n0_rPts, &
+subroutine poloidal_velocity(q, r, rMin, rMax, n0_kts1Phi, kts1Phi, &
+      deg1Phi, n0_kts2Phi, kts2Phi, deg2Phi, n0_coeffsPhi, n1_coeffsPhi, &
+      coeffsPhi, n0_ders, n1_ders, ders, n0_vel, vel)
+
+  implicit none
+  real(kind=8), intent(in)  :: q
+  real(kind=8), intent(in)  :: r
+  real(kind=8), intent(in)  :: rMin
+  real(kind=8), intent(in)  :: rMax
+  integer(kind=4), intent(in)  :: n0_kts1Phi
+  real(kind=8), intent(in)  :: kts1Phi (0:n0_kts1Phi - 1)
+  integer(kind=4), intent(in)  :: deg1Phi
+  integer(kind=4), intent(in)  :: n0_kts2Phi
+  real(kind=8), intent(in)  :: kts2Phi (0:n0_kts2Phi - 1)
+  integer(kind=4), intent(in)  :: deg2Phi
+  integer(kind=4), intent(in)  :: n0_coeffsPhi
+  integer(kind=4), intent(in)  :: n1_coeffsPhi
+  real(kind=8), intent(in)  :: coeffsPhi (0:n0_coeffsPhi - 1,0: &
+      n1_coeffsPhi - 1)
+  integer(kind=4), intent(in)  :: n0_ders
+  integer(kind=4), intent(in)  :: n1_ders
+  integer(kind=4), intent(in)  :: ders (0:n0_ders - 1,0:n1_ders - 1)
+  integer(kind=4), intent(in)  :: n0_vel
+  real(kind=8), intent(inout)  :: vel (0:n0_vel - 1)
+  real(kind=8) :: theta
+
+  !_______________________CommentBlock_______________________!
+  !                                                          !
+  !    Evaluate several derivatives of phi, divided by r, at !
+  !    a point of the poloidal plane. The span and the basis !
+  !    functions are only computed once for all the          !
+  !    derivatives. The advection is stopped outside the     !
+  !    domain so the derivatives are set to 0 if r is not in !
+  !    [rMin,rMax]                                           !
+  !                                                          !
+  !    Parameters                                            !
+  !    ----------                                            !
+  !    q: float                                              !
+  !        The theta coordinate of the point                 !
+  !                                                          !
+  !    r: float                                              !
+  !        The r coordinate of the point                     !
+  !                                                          !
+  !    ders: array_like                                      !
+  !        ders[k] contains the number of derivatives in the !
+  !        theta and r directions of the k-th derivative     !
+  !                                                          !
+  !    vel: array_like                                       !
+  !        Array in which the k-th derivative is stored in   !
+  !        vel[k]                                            !
+  !                                                          !
+  !__________________________________________________________!
+
+  if (r < rMin .or. r > rMax) then
+    vel = 0.0d0
+    return
+  end if
+
+  ! Handle theta boundary conditions
+  theta = q
+  do while (theta < 0)
+    theta = 2.0d0*3.14159265358979d0 + theta
+  end do
+  do while (theta > 2.0d0*3.14159265358979d0)
+    theta = -2.0d0*3.14159265358979d0 + theta
+  end do
+
+  call eval_spline_2d_multi(theta, r, kts1Phi, deg1Phi, kts2Phi, &
+      deg2Phi, coeffsPhi, ders, vel)
+  vel = vel/r
+
+end subroutine
+!==============================================================================
+
+!==============================================================================
+subroutine poloidal_advection_feet_rk(rkOrder, multFactor, n0_rPts, rPts, &
+      n0_qPts, qPts, n0_nPts, nPts, n0_drPhi_0, n1_drPhi_0, drPhi_0, &
+      n0_dthetaPhi_0, n1_dthetaPhi_0, dthetaPhi_0, n0_endPts_q, &
+      n1_endPts_q, endPts_q, n0_endPts_r, n1_endPts_r, endPts_r, &
+      n0_kts1Phi, kts1Phi, n0_kts2Phi, kts2Phi, n0_coeffsPhi, &
+      n1_coeffsPhi, coeffsPhi, deg1Phi, deg2Phi)
+
+  implicit none
+  integer(kind=4), intent(in)  :: rkOrder
+  real(kind=8), intent(in)  :: multFactor
+  integer(kind=4), intent(in)  :: n0_rPts
+  real(kind=8), intent(in)  :: rPts (0:n0_rPts - 1)
+  integer(kind=4), intent(in)  :: n0_qPts
+  real(kind=8), intent(in)  :: qPts (0:n0_qPts - 1)
+  integer(kind=4), intent(in)  :: n0_nPts
+  integer(kind=4), intent(in)  :: nPts (0:n0_nPts - 1)
+  integer(kind=4), intent(in)  :: n0_drPhi_0
+  integer(kind=4), intent(in)  :: n1_drPhi_0
+  real(kind=8), intent(in)  :: drPhi_0 (0:n0_drPhi_0 - 1,0:n1_drPhi_0 - &
+      1)
+  integer(kind=4), intent(in)  :: n0_dthetaPhi_0
+  integer(kind=4), intent(in)  :: n1_dthetaPhi_0
+  real(kind=8), intent(in)  :: dthetaPhi_0 (0:n0_dthetaPhi_0 - 1,0: &
+      n1_dthetaPhi_0 - 1)
+  integer(kind=4), intent(in)  :: n0_endPts_q
+  integer(kind=4), intent(in)  :: n1_endPts_q
+  real(kind=8), intent(inout)  :: endPts_q (0:n0_endPts_q - 1,0: &
+      n1_endPts_q - 1)
+  integer(kind=4), intent(in)  :: n0_endPts_r
+  integer(kind=4), intent(in)  :: n1_endPts_r
+  real(kind=8), intent(inout)  :: endPts_r (0:n0_endPts_r - 1,0: &
+      n1_endPts_r - 1)
+  integer(kind=4), intent(in)  :: n0_kts1Phi
+  real(kind=8), intent(in)  :: kts1Phi (0:n0_kts1Phi - 1)
+  integer(kind=4), intent(in)  :: n0_kts2Phi
+  real(kind=8), intent(in)  :: kts2Phi (0:n0_kts2Phi - 1)
+  integer(kind=4), intent(in)  :: n0_coeffsPhi
+  integer(kind=4), intent(in)  :: n1_coeffsPhi
+  real(kind=8), intent(in)  :: coeffsPhi (0:n0_coeffsPhi - 1,0: &
+      n1_coeffsPhi - 1)
+  integer(kind=4), intent(in)  :: deg1Phi
+  integer(kind=4), intent(in)  :: deg2Phi
+  integer(kind=4) :: idx
+  real(kind=8) :: rMin
+  real(kind=8) :: rMax
+  real(kind=8) :: q
+  real(kind=8) :: r
+  real(kind=8) :: k1_q
+  real(kind=8) :: k1_r
+  real(kind=8) :: k2_q
+  real(kind=8) :: k2_r
+  real(kind=8) :: k3_q
+  real(kind=8) :: k3_r
+  real(kind=8) :: k4_q
+  real(kind=8) :: k4_r
+  real(kind=8) :: vel (0:1)
+  integer(kind=4) :: ders (0:1,0:1)
+  integer(kind=4) :: j
+  integer(kind=4) :: i
+
+  !_______________________CommentBlock_______________________!
+  !                                                          !
+  !    Find the foot of the characteristic passing through   !
+  !    each node using the strong stability preserving RK3   !
+  !    method (rkOrder=3) or the classic RK4 method          !
+  !    (rkOrder=4). The first stage uses the derivatives of  !
+  !    phi at the nodes, divided by r, which are provided in !
+  !    drPhi_0 and dthetaPhi_0                               !
+  !                                                          !
+  !    Parameters                                            !
+  !    ----------                                            !
+  !    rkOrder: int                                          !
+  !        The order of the method                           !
+  !                                                          !
+  !    multFactor: float                                     !
+  !        The time-step divided by B0                       !
+  !                                                          !
+  !    endPts_q: array_like                                  !
+  !        The theta coordinate of the feet. The result will !
+  !        be stored here                                    !
+  !                                                          !
+  !    endPts_r: array_like                                  !
+  !        The r coordinate of the feet. The result will be  !
+  !        stored here                                       !
+  !                                                          !
+  !__________________________________________________________!
+
+  idx = nPts(1) - 1
+  rMin = rPts(0)
+  rMax = rPts(idx)
+
+  ! The derivatives (0,1) and (1,0) of phi are evaluated together
+  ders = reshape([0, 1, 1, 0], [2, 2])
+
+  !$omp parallel do private(j, q, r, k1_q, k1_r, k2_q, k2_r, k3_q, k3_r, &
+  !$omp& k4_q, k4_r, vel)
+  do i = 0, nPts(0) - 1, 1
+    do j = 0, nPts(1) - 1, 1
+      k1_q = -drPhi_0(j, i)*multFactor
+      k1_r = dthetaPhi_0(j, i)*multFactor
+
+      if (rkOrder == 3) then
+        ! x' = x^n + k1
+        q = qPts(i) + k1_q
+        r = rPts(j) + k1_r
+        call poloidal_velocity(q, r, rMin, rMax, n0_kts1Phi, kts1Phi, &
+      deg1Phi, n0_kts2Phi, kts2Phi, deg2Phi, n0_coeffsPhi, n1_coeffsPhi, &
+      coeffsPhi, 2, 2, ders, 2, vel)
+        k2_q = -vel(0)*multFactor
+        k2_r = vel(1)*multFactor
+
+        ! x'' = x^n + 0.25*( k1 + k2 )
+        q = qPts(i) + 0.25d0*(k1_q + k2_q)
+        r = rPts(j) + 0.25d0*(k1_r + k2_r)
+        call poloidal_velocity(q, r, rMin, rMax, n0_kts1Phi, kts1Phi, &
+      deg1Phi, n0_kts2Phi, kts2Phi, deg2Phi, n0_coeffsPhi, n1_coeffsPhi, &
+      coeffsPhi, 2, 2, ders, 2, vel)
+        k3_q = -vel(0)*multFactor
+        k3_r = vel(1)*multFactor
+
+        ! x^{n+1} = x^n + ( k1 + k2 + 4*k3 )/6
+        endPts_q(j, i) = qPts(i) + (k1_q + k2_q + 4.0d0*k3_q)/6.0d0
+        endPts_r(j, i) = rPts(j) + (k1_r + k2_r + 4.0d0*k3_r)/6.0d0
+      else
+        ! x' = x^n + 0.5*k1
+        q = qPts(i) + 0.5d0*k1_q
+        r = rPts(j) + 0.5d0*k1_r
+        call poloidal_velocity(q, r, rMin, rMax, n0_kts1Phi, kts1Phi, &
+      deg1Phi, n0_kts2Phi, kts2Phi, deg2Phi, n0_coeffsPhi, n1_coeffsPhi, &
+      coeffsPhi, 2, 2, ders, 2, vel)
+        k2_q = -vel(0)*multFactor
+        k2_r = vel(1)*multFactor
+
+        ! x'' = x^n + 0.5*k2
+        q = qPts(i) + 0.5d0*k2_q
+        r = rPts(j) + 0.5d0*k2_r
+        call poloidal_velocity(q, r, rMin, rMax, n0_kts1Phi, kts1Phi, &
+      deg1Phi, n0_kts2Phi, kts2Phi, deg2Phi, n0_coeffsPhi, n1_coeffsPhi, &
+      coeffsPhi, 2, 2, ders, 2, vel)
+        k3_q = -vel(0)*multFactor
+        k3_r = vel(1)*multFactor
+
+        ! x''' = x^n + k3
+        q = qPts(i) + k3_q
+        r = rPts(j) + k3_r
+        call poloidal_velocity(q, r, rMin, rMax, n0_kts1Phi, kts1Phi, &
+      deg1Phi, n0_kts2Phi, kts2Phi, deg2Phi, n0_coeffsPhi, n1_coeffsPhi, &
+      coeffsPhi, 2, 2, ders, 2, vel)
+        k4_q = -vel(0)*multFactor
+        k4_r = vel(1)*multFactor
+
+        ! x^{n+1} = x^n + ( k1 + 2*k2 + 2*k3 + k4 )/6
+        endPts_q(j, i) = qPts(i) + (k1_q + 2.0d0*k2_q + 2.0d0*k3_q + &
+      k4_q)/6.0d0
+        endPts_r(j, i) = rPts(j) + (k1_r + 2.0d0*k2_r + 2.0d0*k3_r + &
+      k4_r)/6.0d0
+      end if
+
+      endPts_q(j, i) = modulo(endPts_q(j, i),2.0d0*3.14159265358979d0)
+    end do
+  end do
+  !$omp end parallel do
+
+end subroutine
+!==============================================================================
+
+!==============================================================================
+subroutine poloidal_advection_step_expl_core(n0_f, n1_f, f, dt, v, n0_rPts, &
       rPts, n0_qPts, qPts, n0_nPts, nPts, n0_drPhi_0, n1_drPhi_0, &
       drPhi_0, n0_dthetaPhi_0, n1_dthetaPhi_0, dthetaPhi_0, n0_drPhi_k, &
       n1_drPhi_k, drPhi_k, n0_dthetaPhi_k, n1_dthetaPhi_k, dthetaPhi_k, &
@@ -34,7 +282,7 @@ pure subroutine poloidal_advection_step_expl(n0_f, n1_f, f, dt, v, n0_rPts, &
       n1_coeffsPhi, coeffsPhi, deg1Phi, deg2Phi, n0_kts1Pol, kts1Pol, &
       n0_kts2Pol, kts2Pol, n0_coeffsPol, n1_coeffsPol, coeffsPol, &
       deg1Pol, deg2Pol, CN0, kN0, deltaRN0, rp, CTi, kTi, deltaRTi, B0, &
-      nulBound)
+      rkOrder, nulBound)
 
   integer(kind=4), intent(in)  :: n0_f
   integer(kind=4), intent(in)  :: n1_f
@@ -107,6 +355,7 @@ pure subroutine poloidal_advection_step_expl(n0_f, n1_f, f, dt, v, n0_rPts, &
   real(kind=8), intent(in)  :: kTi
   real(kind=8), intent(in)  :: deltaRTi
   real(kind=8), intent(in)  :: B0
+  integer(kind=4), intent(in)  :: rkOrder
   logical(kind=1), intent(in)  :: nulBound
   integer(kind=4) :: j
   real(kind=8) :: rMax
@@ -116,10 +365,14 @@ pure subroutine poloidal_advection_step_expl(n0_f, n1_f, f, dt, v, n0_rPts, &
   real(kind=8) :: r
   integer(kind=4) :: idx
   real(kind=8) :: multFactor
+  real(kind=8) :: phiVals (0:1)
+  integer(kind=4) :: phiDers (0:1,0:1)
 
   !_______________________CommentBlock_______________________!
   !                                                          !
   !    Carry out an advection step for the poloidal advection!
+  !    using the derivatives of phi at the nodes, divided by !
+  !    r, which are provided in drPhi_0 and dthetaPhi_0      !
   !                                                          !
   !    Parameters                                            !
   !    ----------                                            !
@@ -142,72 +395,75 @@ pure subroutine poloidal_advection_step_expl(n0_f, n1_f, f, dt, v, n0_rPts, &
 
 
   multFactor = 1.0d0/B0*dt
+
+  ! The derivatives (0,1) and (1,0) of phi are evaluated together
+  phiDers = reshape([0, 1, 1, 0], [2, 2])
   multFactor_half = 0.5d0*multFactor
 
 
-  call eval_spline_2d_cross(qPts, rPts, kts1Phi, deg1Phi, kts2Phi, &
-      deg2Phi, coeffsPhi, drPhi_0, 0, 1)
-  call eval_spline_2d_cross(qPts, rPts, kts1Phi, deg1Phi, kts2Phi, &
-      deg2Phi, coeffsPhi, dthetaPhi_0, 1, 0)
 
 
   idx = nPts(1) - 1
   rMax = rPts(idx)
 
 
-  do i = 0, nPts(0) - 1, 1
-    do j = 0, nPts(1) - 1, 1
-      ! Step one of Heun method
-      ! x' = x^n + f(x^n)
-      drPhi_0(j, i) = drPhi_0(j, i)/rPts(j)
-      dthetaPhi_0(j, i) = dthetaPhi_0(j, i)/rPts(j)
-      endPts_k1_q(j, i) = multFactor*(-1.0d0*drPhi_0(j, i)) + qPts(i)
-      endPts_k1_r(j, i) = multFactor*dthetaPhi_0(j, i) + rPts(j)
+  if (rkOrder == 2) then
+    !$omp parallel do private(j, phiVals)
+    do i = 0, nPts(0) - 1, 1
+      do j = 0, nPts(1) - 1, 1
+        ! Step one of Heun method
+        ! x' = x^n + f(x^n)
+        endPts_k1_q(j, i) = multFactor*(-1.0d0*drPhi_0(j, i)) + qPts(i)
+        endPts_k1_r(j, i) = multFactor*dthetaPhi_0(j, i) + rPts(j)
 
-      ! Handle theta boundary conditions
-      do while (endPts_k1_q(j, i) < 0)
-        endPts_k1_q(j, i) = 2.0d0*3.14159265358979d0 + endPts_k1_q(j, i)
-      end do
-      do while (endPts_k1_q(j, i) > 2.0d0*3.14159265358979d0)
-        endPts_k1_q(j, i) = -2.0d0*3.14159265358979d0 + endPts_k1_q(j, i &
-      )
+        ! Handle theta boundary conditions
+        do while (endPts_k1_q(j, i) < 0)
+          endPts_k1_q(j, i) = 2.0d0*3.14159265358979d0 + endPts_k1_q(j, i)
+        end do
+        do while (endPts_k1_q(j, i) > 2.0d0*3.14159265358979d0)
+          endPts_k1_q(j, i) = -2.0d0*3.14159265358979d0 + endPts_k1_q(j, i &
+        )
 
 
-      end do
-      if (.not. (endPts_k1_r(j, i) > rMax .or. endPts_k1_r(j, i) < rPts( &
-      0))) then
-        ! Add the new value of phi to the derivatives
-        ! x^{n+1} = x^n + 0.5( f(x^n) + f(x^n + f(x^n)) )
-        ! ^^^^^^^^^^^^^^^
-        drPhi_k(j, i) = eval_spline_2d_scalar(endPts_k1_q(j, i), &
-      endPts_k1_r(j, i), kts1Phi, deg1Phi, kts2Phi, deg2Phi, coeffsPhi, &
-      0, 1)
-        drPhi_k(j, i) = drPhi_k(j, i)/endPts_k1_r(j, i)
-
-
-        dthetaPhi_k(j, i) = eval_spline_2d_scalar(endPts_k1_q(j, i), &
-      endPts_k1_r(j, i), kts1Phi, deg1Phi, kts2Phi, deg2Phi, coeffsPhi, &
-      1, 0)
-        dthetaPhi_k(j, i) = dthetaPhi_k(j, i)/endPts_k1_r(j, i)
-      else
-        drPhi_k(j, i) = 0.0d0
-        dthetaPhi_k(j, i) = 0.0d0
+        end do
+        if (.not. (endPts_k1_r(j, i) > rMax .or. endPts_k1_r(j, i) < rPts( &
+        0))) then
+          ! Add the new value of phi to the derivatives
+          ! x^{n+1} = x^n + 0.5( f(x^n) + f(x^n + f(x^n)) )
+          ! ^^^^^^^^^^^^^^^
+          call eval_spline_2d_multi(endPts_k1_q(j, i), endPts_k1_r(j, i), &
+        kts1Phi, deg1Phi, kts2Phi, deg2Phi, coeffsPhi, phiDers, phiVals)
+          drPhi_k(j, i) = phiVals(0)/endPts_k1_r(j, i)
+          dthetaPhi_k(j, i) = phiVals(1)/endPts_k1_r(j, i)
+        else
+          drPhi_k(j, i) = 0.0d0
+          dthetaPhi_k(j, i) = 0.0d0
 
 
-        ! Step two of Heun method
-        ! x^{n+1} = x^n + 0.5( f(x^n) + f(x^n + f(x^n)) )
-      end if
-      endPts_k2_q(j, i) = modulo(1.0d0*multFactor_half*(-1.0d0*drPhi_0(j &
-      , i) - 1.0d0*drPhi_k(j, i)) + 1.0d0*qPts(i),2.0d0* &
-      3.14159265358979d0)
-      endPts_k2_r(j, i) = multFactor_half*(dthetaPhi_0(j, i) + &
-      dthetaPhi_k(j, i)) + rPts(j)
+          ! Step two of Heun method
+          ! x^{n+1} = x^n + 0.5( f(x^n) + f(x^n + f(x^n)) )
+        end if
+        endPts_k2_q(j, i) = modulo(1.0d0*multFactor_half*(-1.0d0*drPhi_0(j &
+        , i) - 1.0d0*drPhi_k(j, i)) + 1.0d0*qPts(i),2.0d0* &
+        3.14159265358979d0)
+        endPts_k2_r(j, i) = multFactor_half*(dthetaPhi_0(j, i) + &
+        dthetaPhi_k(j, i)) + rPts(j)
 
+      end do
     end do
-  end do
+    !$omp end parallel do
+  else
+    call poloidal_advection_feet_rk(rkOrder, multFactor, n0_rPts, rPts, &
+      n0_qPts, qPts, n0_nPts, nPts, n0_drPhi_0, n1_drPhi_0, drPhi_0, &
+      n0_dthetaPhi_0, n1_dthetaPhi_0, dthetaPhi_0, n0_endPts_k2_q, &
+      n1_endPts_k2_q, endPts_k2_q, n0_endPts_k2_r, n1_endPts_k2_r, &
+      endPts_k2_r, n0_kts1Phi, kts1Phi, n0_kts2Phi, kts2Phi, &
+      n0_coeffsPhi, n1_coeffsPhi, coeffsPhi, deg1Phi, deg2Phi)
+  end if
 
   ! Find value at the determined point
   if (nulBound) then
+    !$omp parallel do private(j, theta, r)
     do i = 0, size(qPts,1) - 1, 1
       theta = qPts(i)
       do j = 0, size(rPts,1) - 1, 1
@@ -230,8 +486,10 @@ pure subroutine poloidal_advection_step_expl(n0_f, n1_f, f, dt, v, n0_rPts, &
         end if
       end do
     end do
+    !$omp end parallel do
 
   else
+    !$omp parallel do private(j, theta, r)
     do i = 0, size(qPts,1) - 1, 1
       theta = qPts(i)
       do j = 0, size(rPts,1) - 1, 1
@@ -258,13 +516,131 @@ pure subroutine poloidal_advection_step_expl(n0_f, n1_f, f, dt, v, n0_rPts, &
         end if
       end do
     end do
+    !$omp end parallel do
 
   end if
 
 end subroutine
 
 !==============================================================================
-pure subroutine v_parallel_advection_eval_step(n0_f, f, n0_vPts, vPts, rPos, &
+subroutine poloidal_advection_step_expl(n0_f, n1_f, f, dt, v, n0_rPts, &
+      rPts, n0_qPts, qPts, n0_nPts, nPts, n0_drPhi_0, n1_drPhi_0, &
+      drPhi_0, n0_dthetaPhi_0, n1_dthetaPhi_0, dthetaPhi_0, n0_drPhi_k, &
+      n1_drPhi_k, drPhi_k, n0_dthetaPhi_k, n1_dthetaPhi_k, dthetaPhi_k, &
+      n0_endPts_k1_q, n1_endPts_k1_q, endPts_k1_q, n0_endPts_k1_r, &
+      n1_endPts_k1_r, endPts_k1_r, n0_endPts_k2_q, n1_endPts_k2_q, &
+      endPts_k2_q, n0_endPts_k2_r, n1_endPts_k2_r, endPts_k2_r, &
+      n0_kts1Phi, kts1Phi, n0_kts2Phi, kts2Phi, n0_coeffsPhi, &
+      n1_coeffsPhi, coeffsPhi, deg1Phi, deg2Phi, n0_kts1Pol, kts1Pol, &
+      n0_kts2Pol, kts2Pol, n0_coeffsPol, n1_coeffsPol, coeffsPol, &
+      deg1Pol, deg2Pol, CN0, kN0, deltaRN0, rp, CTi, kTi, deltaRTi, B0, &
+      rkOrder, nulBound)
+
+  integer(kind=4), intent(in)  :: n0_f
+  integer(kind=4), intent(in)  :: n1_f
+  real(kind=8), intent(inout)  :: f (0:n0_f - 1,0:n1_f - 1)
+  real(kind=8), intent(in)  :: dt
+  real(kind=8), intent(in)  :: v
+  integer(kind=4), intent(in)  :: n0_rPts
+  real(kind=8), intent(in)  :: rPts (0:n0_rPts - 1)
+  integer(kind=4), intent(in)  :: n0_qPts
+  real(kind=8), intent(in)  :: qPts (0:n0_qPts - 1)
+  integer(kind=4), intent(in)  :: n0_nPts
+  integer(kind=4), intent(in)  :: nPts (0:n0_nPts - 1)
+  integer(kind=4), intent(in)  :: n0_drPhi_0
+  integer(kind=4), intent(in)  :: n1_drPhi_0
+  real(kind=8), intent(inout)  :: drPhi_0 (0:n0_drPhi_0 - 1,0:n1_drPhi_0 &
+      - 1)
+  integer(kind=4), intent(in)  :: n0_dthetaPhi_0
+  integer(kind=4), intent(in)  :: n1_dthetaPhi_0
+  real(kind=8), intent(inout)  :: dthetaPhi_0 (0:n0_dthetaPhi_0 - 1,0: &
+      n1_dthetaPhi_0 - 1)
+  integer(kind=4), intent(in)  :: n0_drPhi_k
+  integer(kind=4), intent(in)  :: n1_drPhi_k
+  real(kind=8), intent(inout)  :: drPhi_k (0:n0_drPhi_k - 1,0:n1_drPhi_k &
+      - 1)
+  integer(kind=4), intent(in)  :: n0_dthetaPhi_k
+  integer(kind=4), intent(in)  :: n1_dthetaPhi_k
+  real(kind=8), intent(inout)  :: dthetaPhi_k (0:n0_dthetaPhi_k - 1,0: &
+      n1_dthetaPhi_k - 1)
+  integer(kind=4), intent(in)  :: n0_endPts_k1_q
+  integer(kind=4), intent(in)  :: n1_endPts_k1_q
+  real(kind=8), intent(inout)  :: endPts_k1_q (0:n0_endPts_k1_q - 1,0: &
+      n1_endPts_k1_q - 1)
+  integer(kind=4), intent(in)  :: n0_endPts_k1_r
+  integer(kind=4), intent(in)  :: n1_endPts_k1_r
+  real(kind=8), intent(inout)  :: endPts_k1_r (0:n0_endPts_k1_r - 1,0: &
+      n1_endPts_k1_r - 1)
+  integer(kind=4), intent(in)  :: n0_endPts_k2_q
+  integer(kind=4), intent(in)  :: n1_endPts_k2_q
+  real(kind=8), intent(inout)  :: endPts_k2_q (0:n0_endPts_k2_q - 1,0: &
+      n1_endPts_k2_q - 1)
+  integer(kind=4), intent(in)  :: n0_endPts_k2_r
+  integer(kind=4), intent(in)  :: n1_endPts_k2_r
+  real(kind=8), intent(inout)  :: endPts_k2_r (0:n0_endPts_k2_r - 1,0: &
+      n1_endPts_k2_r - 1)
+  integer(kind=4), intent(in)  :: n0_kts1Phi
+  real(kind=8), intent(in)  :: kts1Phi (0:n0_kts1Phi - 1)
+  integer(kind=4), intent(in)  :: n0_kts2Phi
+  real(kind=8), intent(in)  :: kts2Phi (0:n0_kts2Phi - 1)
+  integer(kind=4), intent(in)  :: n0_coeffsPhi
+  integer(kind=4), intent(in)  :: n1_coeffsPhi
+  real(kind=8), intent(in)  :: coeffsPhi (0:n0_coeffsPhi - 1,0: &
+      n1_coeffsPhi - 1)
+  integer(kind=4), intent(in)  :: deg1Phi
+  integer(kind=4), intent(in)  :: deg2Phi
+  integer(kind=4), intent(in)  :: n0_kts1Pol
+  real(kind=8), intent(in)  :: kts1Pol (0:n0_kts1Pol - 1)
+  integer(kind=4), intent(in)  :: n0_kts2Pol
+  real(kind=8), intent(in)  :: kts2Pol (0:n0_kts2Pol - 1)
+  integer(kind=4), intent(in)  :: n0_coeffsPol
+  integer(kind=4), intent(in)  :: n1_coeffsPol
+  real(kind=8), intent(in)  :: coeffsPol (0:n0_coeffsPol - 1,0: &
+      n1_coeffsPol - 1)
+  integer(kind=4), intent(in)  :: deg1Pol
+  integer(kind=4), intent(in)  :: deg2Pol
+  real(kind=8), intent(in)  :: CN0
+  real(kind=8), intent(in)  :: kN0
+  real(kind=8), intent(in)  :: deltaRN0
+  real(kind=8), intent(in)  :: rp
+  real(kind=8), intent(in)  :: CTi
+  real(kind=8), intent(in)  :: kTi
+  real(kind=8), intent(in)  :: deltaRTi
+  real(kind=8), intent(in)  :: B0
+  integer(kind=4), intent(in)  :: rkOrder
+  logical(kind=1), intent(in)  :: nulBound
+  integer(kind=4) :: i
+  integer(kind=4) :: j
+
+  call eval_spline_2d_cross(qPts, rPts, kts1Phi, deg1Phi, kts2Phi, &
+      deg2Phi, coeffsPhi, drPhi_0, 0, 1)
+  call eval_spline_2d_cross(qPts, rPts, kts1Phi, deg1Phi, kts2Phi, &
+      deg2Phi, coeffsPhi, dthetaPhi_0, 1, 0)
+
+  do i = 0, nPts(0) - 1, 1
+    do j = 0, nPts(1) - 1, 1
+      drPhi_0(j, i) = drPhi_0(j, i)/rPts(j)
+      dthetaPhi_0(j, i) = dthetaPhi_0(j, i)/rPts(j)
+    end do
+  end do
+
+  call poloidal_advection_step_expl_core(n0_f, n1_f, f, dt, v, n0_rPts, &
+      rPts, n0_qPts, qPts, n0_nPts, nPts, n0_drPhi_0, n1_drPhi_0, &
+      drPhi_0, n0_dthetaPhi_0, n1_dthetaPhi_0, dthetaPhi_0, n0_drPhi_k, &
+      n1_drPhi_k, drPhi_k, n0_dthetaPhi_k, n1_dthetaPhi_k, dthetaPhi_k, &
+      n0_endPts_k1_q, n1_endPts_k1_q, endPts_k1_q, n0_endPts_k1_r, &
+      n1_endPts_k1_r, endPts_k1_r, n0_endPts_k2_q, n1_endPts_k2_q, &
+      endPts_k2_q, n0_endPts_k2_r, n1_endPts_k2_r, endPts_k2_r, &
+      n0_kts1Phi, kts1Phi, n0_kts2Phi, kts2Phi, n0_coeffsPhi, &
+      n1_coeffsPhi, coeffsPhi, deg1Phi, deg2Phi, n0_kts1Pol, kts1Pol, &
+      n0_kts2Pol, kts2Pol, n0_coeffsPol, n1_coeffsPol, coeffsPol, &
+      deg1Pol, deg2Pol, CN0, kN0, deltaRN0, rp, CTi, kTi, deltaRTi, B0, &
+      rkOrder, nulBound)
+
+end subroutine
+
+!==============================================================================
+subroutine v_parallel_advection_eval_step(n0_f, f, n0_vPts, vPts, rPos, &
       vMin, vMax, n0_kts, kts, deg, n0_coeffs, coeffs, CN0, kN0, &
       deltaRN0, rp, CTi, kTi, deltaRTi, bound)
 
@@ -294,6 +670,7 @@ pure subroutine v_parallel_advection_eval_step(n0_f, f, n0_vPts, vPts, rPos, &
 
   ! Find value at the determined point
   if (bound == 0 ) then
+    !$omp parallel do private(v)
     do i = 0, size(vPts,1) - 1, 1
       v = vPts(i)
       if (v > vMax .or. v < vMin) then
@@ -302,8 +679,10 @@ pure subroutine v_parallel_advection_eval_step(n0_f, f, n0_vPts, vPts, rPos, &
         f(i) = eval_spline_1d_scalar(v, kts, deg, coeffs, 0)
       end if
     end do
+    !$omp end parallel do
 
   else if (bound == 1 ) then
+    !$omp parallel do private(v)
     do i = 0, size(vPts,1) - 1, 1
       v = vPts(i)
       if (v > vMax .or. v < vMin) then
@@ -312,9 +691,11 @@ pure subroutine v_parallel_advection_eval_step(n0_f, f, n0_vPts, vPts, rPos, &
         f(i) = eval_spline_1d_scalar(v, kts, deg, coeffs, 0)
       end if
     end do
+    !$omp end parallel do
 
   else if (bound == 2 ) then
     vDiff = vMax - 1.0d0*vMin
+    !$omp parallel do private(v)
     do i = 0, size(vPts,1) - 1, 1
       v = vPts(i)
       do while (v < vMin)
@@ -325,90 +706,124 @@ pure subroutine v_parallel_advection_eval_step(n0_f, f, n0_vPts, vPts, rPos, &
       end do
       f(i) = eval_spline_1d_scalar(v, kts, deg, coeffs, 0)
     end do
+    !$omp end parallel do
 
   end if
 
 end subroutine
 
 !==============================================================================
-pure subroutine get_lagrange_vals(i, nr, n0_shifts, shifts, n0_vals, n1_vals, &
-      n2_vals, vals, n0_qVals, qVals, n0_thetaShifts, thetaShifts, &
-      n0_kts, kts, deg, n0_coeffs, coeffs)
-
-  integer(kind=4), intent(in)  :: i
-  integer(kind=4), intent(in)  :: nr
-  integer(kind=4), intent(in)  :: n0_shifts
-  integer(kind=4), intent(in)  :: shifts (0:n0_shifts - 1)
-  integer(kind=4), intent(in)  :: n0_vals
-  integer(kind=4), intent(in)  :: n1_vals
-  integer(kind=4), intent(in)  :: n2_vals
-  real(kind=8), intent(inout)  :: vals (0:n0_vals - 1,0:n1_vals - 1,0: &
-      n2_vals - 1)
-  integer(kind=4), intent(in)  :: n0_qVals
-  real(kind=8), intent(in)  :: qVals (0:n0_qVals - 1)
-  integer(kind=4), intent(in)  :: n0_thetaShifts
-  real(kind=8), intent(in)  :: thetaShifts (0:n0_thetaShifts - 1)
+subroutine v_parallel_advection_eval_step_batch(n0_f, n1_f, n2_f, f, &
+      n0_vPts, vPts, n0_rPts, rPts, n0_c, n1_c, c, dt, vMin, vMax, &
+      n0_kts, kts, deg, n0_coeffs, n1_coeffs, n2_coeffs, coeffs, CN0, &
+      kN0, deltaRN0, rp, CTi, kTi, deltaRTi, bound)
+
+  integer(kind=4), intent(in)  :: n0_f
+  integer(kind=4), intent(in)  :: n1_f
+  integer(kind=4), intent(in)  :: n2_f
+  real(kind=8), intent(inout)  :: f (0:n0_f - 1,0:n1_f - 1,0:n2_f - 1)
+  integer(kind=4), intent(in)  :: n0_vPts
+  real(kind=8), intent(in)  :: vPts (0:n0_vPts - 1)
+  integer(kind=4), intent(in)  :: n0_rPts
+  real(kind=8), intent(in)  :: rPts (0:n0_rPts - 1)
+  integer(kind=4), intent(in)  :: n0_c
+  integer(kind=4), intent(in)  :: n1_c
+  real(kind=8), intent(in)  :: c (0:n0_c - 1,0:n1_c - 1)
+  real(kind=8), intent(in)  :: dt
+  real(kind=8), intent(in)  :: vMin
+  real(kind=8), intent(in)  :: vMax
   integer(kind=4), intent(in)  :: n0_kts
   real(kind=8), intent(in)  :: kts (0:n0_kts - 1)
   integer(kind=4), intent(in)  :: deg
   integer(kind=4), intent(in)  :: n0_coeffs
-  real(kind=8), intent(in)  :: coeffs (0:n0_coeffs - 1)
-  integer(kind=4) :: k
+  integer(kind=4), intent(in)  :: n1_coeffs
+  integer(kind=4), intent(in)  :: n2_coeffs
+  real(kind=8), intent(in)  :: coeffs (0:n0_coeffs - 1,0:n1_coeffs - 1,0: &
+      n2_coeffs - 1)
+  real(kind=8), intent(in)  :: CN0
+  real(kind=8), intent(in)  :: kN0
+  real(kind=8), intent(in)  :: deltaRN0
+  real(kind=8), intent(in)  :: rp
+  real(kind=8), intent(in)  :: CTi
+  real(kind=8), intent(in)  :: kTi
+  real(kind=8), intent(in)  :: deltaRTi
+  integer(kind=4), intent(in)  :: bound
+  integer(kind=4) :: nr
+  integer(kind=4) :: nLines
+  integer(kind=4) :: nv
+  real(kind=8) :: vDiff
+  real(kind=8) :: shift
+  real(kind=8) :: v
+  integer(kind=4) :: i
   integer(kind=4) :: j
-  integer(kind=4) :: s
-  real(kind=8) :: q
+  integer(kind=4) :: k
 
-  do j = 0, size(shifts,1) - 1, 1
-    s = shifts(j)
-    do k = 0, size(qVals,1) - 1, 1
-      q = qVals(k)
-      q = q + thetaShifts(j)
-      do while (q < 0)
-        q = 2.0d0*3.14159265358979d0 + q
-      end do
-      do while (q > 2.0d0*3.14159265358979d0)
-        q = -2.0d0*3.14159265358979d0 + q
+  nr = n2_f
+  nLines = n1_f
+  nv = n0_f
+  if (bound == 0 ) then
+    !$omp parallel do private(j, k, shift, v)
+    do i = 0, nr - 1, 1
+      do j = 0, nLines - 1, 1
+        shift = c(j, i)*dt
+        do k = 0, nv - 1, 1
+          v = vPts(k) - shift
+          if (v > vMax .or. v < vMin) then
+            f(k, j, i) = fEq(rPts(i), v, CN0, kN0, deltaRN0, rp, CTi, kTi, &
+      deltaRTi)
+          else
+            f(k, j, i) = eval_spline_1d_scalar(v, kts, deg, coeffs(:, j, i &
+      ), 0)
+          end if
+        end do
       end do
-      vals(j, k, modulo(i - s,nr)) = eval_spline_1d_scalar(q, kts, &
-      deg, coeffs, 0)
     end do
-  end do
-
-end subroutine
-
-!==============================================================================
-pure subroutine flux_advection(nq, nr, n0_f, n1_f, f, n0_coeffs, coeffs, &
-      n0_vals, n1_vals, n2_vals, vals)
+    !$omp end parallel do
 
-  integer(kind=4), intent(in)  :: nq
-  integer(kind=4), intent(in)  :: nr
-  integer(kind=4), intent(in)  :: n0_f
-  integer(kind=4), intent(in)  :: n1_f
-  real(kind=8), intent(inout)  :: f (0:n0_f - 1,0:n1_f - 1)
-  integer(kind=4), intent(in)  :: n0_coeffs
-  real(kind=8), intent(in)  :: coeffs (0:n0_coeffs - 1)
-  integer(kind=4), intent(in)  :: n0_vals
-  integer(kind=4), intent(in)  :: n1_vals
-  integer(kind=4), intent(in)  :: n2_vals
-  real(kind=8), intent(in)  :: vals (0:n0_vals - 1,0:n1_vals - 1,0: &
-      n2_vals - 1)
-  integer(kind=4) :: k
-  integer(kind=4) :: j
-  integer(kind=4) :: i
+  else if (bound == 1 ) then
+    !$omp parallel do private(j, k, shift, v)
+    do i = 0, nr - 1, 1
+      do j = 0, nLines - 1, 1
+        shift = c(j, i)*dt
+        do k = 0, nv - 1, 1
+          v = vPts(k) - shift
+          if (v > vMax .or. v < vMin) then
+            f(k, j, i) = 0.0d0
+          else
+            f(k, j, i) = eval_spline_1d_scalar(v, kts, deg, coeffs(:, j, i &
+      ), 0)
+          end if
+        end do
+      end do
+    end do
+    !$omp end parallel do
 
-  do j = 0, nq - 1, 1
+  else if (bound == 2 ) then
+    vDiff = vMax - 1.0d0*vMin
+    !$omp parallel do private(j, k, shift, v)
     do i = 0, nr - 1, 1
-      f(i, j) = coeffs(0)*vals(0, j, i)
-      do k = 1, size(coeffs,1) - 1, 1
-        f(i, j) = coeffs(k)*vals(k, j, i) + f(i, j)
+      do j = 0, nLines - 1, 1
+        shift = c(j, i)*dt
+        do k = 0, nv - 1, 1
+          v = vPts(k) - shift
+          do while (v < vMin)
+            v = v + vDiff
+          end do
+          do while (v > vMax)
+            v = v - vDiff
+          end do
+          f(k, j, i) = eval_spline_1d_scalar(v, kts, deg, coeffs(:, j, i), &
+      0)
+        end do
       end do
     end do
-  end do
+    !$omp end parallel do
 
+  end if
 end subroutine
 
 !==============================================================================
-pure subroutine poloidal_advection_step_impl(n0_f, n1_f, f, dt, v, n0_rPts, &
+subroutine poloidal_advection_step_impl_core(n0_f, n1_f, f, dt, v, n0_rPts, &
       rPts, n0_qPts, qPts, n0_nPts, nPts, n0_drPhi_0, n1_drPhi_0, &
       drPhi_0, n0_dthetaPhi_0, n1_dthetaPhi_0, dthetaPhi_0, n0_drPhi_k, &
       n1_drPhi_k, drPhi_k, n0_dthetaPhi_k, n1_dthetaPhi_k, dthetaPhi_k, &
@@ -419,7 +834,8 @@ pure subroutine poloidal_advection_step_impl(n0_f, n1_f, f, dt, v, n0_rPts, &
       n1_coeffsPhi, coeffsPhi, deg1Phi, deg2Phi, n0_kts1Pol, kts1Pol, &
       n0_kts2Pol, kts2Pol, n0_coeffsPol, n1_coeffsPol, coeffsPol, &
       deg1Pol, deg2Pol, CN0, kN0, deltaRN0, rp, CTi, kTi, deltaRTi, B0, &
-      tol, nulBound)
+      tol, maxLoops, n0_converged, n1_converged, converged, &
+      n0_counters, counters, nulBound)
 
   integer(kind=4), intent(in)  :: n0_f
   integer(kind=4), intent(in)  :: n1_f
@@ -493,20 +909,31 @@ pure subroutine poloidal_advection_step_impl(n0_f, n1_f, f, dt, v, n0_rPts, &
   real(kind=8), intent(in)  :: deltaRTi
   real(kind=8), intent(in)  :: B0
   real(kind=8), intent(in)  :: tol
+  integer(kind=4), intent(in)  :: maxLoops
+  integer(kind=4), intent(in)  :: n0_converged
+  integer(kind=4), intent(in)  :: n1_converged
+  integer(kind=4), intent(inout)  :: converged (0:n0_converged - 1,0: &
+      n1_converged - 1)
+  integer(kind=4), intent(in)  :: n0_counters
+  integer(kind=4), intent(inout)  :: counters (0:n0_counters - 1)
   logical(kind=1), intent(in)  :: nulBound
   integer(kind=4) :: j
   real(kind=8) :: rMax
   real(kind=8) :: theta
-  real(kind=8) :: diff
   integer(kind=4) :: i
   real(kind=8) :: r
-  real(kind=8) :: norm
+  integer(kind=4) :: nLoops
+  integer(kind=4) :: nUnconverged
   integer(kind=4) :: idx
   real(kind=8) :: multFactor
+  real(kind=8) :: phiVals (0:1)
+  integer(kind=4) :: phiDers (0:1,0:1)
 
   !_______________________CommentBlock_______________________!
   !                                                          !
   !    Carry out an advection step for the poloidal advection!
+  !    using the derivatives of phi at the nodes, divided by !
+  !    r, which are provided in drPhi_0 and dthetaPhi_0      !
   !                                                          !
   !    Parameters                                            !
   !    ----------                                            !
@@ -530,39 +957,47 @@ pure subroutine poloidal_advection_step_impl(n0_f, n1_f, f, dt, v, n0_rPts, &
 
   multFactor = 1.0d0/B0*dt
 
+  ! The derivatives (0,1) and (1,0) of phi are evaluated together
+  phiDers = reshape([0, 1, 1, 0], [2, 2])
+
 
-  call eval_spline_2d_cross(qPts, rPts, kts1Phi, deg1Phi, kts2Phi, &
-      deg2Phi, coeffsPhi, drPhi_0, 0, 1)
-  call eval_spline_2d_cross(qPts, rPts, kts1Phi, deg1Phi, kts2Phi, &
-      deg2Phi, coeffsPhi, dthetaPhi_0, 1, 0)
 
 
   idx = nPts(1) - 1
   rMax = rPts(idx)
 
 
+  !$omp parallel do private(j)
   do i = 0, nPts(0) - 1, 1
     do j = 0, nPts(1) - 1, 1
-      drPhi_0(j, i) = drPhi_0(j, i)/rPts(j)
-      dthetaPhi_0(j, i) = dthetaPhi_0(j, i)/rPts(j)
       endPts_k1_q(j, i) = multFactor*(-1.0d0*drPhi_0(j, i)) + qPts(i)
       endPts_k1_r(j, i) = multFactor*dthetaPhi_0(j, i) + rPts(j)
+      converged(j, i) = 0
 
 
     end do
 
   end do
+  !$omp end parallel do
 
   ! Step one of Heun method
   ! x' = x^n + f(x^n)
   multFactor = 0.5d0*multFactor
 
 
-  norm = tol + 1.0d0
-  do while (norm > tol)
-    norm = 0.0d0
+  nLoops = 0
+  nUnconverged = nPts(0)*nPts(1)
+  do while (nUnconverged > 0 .and. nLoops < maxLoops)
+    nLoops = nLoops + 1
+    nUnconverged = 0
+    !$omp parallel do private(j, phiVals) reduction(+: nUnconverged)
     do i = 0, nPts(0) - 1, 1
       do j = 0, nPts(1) - 1, 1
+        ! Points whose foot has converged are not recomputed
+        if (converged(j, i) == 1) then
+          cycle
+        end if
+
         ! Handle theta boundary conditions
         do while (endPts_k1_q(j, i) < 0)
           endPts_k1_q(j, i) = 2.0d0*3.14159265358979d0 + endPts_k1_q(j, &
@@ -579,14 +1014,10 @@ pure subroutine poloidal_advection_step_impl(n0_f, n1_f, f, dt, v, n0_rPts, &
           ! Add the new value of phi to the derivatives
           ! x^{n+1} = x^n + 0.5( f(x^n) + f(x^n + f(x^n)) )
           ! ^^^^^^^^^^^^^^^
-          drPhi_k(j, i) = eval_spline_2d_scalar(endPts_k1_q(j, i), &
-      endPts_k1_r(j, i), kts1Phi, deg1Phi, kts2Phi, deg2Phi, coeffsPhi, &
-      0, 1)
-          drPhi_k(j, i) = drPhi_k(j, i)/endPts_k1_r(j, i)
-          dthetaPhi_k(j, i) = eval_spline_2d_scalar(endPts_k1_q(j, i), &
-      endPts_k1_r(j, i), kts1Phi, deg1Phi, kts2Phi, deg2Phi, coeffsPhi, &
-      1, 0)
-          dthetaPhi_k(j, i) = dthetaPhi_k(j, i)/endPts_k1_r(j, i)
+          call eval_spline_2d_multi(endPts_k1_q(j, i), endPts_k1_r(j, i), &
+      kts1Phi, deg1Phi, kts2Phi, deg2Phi, coeffsPhi, phiDers, phiVals)
+          drPhi_k(j, i) = phiVals(0)/endPts_k1_r(j, i)
+          dthetaPhi_k(j, i) = phiVals(1)/endPts_k1_r(j, i)
         else
           drPhi_k(j, i) = 0.0d0
           dthetaPhi_k(j, i) = 0.0d0
@@ -610,13 +1041,12 @@ pure subroutine poloidal_advection_step_impl(n0_f, n1_f, f, dt, v, n0_rPts, &
 
 
         end if
-        diff = Abs(1.0d0*endPts_k1_q(j, i) - endPts_k2_q(j, i))
-        if (diff > norm) then
-          norm = diff
-        end if
-        diff = Abs(1.0d0*endPts_k1_r(j, i) - endPts_k2_r(j, i))
-        if (diff > norm) then
-          norm = diff
+        if (Abs(1.0d0*endPts_k1_q(j, i) - endPts_k2_q(j, i)) <= tol &
+      .and. Abs(1.0d0*endPts_k1_r(j, i) - endPts_k2_r(j, i)) <= tol) &
+      then
+          converged(j, i) = 1
+        else
+          nUnconverged = nUnconverged + 1
         end if
         endPts_k1_q(j, i) = endPts_k2_q(j, i)
         endPts_k1_r(j, i) = endPts_k2_r(j, i)
@@ -626,9 +1056,13 @@ pure subroutine poloidal_advection_step_impl(n0_f, n1_f, f, dt, v, n0_rPts, &
       end do
 
     end do
+    !$omp end parallel do
 
   end do
+  counters(0) = counters(0) + nLoops
+  counters(1) = counters(1) + nUnconverged
   if (nulBound) then
+    !$omp parallel do private(j, theta, r)
     do i = 0, size(qPts,1) - 1, 1
       theta = qPts(i)
       do j = 0, size(rPts,1) - 1, 1
@@ -652,8 +1086,10 @@ pure subroutine poloidal_advection_step_impl(n0_f, n1_f, f, dt, v, n0_rPts, &
       end do
 
     end do
+    !$omp end parallel do
 
   else
+    !$omp parallel do private(j, theta, r)
     do i = 0, size(qPts,1) - 1, 1
       theta = qPts(i)
       do j = 0, size(rPts,1) - 1, 1
@@ -681,9 +1117,298 @@ pure subroutine poloidal_advection_step_impl(n0_f, n1_f, f, dt, v, n0_rPts, &
       end do
 
     end do
+    !$omp end parallel do
 
   end if
 
 end subroutine
 
+!==============================================================================
+subroutine poloidal_advection_step_impl(n0_f, n1_f, f, dt, v, n0_rPts, &
+      rPts, n0_qPts, qPts, n0_nPts, nPts, n0_drPhi_0, n1_drPhi_0, &
+      drPhi_0, n0_dthetaPhi_0, n1_dthetaPhi_0, dthetaPhi_0, n0_drPhi_k, &
+      n1_drPhi_k, drPhi_k, n0_dthetaPhi_k, n1_dthetaPhi_k, dthetaPhi_k, &
+      n0_endPts_k1_q, n1_endPts_k1_q, endPts_k1_q, n0_endPts_k1_r, &
+      n1_endPts_k1_r, endPts_k1_r, n0_endPts_k2_q, n1_endPts_k2_q, &
+      endPts_k2_q, n0_endPts_k2_r, n1_endPts_k2_r, endPts_k2_r, &
+      n0_kts1Phi, kts1Phi, n0_kts2Phi, kts2Phi, n0_coeffsPhi, &
+      n1_coeffsPhi, coeffsPhi, deg1Phi, deg2Phi, n0_kts1Pol, kts1Pol, &
+      n0_kts2Pol, kts2Pol, n0_coeffsPol, n1_coeffsPol, coeffsPol, &
+      deg1Pol, deg2Pol, CN0, kN0, deltaRN0, rp, CTi, kTi, deltaRTi, B0, &
+      tol, maxLoops, n0_converged, n1_converged, converged, &
+      n0_counters, counters, nulBound)
+
+  integer(kind=4), intent(in)  :: n0_f
+  integer(kind=4), intent(in)  :: n1_f
+  real(kind=8), intent(inout)  :: f (0:n0_f - 1,0:n1_f - 1)
+  real(kind=8), intent(in)  :: dt
+  real(kind=8), intent(in)  :: v
+  integer(kind=4), intent(in)  :: n0_rPts
+  real(kind=8), intent(in)  :: rPts (0:n0_rPts - 1)
+  integer(kind=4), intent(in)  :: n0_qPts
+  real(kind=8), intent(in)  :: qPts (0:n0_qPts - 1)
+  integer(kind=4), intent(in)  :: n0_nPts
+  integer(kind=4), intent(in)  :: nPts (0:n0_nPts - 1)
+  integer(kind=4), intent(in)  :: n0_drPhi_0
+  integer(kind=4), intent(in)  :: n1_drPhi_0
+  real(kind=8), intent(inout)  :: drPhi_0 (0:n0_drPhi_0 - 1,0:n1_drPhi_0 &
+      - 1)
+  integer(kind=4), intent(in)  :: n0_dthetaPhi_0
+  integer(kind=4), intent(in)  :: n1_dthetaPhi_0
+  real(kind=8), intent(inout)  :: dthetaPhi_0 (0:n0_dthetaPhi_0 - 1,0: &
+      n1_dthetaPhi_0 - 1)
+  integer(kind=4), intent(in)  :: n0_drPhi_k
+  integer(kind=4), intent(in)  :: n1_drPhi_k
+  real(kind=8), intent(inout)  :: drPhi_k (0:n0_drPhi_k - 1,0:n1_drPhi_k &
+      - 1)
+  integer(kind=4), intent(in)  :: n0_dthetaPhi_k
+  integer(kind=4), intent(in)  :: n1_dthetaPhi_k
+  real(kind=8), intent(inout)  :: dthetaPhi_k (0:n0_dthetaPhi_k - 1,0: &
+      n1_dthetaPhi_k - 1)
+  integer(kind=4), intent(in)  :: n0_endPts_k1_q
+  integer(kind=4), intent(in)  :: n1_endPts_k1_q
+  real(kind=8), intent(inout)  :: endPts_k1_q (0:n0_endPts_k1_q - 1,0: &
+      n1_endPts_k1_q - 1)
+  integer(kind=4), intent(in)  :: n0_endPts_k1_r
+  integer(kind=4), intent(in)  :: n1_endPts_k1_r
+  real(kind=8), intent(inout)  :: endPts_k1_r (0:n0_endPts_k1_r - 1,0: &
+      n1_endPts_k1_r - 1)
+  integer(kind=4), intent(in)  :: n0_endPts_k2_q
+  integer(kind=4), intent(in)  :: n1_endPts_k2_q
+  real(kind=8), intent(inout)  :: endPts_k2_q (0:n0_endPts_k2_q - 1,0: &
+      n1_endPts_k2_q - 1)
+  integer(kind=4), intent(in)  :: n0_endPts_k2_r
+  integer(kind=4), intent(in)  :: n1_endPts_k2_r
+  real(kind=8), intent(inout)  :: endPts_k2_r (0:n0_endPts_k2_r - 1,0: &
+      n1_endPts_k2_r - 1)
+  integer(kind=4), intent(in)  :: n0_kts1Phi
+  real(kind=8), intent(in)  :: kts1Phi (0:n0_kts1Phi - 1)
+  integer(kind=4), intent(in)  :: n0_kts2Phi
+  real(kind=8), intent(in)  :: kts2Phi (0:n0_kts2Phi - 1)
+  integer(kind=4), intent(in)  :: n0_coeffsPhi
+  integer(kind=4), intent(in)  :: n1_coeffsPhi
+  real(kind=8), intent(in)  :: coeffsPhi (0:n0_coeffsPhi - 1,0: &
+      n1_coeffsPhi - 1)
+  integer(kind=4), intent(in)  :: deg1Phi
+  integer(kind=4), intent(in)  :: deg2Phi
+  integer(kind=4), intent(in)  :: n0_kts1Pol
+  real(kind=8), intent(in)  :: kts1Pol (0:n0_kts1Pol - 1)
+  integer(kind=4), intent(in)  :: n0_kts2Pol
+  real(kind=8), intent(in)  :: kts2Pol (0:n0_kts2Pol - 1)
+  integer(kind=4), intent(in)  :: n0_coeffsPol
+  integer(kind=4), intent(in)  :: n1_coeffsPol
+  real(kind=8), intent(in)  :: coeffsPol (0:n0_coeffsPol - 1,0: &
+      n1_coeffsPol - 1)
+  integer(kind=4), intent(in)  :: deg1Pol
+  integer(kind=4), intent(in)  :: deg2Pol
+  real(kind=8), intent(in)  :: CN0
+  real(kind=8), intent(in)  :: kN0
+  real(kind=8), intent(in)  :: deltaRN0
+  real(kind=8), intent(in)  :: rp
+  real(kind=8), intent(in)  :: CTi
+  real(kind=8), intent(in)  :: kTi
+  real(kind=8), intent(in)  :: deltaRTi
+  real(kind=8), intent(in)  :: B0
+  real(kind=8), intent(in)  :: tol
+  integer(kind=4), intent(in)  :: maxLoops
+  integer(kind=4), intent(in)  :: n0_converged
+  integer(kind=4), intent(in)  :: n1_converged
+  integer(kind=4), intent(inout)  :: converged (0:n0_converged - 1,0: &
+      n1_converged - 1)
+  integer(kind=4), intent(in)  :: n0_counters
+  integer(kind=4), intent(inout)  :: counters (0:n0_counters - 1)
+  logical(kind=1), intent(in)  :: nulBound
+  integer(kind=4) :: i
+  integer(kind=4) :: j
+
+  call eval_spline_2d_cross(qPts, rPts, kts1Phi, deg1Phi, kts2Phi, &
+      deg2Phi, coeffsPhi, drPhi_0, 0, 1)
+  call eval_spline_2d_cross(qPts, rPts, kts1Phi, deg1Phi, kts2Phi, &
+      deg2Phi, coeffsPhi, dthetaPhi_0, 1, 0)
+
+  do i = 0, nPts(0) - 1, 1
+    do j = 0, nPts(1) - 1, 1
+      drPhi_0(j, i) = drPhi_0(j, i)/rPts(j)
+      dthetaPhi_0(j, i) = dthetaPhi_0(j, i)/rPts(j)
+    end do
+  end do
+
+  call poloidal_advection_step_impl_core(n0_f, n1_f, f, dt, v, n0_rPts, &
+      rPts, n0_qPts, qPts, n0_nPts, nPts, n0_drPhi_0, n1_drPhi_0, &
+      drPhi_0, n0_dthetaPhi_0, n1_dthetaPhi_0, dthetaPhi_0, n0_drPhi_k, &
+      n1_drPhi_k, drPhi_k, n0_dthetaPhi_k, n1_dthetaPhi_k, dthetaPhi_k, &
+      n0_endPts_k1_q, n1_endPts_k1_q, endPts_k1_q, n0_endPts_k1_r, &
+      n1_endPts_k1_r, endPts_k1_r, n0_endPts_k2_q, n1_endPts_k2_q, &
+      endPts_k2_q, n0_endPts_k2_r, n1_endPts_k2_r, endPts_k2_r, &
+      n0_kts1Phi, kts1Phi, n0_kts2Phi, kts2Phi, n0_coeffsPhi, &
+      n1_coeffsPhi, coeffsPhi, deg1Phi, deg2Phi, n0_kts1Pol, kts1Pol, &
+      n0_kts2Pol, kts2Pol, n0_coeffsPol, n1_coeffsPol, coeffsPol, &
+      deg1Pol, deg2Pol, CN0, kN0, deltaRN0, rp, CTi, kTi, deltaRTi, B0, &
+      tol, maxLoops, n0_converged, n1_converged, converged, &
+      n0_counters, counters, nulBound)
+
+end subroutine
+
+!==============================================================================
+subroutine poloidal_advection_step_batch(n0_f, n1_f, n2_f, n3_f, f, dt, &
+      n0_vPts, vPts, n0_rPts, rPts, n0_qPts, qPts, n0_nPts, nPts, &
+      n0_drPhi_0, n1_drPhi_0, n2_drPhi_0, drPhi_0, n0_dthetaPhi_0, &
+      n1_dthetaPhi_0, n2_dthetaPhi_0, dthetaPhi_0, n0_drPhi_k, n1_drPhi_k, drPhi_k, n0_dthetaPhi_k, &
+      n1_dthetaPhi_k, dthetaPhi_k, n0_endPts_k1_q, n1_endPts_k1_q, &
+      endPts_k1_q, n0_endPts_k1_r, n1_endPts_k1_r, endPts_k1_r, &
+      n0_endPts_k2_q, n1_endPts_k2_q, endPts_k2_q, n0_endPts_k2_r, &
+      n1_endPts_k2_r, endPts_k2_r, n0_kts1Phi, kts1Phi, n0_kts2Phi, &
+      kts2Phi, n0_coeffsPhi, n1_coeffsPhi, n2_coeffsPhi, coeffsPhi, &
+      deg1Phi, deg2Phi, n0_kts1Pol, kts1Pol, n0_kts2Pol, kts2Pol, &
+      n0_coeffsPol, n1_coeffsPol, n2_coeffsPol, n3_coeffsPol, coeffsPol, &
+      deg1Pol, deg2Pol, CN0, kN0, deltaRN0, rp, CTi, kTi, deltaRTi, B0, &
+      explicitTrap, rkOrder, tol, maxLoops, n0_converged, n1_converged, &
+      converged, n0_counters, counters, nulBound)
+
+  integer(kind=4), intent(in)  :: n0_f
+  integer(kind=4), intent(in)  :: n1_f
+  integer(kind=4), intent(in)  :: n2_f
+  integer(kind=4), intent(in)  :: n3_f
+  real(kind=8), intent(inout)  :: f (0:n0_f - 1,0:n1_f - 1,0:n2_f - 1,0: &
+      n3_f - 1)
+  real(kind=8), intent(in)  :: dt
+  integer(kind=4), intent(in)  :: n0_vPts
+  real(kind=8), intent(in)  :: vPts (0:n0_vPts - 1)
+  integer(kind=4), intent(in)  :: n0_rPts
+  real(kind=8), intent(in)  :: rPts (0:n0_rPts - 1)
+  integer(kind=4), intent(in)  :: n0_qPts
+  real(kind=8), intent(in)  :: qPts (0:n0_qPts - 1)
+  integer(kind=4), intent(in)  :: n0_nPts
+  integer(kind=4), intent(in)  :: nPts (0:n0_nPts - 1)
+  integer(kind=4), intent(in)  :: n0_drPhi_0
+  integer(kind=4), intent(in)  :: n1_drPhi_0
+  integer(kind=4), intent(in)  :: n2_drPhi_0
+  real(kind=8), intent(inout)  :: drPhi_0 (0:n0_drPhi_0 - 1,0:n1_drPhi_0 - &
+      1,0:n2_drPhi_0 - 1)
+  integer(kind=4), intent(in)  :: n0_dthetaPhi_0
+  integer(kind=4), intent(in)  :: n1_dthetaPhi_0
+  integer(kind=4), intent(in)  :: n2_dthetaPhi_0
+  real(kind=8), intent(inout)  :: dthetaPhi_0 (0:n0_dthetaPhi_0 - 1,0: &
+      n1_dthetaPhi_0 - 1,0:n2_dthetaPhi_0 - 1)
+  integer(kind=4), intent(in)  :: n0_drPhi_k
+  integer(kind=4), intent(in)  :: n1_drPhi_k
+  real(kind=8), intent(inout)  :: drPhi_k (0:n0_drPhi_k - 1,0:n1_drPhi_k &
+      - 1)
+  integer(kind=4), intent(in)  :: n0_dthetaPhi_k
+  integer(kind=4), intent(in)  :: n1_dthetaPhi_k
+  real(kind=8), intent(inout)  :: dthetaPhi_k (0:n0_dthetaPhi_k - 1,0: &
+      n1_dthetaPhi_k - 1)
+  integer(kind=4), intent(in)  :: n0_endPts_k1_q
+  integer(kind=4), intent(in)  :: n1_endPts_k1_q
+  real(kind=8), intent(inout)  :: endPts_k1_q (0:n0_endPts_k1_q - 1,0: &
+      n1_endPts_k1_q - 1)
+  integer(kind=4), intent(in)  :: n0_endPts_k1_r
+  integer(kind=4), intent(in)  :: n1_endPts_k1_r
+  real(kind=8), intent(inout)  :: endPts_k1_r (0:n0_endPts_k1_r - 1,0: &
+      n1_endPts_k1_r - 1)
+  integer(kind=4), intent(in)  :: n0_endPts_k2_q
+  integer(kind=4), intent(in)  :: n1_endPts_k2_q
+  real(kind=8), intent(inout)  :: endPts_k2_q (0:n0_endPts_k2_q - 1,0: &
+      n1_endPts_k2_q - 1)
+  integer(kind=4), intent(in)  :: n0_endPts_k2_r
+  integer(kind=4), intent(in)  :: n1_endPts_k2_r
+  real(kind=8), intent(inout)  :: endPts_k2_r (0:n0_endPts_k2_r - 1,0: &
+      n1_endPts_k2_r - 1)
+  integer(kind=4), intent(in)  :: n0_kts1Phi
+  real(kind=8), intent(in)  :: kts1Phi (0:n0_kts1Phi - 1)
+  integer(kind=4), intent(in)  :: n0_kts2Phi
+  real(kind=8), intent(in)  :: kts2Phi (0:n0_kts2Phi - 1)
+  integer(kind=4), intent(in)  :: n0_coeffsPhi
+  integer(kind=4), intent(in)  :: n1_coeffsPhi
+  integer(kind=4), intent(in)  :: n2_coeffsPhi
+  real(kind=8), intent(in)  :: coeffsPhi (0:n0_coeffsPhi - 1,0: &
+      n1_coeffsPhi - 1,0:n2_coeffsPhi - 1)
+  integer(kind=4), intent(in)  :: deg1Phi
+  integer(kind=4), intent(in)  :: deg2Phi
+  integer(kind=4), intent(in)  :: n0_kts1Pol
+  real(kind=8), intent(in)  :: kts1Pol (0:n0_kts1Pol - 1)
+  integer(kind=4), intent(in)  :: n0_kts2Pol
+  real(kind=8), intent(in)  :: kts2Pol (0:n0_kts2Pol - 1)
+  integer(kind=4), intent(in)  :: n0_coeffsPol
+  integer(kind=4), intent(in)  :: n1_coeffsPol
+  integer(kind=4), intent(in)  :: n2_coeffsPol
+  integer(kind=4), intent(in)  :: n3_coeffsPol
+  real(kind=8), intent(in)  :: coeffsPol (0:n0_coeffsPol - 1,0: &
+      n1_coeffsPol - 1,0:n2_coeffsPol - 1,0:n3_coeffsPol - 1)
+  integer(kind=4), intent(in)  :: deg1Pol
+  integer(kind=4), intent(in)  :: deg2Pol
+  real(kind=8), intent(in)  :: CN0
+  real(kind=8), intent(in)  :: kN0
+  real(kind=8), intent(in)  :: deltaRN0
+  real(kind=8), intent(in)  :: rp
+  real(kind=8), intent(in)  :: CTi
+  real(kind=8), intent(in)  :: kTi
+  real(kind=8), intent(in)  :: deltaRTi
+  real(kind=8), intent(in)  :: B0
+  logical(kind=1), intent(in)  :: explicitTrap
+  integer(kind=4), intent(in)  :: rkOrder
+  real(kind=8), intent(in)  :: tol
+  integer(kind=4), intent(in)  :: maxLoops
+  integer(kind=4), intent(in)  :: n0_converged
+  integer(kind=4), intent(in)  :: n1_converged
+  integer(kind=4), intent(inout)  :: converged (0:n0_converged - 1,0: &
+      n1_converged - 1)
+  integer(kind=4), intent(in)  :: n0_counters
+  integer(kind=4), intent(inout)  :: counters (0:n0_counters - 1)
+  logical(kind=1), intent(in)  :: nulBound
+  integer(kind=4) :: nv
+  integer(kind=4) :: nz
+  integer(kind=4) :: i
+  integer(kind=4) :: j
+
+  nv = n3_f
+  nz = n2_f
+
+  do j = 0, nz - 1, 1
+    do i = 0, nv - 1, 1
+      if (explicitTrap) then
+        call poloidal_advection_step_expl_core(n0_f, n1_f, f(:, :, j, i), &
+      dt, vPts(i), n0_rPts, rPts, n0_qPts, qPts, n0_nPts, nPts, &
+      n0_drPhi_0, n1_drPhi_0, drPhi_0(:, :, j), n0_dthetaPhi_0, &
+      n1_dthetaPhi_0, dthetaPhi_0(:, :, j), n0_drPhi_k, n1_drPhi_k, drPhi_k, n0_dthetaPhi_k, &
+      n1_dthetaPhi_k, dthetaPhi_k, n0_endPts_k1_q, n1_endPts_k1_q, &
+      endPts_k1_q, n0_endPts_k1_r, n1_endPts_k1_r, endPts_k1_r, &
+      n0_endPts_k2_q, n1_endPts_k2_q, endPts_k2_q, n0_endPts_k2_r, &
+      n1_endPts_k2_r, endPts_k2_r, n0_kts1Phi, kts1Phi, n0_kts2Phi, &
+      kts2Phi, n0_coeffsPhi, n1_coeffsPhi, coeffsPhi(:, :, j), deg1Phi, &
+      deg2Phi, n0_kts1Pol, kts1Pol, n0_kts2Pol, kts2Pol, n0_coeffsPol, &
+      n1_coeffsPol, coeffsPol(:, :, j, i), deg1Pol, deg2Pol, CN0, kN0, &
+      deltaRN0, rp, CTi, kTi, deltaRTi, B0, rkOrder, nulBound)
+      else
+        call poloidal_advection_step_impl_core(n0_f, n1_f, f(:, :, j, i), &
+      dt, vPts(i), n0_rPts, rPts, n0_qPts, qPts, n0_nPts, nPts, &
+      n0_drPhi_0, n1_drPhi_0, drPhi_0(:, :, j), n0_dthetaPhi_0, &
+      n1_dthetaPhi_0, dthetaPhi_0(:, :, j), n0_drPhi_k, n1_drPhi_k, drPhi_k, n0_dthetaPhi_k, &
+      n1_dthetaPhi_k, dthetaPhi_k, n0_endPts_k1_q, n1_endPts_k1_q, &
+      endPts_k1_q, n0_endPts_k1_r, n1_endPts_k1_r, endPts_k1_r, &
+      n0_endPts_k2_q, n1_endPts_k2_q, endPts_k2_q, n0_endPts_k2_r, &
+      n1_endPts_k2_r, endPts_k2_r, n0_kts1Phi, kts1Phi, n0_kts2Phi, &
+      kts2Phi, n0_coeffsPhi, n1_coeffsPhi, coeffsPhi(:, :, j), deg1Phi, &
+      deg2Phi, n0_kts1Pol, kts1Pol, n0_kts2Pol, kts2Pol, n0_coeffsPol, &
+      n1_coeffsPol, coeffsPol(:, :, j, i), deg1Pol, deg2Pol, CN0, kN0, &
+      deltaRN0, rp, CTi, kTi, deltaRTi, B0, tol, maxLoops, &
+      n0_converged, n1_converged, converged, n0_counters, counters, &
+      nulBound)
+      end if
+    end do
+
+  end do
+
+end subroutine
+
+!==============================================================================
+subroutine set_num_threads(n)
+
+  !$ use omp_lib, only: omp_set_num_threads
+  integer(kind=4), intent(in)  :: n
+
+  !$ call omp_set_num_threads(n)
+
+end subroutine
+
 end module
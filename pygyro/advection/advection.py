@@ -3,24 +3,30 @@ import numpy as np
 from numpy.linalg                   import solve
 from scipy.interpolate              import lagrange
 from scipy.integrate                import trapz
+from scipy.sparse                   import csr_matrix
 from math                           import pi
 
-from ..splines.splines              import BSplines, Spline1D, Spline2D
+from ..splines.splines              import BSplines, Spline1D, Spline2D, SplineEvaluationPlan
 from ..splines.spline_interpolators import SplineInterpolator1D, SplineInterpolator2D
-from ..splines                      import spline_eval_funcs as SEF
 from ..initialisation.mod_initialiser_funcs   import fEq
 from ..model.layout                 import Layout
 from ..model.grid                   import Grid
-from .                              import accelerated_advection_steps as AAS
+from ..backends                     import load_kernels
 
-if ('mod_pygyro_advection_accelerated_advection_steps' in dir(AAS)):
-    AAS = AAS.mod_pygyro_advection_accelerated_advection_steps
-    modFunc = np.transpose
-else:
-    modFunc = lambda x: x
+AAS = load_kernels('advection.accelerated_advection_steps')
 
-if ('mod_pygyro_splines_spline_eval_funcs' in dir(SEF)):
-    SEF = SEF.mod_pygyro_splines_spline_eval_funcs
+def set_num_threads(n: int):
+    """
+    Set the number of threads used by the accelerated advection steps.
+    Only the fortran version compiled with OpenMP is multithreaded
+
+    Parameters
+    ----------
+    n : int
+        The number of threads
+
+    """
+    AAS.set_num_threads(n)
 
 def fieldline(theta,z_diff,iota,r,R0):
     return np.mod(theta+iota(r)*z_diff/R0,2*pi)
@@ -38,6 +44,10 @@ class ParallelGradient:
     eta_grid : list of array_like
         The coordinates of the grid points in each dimension
 
+    layout : Layout
+        The layout in which the derivative is computed. Only the values
+        of r stored locally in this layout are handled
+
     constants : Constant class
         Class containing all the constants
     
@@ -64,21 +74,47 @@ class ParallelGradient:
         # Save the inverse as it is used multiple times
         self._inv_dz = 1.0/self._dz
         
-        r = eta_grid[0][layout.starts[layout.inv_dims_order[0]] : \
-                     layout.ends  [layout.inv_dims_order[0]]    ]
-        
-        # Determine bz
-        self._bz = 1 / np.sqrt(1+(r * constants.iota(r)/constants.R0)[:,None]**2)
-        
         # Save the necessary spline and interpolator
         self._interpolator = SplineInterpolator1D(spline)
         self._thetaSpline = Spline1D(spline)
+        self._thetaCoeffs = np.empty([self._nz,self._thetaSpline.coeffs.size])
+        
+        self._eta_grid = eta_grid
+        self._iota = constants.iota
+        self._R0 = constants.R0
+        
+        self._rRange = None
+        self.setLayout(layout)
+    
+    def setLayout( self, layout: Layout ):
+        """
+        Set the layout in which the derivative is computed. If the values
+        of r stored locally change then the operators are discarded and
+        are computed again for the new values when they are first used
+
+        Parameters
+        ----------
+        layout : Layout
+            The layout in which the derivative is computed
+        
+        """
+        rRange = (layout.starts[layout.inv_dims_order[0]],
+                  layout.ends  [layout.inv_dims_order[0]])
+        if (rRange==self._rRange):
+            return
+        
+        self._rRange = rRange
+        self._r = self._eta_grid[0][rRange[0]:rRange[1]]
+        
+        # Determine bz
+        self._bz = 1 / np.sqrt(1+(self._r * self._iota(self._r)/self._R0)**2)
         
         # The positions at which the spline will be evaluated are always the same.
-        # They can therefore be calculated in advance
-        self._thetaVals = np.empty([eta_grid[0].size, self._nz, order+1, self._nq])
-        for i,r in enumerate(eta_grid[0]):
-            self._getThetaVals(r,self._thetaVals[i],eta_grid,constants.iota,constants.R0)
+        # The evaluation of the splines and the finite differences coefficients
+        # can therefore be combined into one sparse matrix per shift acting on
+        # the coefficients of a plane. The operators are only computed for the
+        # values of r which are used
+        self._operators = [None]*self._r.size
     
     def getCoeffsFirstDeriv( self, n: int):
         b=np.zeros(n)
@@ -87,10 +123,6 @@ class ParallelGradient:
         start = 1-(n+1)//2
         # Create the shifts
         self._shifts = np.arange(n)+start
-        # Save the number of forward and backward steps to avoid
-        # unnecessary modulo operations
-        self._fwdSteps = -start
-        self._bkwdSteps = self._shifts[-1]
         
         # Create the matrix
         A=np.zeros([n,n])
@@ -101,14 +133,30 @@ class ParallelGradient:
         # Solve the linear system to find the coefficients
         self._coeffs = solve(A,b)
     
-    def _getThetaVals( self, r: float, thetaVals: np.ndarray, eta_grid: list, iota, R0 ):
-        # The positions at which the spline will be evaluated are always the same.
-        # They can therefore be calculated in advance
-        n = eta_grid[2].size
-        
-        for k,z in enumerate(eta_grid[2]):
-            for i,l in enumerate(self._shifts):
-                thetaVals[(k+l)%n,i,:]=fieldline(eta_grid[1],self._dz*l,iota,r,R0)
+    def _getOperator( self, i: int ):
+        """
+        Get the sparse matrices which map the coefficients of the spline
+        along theta on one plane to the values on the field lines at the
+        i-th value of r stored locally. There is one matrix for each shift
+        of the finite differences scheme. They do not depend on z and
+        include the finite differences coefficient and the factor bz/dz
+        """
+        r = self._r[i]
+        basis = self._thetaSpline.basis
+        nCoeffs = self._thetaSpline.coeffs.size
+        factor = self._bz[i]*self._inv_dz
+        
+        operator = []
+        for s,c in zip(self._shifts,self._coeffs):
+            # Values of the basis functions at the points on the field line
+            evalMat = csr_matrix(SplineInterpolator1D.collocation_matrix(basis.knots,
+                            basis.degree,fieldline(self._eta_grid[1],self._dz*s,
+                                                   self._iota,r,self._R0),
+                            basis.periodic))
+            evalMat.resize((self._nq,nCoeffs))
+            operator.append((s,evalMat*(c*factor)))
+        
+        return operator
     
     def parallel_gradient( self, phi_r: np.ndarray, i : int, der: np.ndarray ):
         """
@@ -127,39 +175,22 @@ class ParallelGradient:
             Array which will contain the solution
         
         """
-        # Get scalar values necessary for this slice
-        bz=self._bz[i]
-        thetaVals = self._thetaVals[i]
         assert(der.shape==phi_r.shape)
-        der[:]=0
-        
-        # For each value of z interpolate the spline along theta and add
-        # the value multiplied by the corresponding coefficient to the
-        # derivative at the point at which it is required
-        # This is split into three steps to avoid unnecessary modulo operations
-        tmp = np.empty(self._nq)
-        for i in range(self._fwdSteps):
-            self._interpolator.compute_interpolant(phi_r[i,:],self._thetaSpline)
-            for j,(s,c) in enumerate(zip(self._shifts,self._coeffs)):
-                SEF.eval_spline_1d_vector(thetaVals[i,j,:],self._thetaSpline.basis.knots,
-                                    self._thetaSpline.basis.degree,self._thetaSpline.coeffs,tmp,0)
-                der[(i-s)%self._nz,:]+=c*tmp
-        
-        for i in range(self._fwdSteps,self._nz-self._bkwdSteps):
-            self._interpolator.compute_interpolant(phi_r[i,:],self._thetaSpline)
-            for j,(s,c) in enumerate(zip(self._shifts,self._coeffs)):
-                SEF.eval_spline_1d_vector(thetaVals[i,j,:],self._thetaSpline.basis.knots,
-                                    self._thetaSpline.basis.degree,self._thetaSpline.coeffs,tmp,0)
-                der[(i-s),:]+=c*tmp
-        
-        for i in range(self._nz-self._bkwdSteps,self._nz):
-            self._interpolator.compute_interpolant(phi_r[i,:],self._thetaSpline)
-            for j,(s,c) in enumerate(zip(self._shifts,self._coeffs)):
-                SEF.eval_spline_1d_vector(thetaVals[i,j,:],self._thetaSpline.basis.knots,
-                                    self._thetaSpline.basis.degree,self._thetaSpline.coeffs,tmp,0)
-                der[(i-s)%self._nz,:]+=c*tmp
-        
-        der*= ( bz * self._inv_dz )
+        
+        if (self._operators[i] is None):
+            self._operators[i] = self._getOperator(i)
+        
+        # Interpolate the spline along theta for all values of z
+        self._interpolator.compute_interpolant_batch(phi_r,self._thetaCoeffs)
+        
+        der[:] = 0
+        
+        # Evaluate the splines on the field lines for all values of z at
+        # once. The derivative at z uses the spline on the line z+s so
+        # the values are shifted onto the line where they are used
+        for s,evalMat in self._operators[i]:
+            vals = evalMat.dot(self._thetaCoeffs.T).T
+            der += np.roll(vals,-s,axis=0)
         
         return der
 
@@ -197,9 +228,14 @@ class FluxSurfaceAdvection:
         self._nPoints = (self._points[0].size,self._points[1].size)
         self._interpolator = SplineInterpolator1D(splines[0])
         self._thetaSpline = Spline1D(splines[0])
+        self._thetaCoeffs = np.empty([self._nPoints[1],self._thetaSpline.coeffs.size])
         
         self._getLagrangePts(eta_grid,layout,dt,constants.iota,constants.R0)
-        self._LagrangeVals = np.ndarray([self._nPoints[1],self._nPoints[0], self._zLagrangePts])
+        
+        # The values of the theta basis functions at the foot points
+        # only depend on r and the shift in the z direction. They are
+        # computed the first time they are needed and stored here
+        self._footPointMatrices = {}
     
     def _getLagrangePts( self, eta_grid: list, layout: Layout, dt: float, iota, R0 ):
         # Get z step
@@ -274,19 +310,47 @@ class FluxSurfaceAdvection:
         """
         assert(f.shape==self._nPoints)
         
-        # find the values of the function at each required point
-        for i in range(self._nPoints[1]):
-            self._interpolator.compute_interpolant(f[:,i],self._thetaSpline)
-            
-            AAS.get_lagrange_vals(i,self._nPoints[1],self._shifts[rIdx,cIdx],
-                                modFunc(self._LagrangeVals),self._points[0],
-                                self._thetaShifts[rIdx,cIdx],self._thetaSpline.basis.knots,
-                                self._thetaSpline.basis.degree,
-                                self._thetaSpline.coeffs)
-        
-        AAS.flux_advection(*self._nPoints,modFunc(f),
-                            self._lagrangeCoeffs[rIdx,cIdx],
-                            modFunc(self._LagrangeVals))
+        # Interpolate the spline along theta for all values of z
+        self._interpolator.compute_interpolant_batch(f,self._thetaCoeffs.T,axis=0)
+        
+        f[:] = 0
+        
+        # For each line used in the lagrange interpolation evaluate the
+        # splines at the foot points for all values of z at once and add
+        # the result, multiplied by the lagrange coefficient, to the line
+        # which is shifted onto it
+        for s,thetaShift,c in zip(self._shifts[rIdx,cIdx],self._thetaShifts[rIdx,cIdx],
+                                  self._lagrangeCoeffs[rIdx,cIdx]):
+            footPointMat = self._getFootPointMatrix(rIdx,s,thetaShift)
+            vals = footPointMat.dot(self._thetaCoeffs[:,:footPointMat.shape[1]].T)
+            f += c*np.roll(vals,-s,axis=1)
+    
+    def _getFootPointMatrix( self, rIdx: int, shift: int, thetaShift: float ):
+        """
+        Get the sparse matrix containing the values of the theta basis
+        functions at the foot points q+thetaShift. The matrix is computed
+        the first time that it is required for a given r and shift
+
+        Parameters
+        ----------
+        rIdx: int
+            The current index of r
+        
+        shift: int
+            The number of steps in the z direction
+        
+        thetaShift: float
+            The corresponding shift in the theta direction
+        
+        """
+        key = (rIdx,shift)
+        if (key not in self._footPointMatrices):
+            basis = self._thetaSpline.basis
+            footPoints = np.mod(self._points[0]+thetaShift,2*pi)
+            self._footPointMatrices[key] = csr_matrix(
+                    SplineInterpolator1D.collocation_matrix(basis.knots,
+                            basis.degree,footPoints,basis.periodic))
+        return self._footPointMatrices[key]
     
     def gridStep( self, grid: Grid ):
         assert(grid.getLayout(grid.currentLayout).dims_order==(0,3,1,2))
@@ -323,6 +387,8 @@ class VParallelAdvection:
         self._interpolator = SplineInterpolator1D(splines)
         self._spline = Spline1D(splines)
         self._constants = constants
+        self._coeffs = None
+        self._footPlan = None
         
         if (edge=='fEq'):
             self._edgeType = 0
@@ -356,28 +422,171 @@ class VParallelAdvection:
         
         """
         assert(f.shape==self._nPoints)
-        self._interpolator.compute_interpolant(f,self._spline)
-        
-        AAS.v_parallel_advection_eval_step(f,self._points-c*dt,r,self._points[0],
-                                        self._points[-1],self._spline.basis.knots,
-                                        self._spline.basis.degree,self._spline.coeffs,
-                                        self._constants.CN0,self._constants.kN0,
+        inside, spans, basisVals, edgeVals, vals = self._getFootPlan(c*dt,r)
+        
+        # The foot points are the same for each call with the same c*dt and
+        # r so the interpolation and the evaluation are carried out in one
+        # pass without storing the spline coefficients
+        if (spans.size>0):
+            self._interpolator.interpolate_and_eval(f,spans,basisVals,vals)
+        f[inside] = vals
+        f[~inside] = edgeVals
+    
+    def _getFootPlan( self, cdt: float, r: float ):
+        """
+        Get the spans and the values of the basis functions at the foot
+        points which lie inside the domain, and the boundary values at the
+        other foot points. The plan is only computed again when c*dt or r
+        change
+        """
+        if (self._footPlan is None or self._footPlan[0]!=(cdt,r)):
+            vMin = self._points[0]
+            vMax = self._points[-1]
+            feet = self._points-cdt
+            
+            if (self._edgeType==2):
+                feet = vMin + np.mod(feet-vMin,vMax-vMin)
+                inside = np.ones(feet.size,dtype=bool)
+            else:
+                inside = (feet>=vMin) & (feet<=vMax)
+            
+            if (self._edgeType==0):
+                edgeVals = np.array([fEq(r,v,self._constants.CN0,self._constants.kN0,
                                         self._constants.deltaRN0,self._constants.rp,
                                         self._constants.CTi,self._constants.kTi,
-                                        self._constants.deltaRTi,self._edgeType)
+                                        self._constants.deltaRTi) for v in feet[~inside]])
+            else:
+                edgeVals = np.zeros(np.count_nonzero(~inside))
+            
+            basis = self._spline.basis
+            spans, basisVals = SplineInterpolator1D.basis_values(basis.knots,basis.degree,
+                                                                 feet[inside])
+            self._footPlan = ((cdt,r),inside,spans,basisVals,edgeVals,np.empty(spans.size))
+        return self._footPlan[1:]
     
     def gridStep( self, grid: Grid, phi: Grid, parGrad: ParallelGradient, parGradVals: np.array, dt: float):
+        parGrad.setLayout(phi.getLayout(phi.currentLayout))
         for i,r in grid.getCoords(0):
             parGrad.parallel_gradient(np.real(phi.get2DSlice([i])),i,parGradVals[i])
-            for j,z in grid.getCoords(1):
-                for k,q in grid.getCoords(2):
-                    self.step(grid.get1DSlice([i,j,k]),dt,parGradVals[i,j,k],r)
+        self.gridStepKeepGradient(grid,parGradVals,dt)
     
     def gridStepKeepGradient( self, grid: Grid, parGradVals, dt: float):
-        for i,r in grid.getCoords(0):
-            for j,z in grid.getCoords(1):
-                for k,q in grid.getCoords(2):
-                    self.step(grid.get1DSlice([i,j,k]),dt,parGradVals[i,j,k],r)
+        """
+        Carry out an advection step for the v-parallel advection on all
+        the lines stored locally
+
+        The spline coefficients of every line are computed with one
+        multiple right hand side solve and the new values are evaluated
+        in a single call to the accelerated kernel
+
+        Parameters
+        ----------
+        grid: Grid
+            The distribution function in the v_parallel layout.
+            The result will be stored here
+        
+        parGradVals: array_like
+            The parallel gradient of phi for the locally stored values of r
+            and all values of z and theta
+        
+        dt: float
+            Time-step
+        
+        """
+        layout = grid.getLayout(grid.currentLayout)
+        nr,nz,nq,nv = layout.shape
+        if (nr*nz*nq==0):
+            return
+        assert(nv==self._nPoints[0])
+        
+        nCoeffs = self._spline.coeffs.size
+        if (self._coeffs is None or self._coeffs.shape!=(nr,nz,nq,nCoeffs)):
+            self._coeffs = np.empty((nr,nz,nq,nCoeffs))
+        
+        self._interpolator.compute_interpolant_batch(grid._f,self._coeffs)
+        
+        f = grid._f.reshape(nr,nz*nq,nv)
+        
+        # The parallel gradient is stored for all values of z
+        zStart = layout.starts[1]
+        c = parGradVals[:nr,zStart:zStart+nz,:].reshape(nr,nz*nq)
+        
+        AAS.v_parallel_advection_eval_step_batch(f,self._points,
+                                        grid.getCoordVals(0),c,dt,
+                                        self._points[0],self._points[-1],
+                                        self._spline.basis.knots,
+                                        self._spline.basis.degree,
+                                        self._coeffs.reshape(nr,nz*nq,nCoeffs),
+                                        self._constants.CN0,self._constants.kN0,
+                                        self._constants.deltaRN0,self._constants.rp,
+                                        self._constants.CTi,self._constants.kTi,
+                                        self._constants.deltaRTi,self._edgeType)
+
+class PoloidalWorkspace:
+    """
+    PoloidalWorkspace: Class containing the work arrays used by the
+    poloidal advection. The arrays are only created once so that no
+    memory is allocated when an advection step is carried out
+
+    Parameters
+    ----------
+    nPoints: tuple of int
+        The number of points in the theta and r directions
+    
+    coeffShape: tuple of int
+        The shape of the coefficients of a spline on the poloidal plane
+
+    """
+    def __init__( self, nPoints: tuple, coeffShape: tuple ):
+        self._nPoints = nPoints
+        self._coeffShape = coeffShape
+        
+        self.drPhi_0 = np.empty(nPoints)
+        self.dqPhi_0 = np.empty(nPoints)
+        self.drPhi_k = np.empty(nPoints)
+        self.dqPhi_k = np.empty(nPoints)
+        self.endPts_k1_q = np.empty(nPoints)
+        self.endPts_k1_r = np.empty(nPoints)
+        self.endPts_k2_q = np.empty(nPoints)
+        self.endPts_k2_r = np.empty(nPoints)
+        
+        # Work array marking the points whose foot has converged in the
+        # implicit trapezoidal rule, and the number of iterations and of
+        # unconverged points in the last step
+        self.converged = np.empty(nPoints,dtype=np.int32)
+        self.counters = np.zeros(2,dtype=np.int32)
+        
+        # Arrays grouped as expected by the accelerated functions
+        self.phiDerivs = (self.drPhi_0, self.dqPhi_0)
+        self.stepArrays = (self.drPhi_k, self.dqPhi_k,
+                           self.endPts_k1_q, self.endPts_k1_r,
+                           self.endPts_k2_q, self.endPts_k2_r)
+        
+        # Coefficients of the splines approximating phi on each z plane and
+        # f on each (v,z) plane, and the derivatives of phi (divided by r)
+        # at the nodes of each z plane. They are allocated when the shape
+        # of the block is known
+        self.phiCoeffs = None
+        self.drPhi_planes = None
+        self.dqPhi_planes = None
+        self.fCoeffs = None
+    
+    def setPhiPlanes( self, nz: int ):
+        """
+        Ensure that the arrays describing phi are allocated for nz planes
+        """
+        if (self.phiCoeffs is None or self.phiCoeffs.shape[0]!=nz):
+            self.phiCoeffs = np.empty((nz,)+self._coeffShape)
+            self.drPhi_planes = np.empty((nz,)+self._nPoints)
+            self.dqPhi_planes = np.empty((nz,)+self._nPoints)
+    
+    def setFPlanes( self, planeShape: tuple ):
+        """
+        Ensure that the arrays describing f are allocated for the planes
+        of a block whose leading dimensions are planeShape
+        """
+        if (self.fCoeffs is None or self.fCoeffs.shape[:-2]!=planeShape):
+            self.fCoeffs = np.empty(planeShape+self._coeffShape)
 
 class PoloidalAdvection:
     """
@@ -404,12 +613,26 @@ class PoloidalAdvection:
         should be used or the implicit trapezoidal method should be used
         instead
     
+    rkOrder: int - optional
+        The order of the explicit method used to find the foot of the
+        characteristics when explicitTrap is True. 2 uses Heun's method,
+        3 the strong stability preserving RK3 method and 4 the classic
+        RK4 method
+        Default is 2
+    
     tol: float - optional
         The tolerance used for the implicit trapezoidal rule
+    
+    maxLoops: int - optional
+        The maximum number of iterations used for the implicit trapezoidal
+        rule. Points which have not converged after this many iterations
+        are counted in nUnconverged
+        Default is 100
 
     """
     def __init__( self, eta_vals: list, splines: list, constants, nulEdge = False,
-                    explicitTrap: bool =  True, tol: float = 1e-10 ):
+                    explicitTrap: bool =  True, tol: float = 1e-10,
+                    maxLoops: int = 100, rkOrder: int = 2 ):
         self._points = eta_vals[1::-1]
         self._shapedQ = np.atleast_2d(self._points[0]).T
         self._nPoints = (self._points[0].size,self._points[1].size)
@@ -418,22 +641,39 @@ class PoloidalAdvection:
         self._constants = constants
         
         self._explicit = explicitTrap
+        assert(rkOrder in (2,3,4))
+        self._rkOrder = rkOrder
         self._TOL = tol
         
         self._nulEdge=nulEdge
         
-        self._drPhi_0 = np.empty(self._nPoints)
-        self._dqPhi_0 = np.empty(self._nPoints)
-        self._drPhi_k = np.empty(self._nPoints)
-        self._dqPhi_k = np.empty(self._nPoints)
-        self._endPts_k1_q = np.empty(self._nPoints)
-        self._endPts_k1_r = np.empty(self._nPoints)
-        self._endPts_k2_q = np.empty(self._nPoints)
-        self._endPts_k2_r = np.empty(self._nPoints)
-        
-        self._max_loops = 0
+        # Work arrays used by all the backends
+        self._work = PoloidalWorkspace(self._nPoints,self._spline.coeffs.shape)
+        self._max_loops = maxLoops
         
-        self._phiSplines = [Spline2D(splines[0],splines[1]) for i in range(eta_vals[2].size)]
+        # Plans evaluating the splines along each direction, and their
+        # derivatives, at the grid points
+        self._thetaPlan = SplineEvaluationPlan(splines[0],self._points[0])
+        self._dthetaPlan = SplineEvaluationPlan(splines[0],self._points[0],der=1)
+        self._rPlan = SplineEvaluationPlan(splines[1],self._points[1])
+        self._drPlan = SplineEvaluationPlan(splines[1],self._points[1],der=1)
+    
+    @property
+    def nIterations( self ):
+        """
+        The number of iterations of the implicit trapezoidal rule carried
+        out in the last step, summed over all the planes
+        """
+        return int(self._work.counters[0])
+    
+    @property
+    def nUnconverged( self ):
+        """
+        The number of points whose foot had not converged when the
+        iteration limit was reached in the last step, summed over all the
+        planes
+        """
+        return int(self._work.counters[1])
     
     def step( self, f: np.ndarray, dt: float, phi: Spline2D, v: float ):
         """
@@ -460,39 +700,37 @@ class PoloidalAdvection:
         
         phiBases = phi.basis
         polBases = self._spline.basis
+        work = self._work
 
         if (self._explicit):
-            AAS.poloidal_advection_step_expl( modFunc(f), dt, v, self._points[1],
-                            self._points[0], self._nPoints, modFunc(self._drPhi_0),
-                            modFunc(self._dqPhi_0), modFunc(self._drPhi_k),
-                            modFunc(self._dqPhi_k), modFunc(self._endPts_k1_q),
-                            modFunc(self._endPts_k1_r), modFunc(self._endPts_k2_q),
-                            modFunc(self._endPts_k2_r), phiBases[0].knots,
-                            phiBases[1].knots, modFunc(phi.coeffs),
+            AAS.poloidal_advection_step_expl( f, dt, v, self._points[1],
+                            self._points[0], self._nPoints, *work.phiDerivs,
+                            *work.stepArrays, phiBases[0].knots,
+                            phiBases[1].knots, phi.coeffs,
                             phiBases[0].degree, phiBases[1].degree,
                             polBases[0].knots, polBases[1].knots,
-                            modFunc(self._spline.coeffs), polBases[0].degree,
+                            self._spline.coeffs, polBases[0].degree,
                             polBases[1].degree, self._constants.CN0,
                             self._constants.kN0, self._constants.deltaRN0,
                             self._constants.rp, self._constants.CTi,
                             self._constants.kTi, self._constants.deltaRTi,
-                            self._constants.B0, self._nulEdge)
+                            self._constants.B0, self._rkOrder, self._nulEdge)
         else:
-            AAS.poloidal_advection_step_impl( modFunc(f), dt, v, self._points[1],
-                            self._points[0], self._nPoints, modFunc(self._drPhi_0),
-                            modFunc(self._dqPhi_0), modFunc(self._drPhi_k),
-                            modFunc(self._dqPhi_k), modFunc(self._endPts_k1_q),
-                            modFunc(self._endPts_k1_r), modFunc(self._endPts_k2_q),
-                            modFunc(self._endPts_k2_r), phiBases[0].knots,
-                            phiBases[1].knots, modFunc(phi.coeffs),
+            work.counters[:] = 0
+            AAS.poloidal_advection_step_impl( f, dt, v, self._points[1],
+                            self._points[0], self._nPoints, *work.phiDerivs,
+                            *work.stepArrays, phiBases[0].knots,
+                            phiBases[1].knots, phi.coeffs,
                             phiBases[0].degree, phiBases[1].degree,
                             polBases[0].knots, polBases[1].knots,
-                            modFunc(self._spline.coeffs), polBases[0].degree,
+                            self._spline.coeffs, polBases[0].degree,
                             polBases[1].degree, self._constants.CN0,
                             self._constants.kN0, self._constants.deltaRN0,
                             self._constants.rp, self._constants.CTi,
                             self._constants.kTi, self._constants.deltaRTi,
-                            self._constants.B0, self._TOL,self._nulEdge)
+                            self._constants.B0, self._TOL, self._max_loops,
+                            work.converged, work.counters,
+                            self._nulEdge)
     
     def exact_step( self, f, endPts, v ):
         assert(f.shape==self._nPoints)
@@ -503,22 +741,88 @@ class PoloidalAdvection:
                 f[i,j]=self.evalFunc(endPts[0][i,j],endPts[1][i,j],v)
     
     def gridStep ( self, grid: Grid, phi: Grid, dt: float ):
+        """
+        Carry out an advection step for the poloidal advection on all
+        planes of the grid
+
+        Parameters
+        ----------
+        grid: Grid
+            The distribution function in the poloidal layout.
+            The result will be stored here
+        
+        phi: Grid
+            The electric potential in the corresponding 3D layout
+        
+        dt: float
+            Time-step
+        
+        """
         gridLayout = grid.getLayout(grid.currentLayout)
         phiLayout = phi.getLayout(grid.currentLayout)
         assert(gridLayout.dims_order[1:]==phiLayout.dims_order)
         assert(gridLayout.dims_order==(3,2,1,0))
+        
         # Evaluate splines
-        for j,z in grid.getCoords(1):
-            self._interpolator.compute_interpolant(np.real(phi.get2DSlice([j])),self._phiSplines[j])
+        work = self._work
+        nz = phi._f.shape[0]
+        work.setPhiPlanes(nz)
+        
+        # np.real returns a strided view of a complex grid so phi is
+        # interpolated without copying the planes
+        self._interpolator.compute_interpolant_batch(np.real(phi._f),work.phiCoeffs)
+        
+        # The derivatives of phi do not depend on v so they are computed
+        # once here for each z and reused for all the velocities. The
+        # evaluation points are the grid points so the precomputed plans
+        # are applied along r and then along theta
+        work.drPhi_planes[:] = self._thetaPlan.eval(self._drPlan.eval(work.phiCoeffs),axis=1)
+        work.dqPhi_planes[:] = self._dthetaPlan.eval(self._rPlan.eval(work.phiCoeffs),axis=1)
+        work.drPhi_planes /= self._points[1]
+        work.dqPhi_planes /= self._points[1]
+        
         # Do step
-        for i,v in grid.getCoords(0):
-            for j,z in grid.getCoords(1):
-                self.step(grid.get2DSlice([i,j]),dt,self._phiSplines[j],v)
+        self.gridStep_SplinesUnchanged(grid,dt)
     
     def gridStep_SplinesUnchanged ( self, grid: Grid, dt: float ):
+        """
+        Carry out an advection step for the poloidal advection on all
+        planes of the grid using the spline approximation of phi and its
+        derivatives computed in the previous call to gridStep
+
+        Parameters
+        ----------
+        grid: Grid
+            The distribution function in the poloidal layout.
+            The result will be stored here
+        
+        dt: float
+            Time-step
+        
+        """
         gridLayout = grid.getLayout(grid.currentLayout)
         assert(gridLayout.dims_order==(3,2,1,0))
-        # Do step
-        for i,v in grid.getCoords(0):
-            for j,z in grid.getCoords(1):
-                self.step(grid.get2DSlice([i,j]),dt,self._phiSplines[j],v)
+        work = self._work
+        assert(work.phiCoeffs is not None)
+        
+        work.setFPlanes(grid._f.shape[:2])
+        self._interpolator.compute_interpolant_batch(grid._f,work.fCoeffs)
+        
+        bases = self._spline.basis
+        
+        work.counters[:] = 0
+        AAS.poloidal_advection_step_batch( grid._f, dt, grid.getCoordVals(0),
+                            self._points[1], self._points[0], self._nPoints,
+                            work.drPhi_planes, work.dqPhi_planes,
+                            *work.stepArrays, bases[0].knots, bases[1].knots,
+                            work.phiCoeffs, bases[0].degree,
+                            bases[1].degree, bases[0].knots,
+                            bases[1].knots, work.fCoeffs,
+                            bases[0].degree, bases[1].degree,
+                            self._constants.CN0, self._constants.kN0,
+                            self._constants.deltaRN0, self._constants.rp,
+                            self._constants.CTi, self._constants.kTi,
+                            self._constants.deltaRTi, self._constants.B0,
+                            self._explicit, self._rkOrder, self._TOL, self._max_loops,
+                            work.converged, work.counters,
+                            self._nulEdge)
@@ -220,7 +220,8 @@ def test_poloidalAdvection_constantAdv(initConditions):
         print("\\hline")
 
 @pytest.mark.serial
-def test_poloidalAdvection_constantAdv_dt():
+@pytest.mark.parametrize( "rkOrder", [2,3,4] )
+def test_poloidalAdvection_constantAdv_dt(rkOrder):
     dt=0.2
     
     nconvpts = 5
@@ -259,7 +260,8 @@ def test_poloidalAdvection_constantAdv_dt():
         eta_vals[0]=eta_grids[0]
         eta_vals[1]=eta_grids[1]
         
-        polAdv = PoloidalAdvection(eta_vals, bsplines[::-1],constants,True)
+        polAdv = PoloidalAdvection(eta_vals, bsplines[::-1],constants,True,
+                                    rkOrder = rkOrder)
         
         phi = Spline2D(bsplines[1],bsplines[0])
         phiVals = np.empty([npts[1],npts[0]])
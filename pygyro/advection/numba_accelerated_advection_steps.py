@@ -2,33 +2,175 @@ from numba              import njit
 from numba.types        import Tuple, f8, i4, b1
 from numba.pycc         import CC
 from math               import pi
-from numpy              import abs
+from numpy              import abs, empty, int32
 import sys
-sys.path.insert(0,'..')
+sys.path.insert(0,'../..')
 
-from initialisation.numba_mod_initialiser_funcs     import n0, Ti, fEq
-from splines.numba_spline_eval_funcs                import eval_spline_2d_cross, eval_spline_2d_scalar, \
-                                                            eval_spline_1d_scalar, eval_spline_1d_vector
+from pygyro.initialisation.numba_mod_initialiser_funcs  import n0, Ti, fEq
+from pygyro.splines.numba_spline_eval_funcs             import eval_spline_2d_cross, eval_spline_2d_scalar_work, \
+                                                            eval_spline_2d_multi_work, eval_spline_1d_scalar, \
+                                                            eval_spline_1d_vector
 
 shape2 = Tuple([i4,i4])
 
 cc = CC('accelerated_advection_steps')
 
-@cc.export('poloidal_advection_step_expl', (f8[:,:],f8,f8,f8[:],f8[:], \
-                                          shape2,f8[:,:],f8[:,:],f8[:,:],\
-                                          f8[:,:],f8[:,:],f8[:,:],f8[:,:],\
-                                          f8[:,:],f8[:],f8[:],f8[:,:],\
-                                          i4,i4, f8[:],f8[:],f8[:,:],\
-                                          i4,i4,f8,f8,f8,f8,f8,f8,f8,f8,b1))
-def poloidal_advection_step_expl( f, dt, v, rPts, qPts, nPts,
+@njit
+def poloidal_velocity( q, r, rMin, rMax, kts1Phi, deg1Phi, kts2Phi, deg2Phi,
+                        coeffsPhi, ders, vel, basis1, basis2 ):
+    """
+    Evaluate several derivatives of phi, divided by r, at a point of the
+    poloidal plane. The span and the basis functions are only computed
+    once for all the derivatives. The advection is stopped outside the
+    domain so the derivatives are set to 0 if r is not in [rMin,rMax]
+
+    Parameters
+    ----------
+    q: float
+        The theta coordinate of the point
+    
+    r: float
+        The r coordinate of the point
+    
+    ders: array_like
+        ders[k] contains the number of derivatives in the theta and r
+        directions of the k-th derivative
+    
+    vel: array_like
+        Array in which the k-th derivative is stored in vel[k]
+    
+    basis1: array_like
+    basis2: array_like
+        Work arrays of shape (2,deg+1) in which the values of the basis
+        functions and of their derivatives are stored
+    
+    """
+    if (r<rMin or r>rMax):
+        for k in range(len(vel)):
+            vel[k] = 0.0
+        return
+    
+    # Handle theta boundary conditions
+    while (q<0):
+        q+=2*pi
+    while (q>2*pi):
+        q-=2*pi
+    
+    eval_spline_2d_multi_work(q,r,kts1Phi, deg1Phi, kts2Phi, deg2Phi,
+                            coeffsPhi,ders,vel,basis1,basis2)
+    for k in range(len(vel)):
+        vel[k] /= r
+
+@njit
+def poloidal_advection_feet_rk( rkOrder, multFactor, rPts, qPts, nPts,
+                        drPhi_0, dthetaPhi_0, endPts_q, endPts_r,
+                        kts1Phi, kts2Phi, coeffsPhi, deg1Phi, deg2Phi ):
+    """
+    Find the foot of the characteristic passing through each node using
+    the strong stability preserving RK3 method (rkOrder=3) or the
+    classic RK4 method (rkOrder=4). The first stage uses the derivatives
+    of phi at the nodes, divided by r, which are provided in drPhi_0 and
+    dthetaPhi_0
+
+    Parameters
+    ----------
+    rkOrder: int
+        The order of the method
+    
+    multFactor: float
+        The time-step divided by B0
+    
+    endPts_q: array_like
+        The theta coordinate of the feet. The result will be stored here
+    
+    endPts_r: array_like
+        The r coordinate of the feet. The result will be stored here
+    
+    """
+    idx = nPts[1]-1
+    rMin = rPts[0]
+    rMax = rPts[idx]
+    
+    # Work arrays in which the values of the basis functions and of
+    # their derivatives are stored, and in which the derivatives of phi
+    # (0,1) and (1,0) are returned
+    basis1 = empty((2,deg1Phi+1))
+    basis2 = empty((2,deg2Phi+1))
+    vel = empty(2)
+    ders = empty((2,2),dtype=int32)
+    ders[0,0] = 0
+    ders[0,1] = 1
+    ders[1,0] = 1
+    ders[1,1] = 0
+    
+    for i in range(nPts[0]):
+        for j in range(nPts[1]):
+            k1_q = -drPhi_0[i,j]*multFactor
+            k1_r = dthetaPhi_0[i,j]*multFactor
+            
+            if (rkOrder==3):
+                # x' = x^n + k1
+                q = qPts[i] + k1_q
+                r = rPts[j] + k1_r
+                poloidal_velocity(q, r, rMin, rMax, kts1Phi, deg1Phi, kts2Phi,
+                                    deg2Phi, coeffsPhi, ders, vel, basis1, basis2)
+                k2_q = -vel[0]*multFactor
+                k2_r =  vel[1]*multFactor
+                
+                # x'' = x^n + 0.25*( k1 + k2 )
+                q = qPts[i] + 0.25*(k1_q + k2_q)
+                r = rPts[j] + 0.25*(k1_r + k2_r)
+                poloidal_velocity(q, r, rMin, rMax, kts1Phi, deg1Phi, kts2Phi,
+                                    deg2Phi, coeffsPhi, ders, vel, basis1, basis2)
+                k3_q = -vel[0]*multFactor
+                k3_r =  vel[1]*multFactor
+                
+                # x^{n+1} = x^n + ( k1 + k2 + 4*k3 )/6
+                endPts_q[i,j] = qPts[i] + (k1_q + k2_q + 4*k3_q)/6
+                endPts_r[i,j] = rPts[j] + (k1_r + k2_r + 4*k3_r)/6
+            else:
+                # x' = x^n + 0.5*k1
+                q = qPts[i] + 0.5*k1_q
+                r = rPts[j] + 0.5*k1_r
+                poloidal_velocity(q, r, rMin, rMax, kts1Phi, deg1Phi, kts2Phi,
+                                    deg2Phi, coeffsPhi, ders, vel, basis1, basis2)
+                k2_q = -vel[0]*multFactor
+                k2_r =  vel[1]*multFactor
+                
+                # x'' = x^n + 0.5*k2
+                q = qPts[i] + 0.5*k2_q
+                r = rPts[j] + 0.5*k2_r
+                poloidal_velocity(q, r, rMin, rMax, kts1Phi, deg1Phi, kts2Phi,
+                                    deg2Phi, coeffsPhi, ders, vel, basis1, basis2)
+                k3_q = -vel[0]*multFactor
+                k3_r =  vel[1]*multFactor
+                
+                # x''' = x^n + k3
+                q = qPts[i] + k3_q
+                r = rPts[j] + k3_r
+                poloidal_velocity(q, r, rMin, rMax, kts1Phi, deg1Phi, kts2Phi,
+                                    deg2Phi, coeffsPhi, ders, vel, basis1, basis2)
+                k4_q = -vel[0]*multFactor
+                k4_r =  vel[1]*multFactor
+                
+                # x^{n+1} = x^n + ( k1 + 2*k2 + 2*k3 + k4 )/6
+                endPts_q[i,j] = qPts[i] + (k1_q + 2*k2_q + 2*k3_q + k4_q)/6
+                endPts_r[i,j] = rPts[j] + (k1_r + 2*k2_r + 2*k3_r + k4_r)/6
+            
+            endPts_q[i,j] = endPts_q[i,j] % (2*pi)
+
+@njit
+def poloidal_advection_step_expl_core( f, dt, v, rPts, qPts, nPts,
                         drPhi_0, dthetaPhi_0, drPhi_k, dthetaPhi_k,
                         endPts_k1_q, endPts_k1_r, endPts_k2_q, endPts_k2_r,
                         kts1Phi, kts2Phi, coeffsPhi, deg1Phi, deg2Phi,
                         kts1Pol, kts2Pol, coeffsPol, deg1Pol, deg2Pol,
                         CN0, kN0, deltaRN0, rp, CTi,
-                        kTi, deltaRTi, B0, nulBound = False ):
+                        kTi, deltaRTi, B0, rkOrder = 2, nulBound = False ):
     """
-    Carry out an advection step for the poloidal advection
+    Carry out an advection step for the poloidal advection using the
+    derivatives of phi at the nodes, divided by r, which are provided
+    in drPhi_0 and dthetaPhi_0
 
     Parameters
     ----------
@@ -45,54 +187,73 @@ def poloidal_advection_step_expl( f, dt, v, rPts, qPts, nPts,
     r: float
         The parallel velocity coordinate
     
+    rkOrder: int
+        The order of the explicit method used to find the foot of the
+        characteristics. 2 uses Heun's method, 3 the strong stability
+        preserving RK3 method and 4 the classic RK4 method
+    
     """
     
     multFactor = dt/B0
     multFactor_half = 0.5*multFactor
     
-    eval_spline_2d_cross(qPts,rPts, kts1Phi, deg1Phi, kts2Phi, deg2Phi, coeffsPhi,drPhi_0, 0,1)
-    eval_spline_2d_cross(qPts,rPts, kts1Phi, deg1Phi, kts2Phi, deg2Phi, coeffsPhi,dthetaPhi_0, 1,0)
-    
     idx = nPts[1]-1
     rMax = rPts[idx]
     
-    for i in range(nPts[0]):
-        for j in range(nPts[1]):
-            # Step one of Heun method
-            # x' = x^n + f(x^n)
-            drPhi_0[i,j]/=rPts[j]
-            dthetaPhi_0[i,j]/=rPts[j]
-            endPts_k1_q[i,j] = qPts[i] - drPhi_0[i,j]*multFactor
-            endPts_k1_r[i,j] = rPts[j] + dthetaPhi_0[i,j]*multFactor
+    # Work arrays in which the values of the basis functions are stored.
+    # They are allocated once so that no memory is allocated in the
+    # loops over the points
+    basis1 = empty(max(deg1Phi,deg1Pol)+1)
+    basis2 = empty(max(deg2Phi,deg2Pol)+1)
+    
+    # Work arrays used to evaluate the derivatives (0,1) and (1,0) of phi
+    # together
+    phiBasis1 = empty((2,deg1Phi+1))
+    phiBasis2 = empty((2,deg2Phi+1))
+    phiVals = empty(2)
+    phiDers = empty((2,2),dtype=int32)
+    phiDers[0,0] = 0
+    phiDers[0,1] = 1
+    phiDers[1,0] = 1
+    phiDers[1,1] = 0
+    
+    if (rkOrder==2):
+        for i in range(nPts[0]):
+            for j in range(nPts[1]):
+                # Step one of Heun method
+                # x' = x^n + f(x^n)
+                endPts_k1_q[i,j] = qPts[i] - drPhi_0[i,j]*multFactor
+                endPts_k1_r[i,j] = rPts[j] + dthetaPhi_0[i,j]*multFactor
             
-            # Handle theta boundary conditions
-            while (endPts_k1_q[i,j]<0):
-                endPts_k1_q[i,j]+=2*pi
-            while (endPts_k1_q[i,j]>2*pi):
-                endPts_k1_q[i,j]-=2*pi
+                # Handle theta boundary conditions
+                while (endPts_k1_q[i,j]<0):
+                    endPts_k1_q[i,j]+=2*pi
+                while (endPts_k1_q[i,j]>2*pi):
+                    endPts_k1_q[i,j]-=2*pi
             
-            if (not (endPts_k1_r[i,j]<rPts[0] or 
-                     endPts_k1_r[i,j]>rMax)):
-                # Add the new value of phi to the derivatives
-                # x^{n+1} = x^n + 0.5( f(x^n) + f(x^n + f(x^n)) )
-                #                               ^^^^^^^^^^^^^^^
-                drPhi_k[i,j]     = eval_spline_2d_scalar(endPts_k1_q[i,j],endPts_k1_r[i,j],
-                                                        kts1Phi, deg1Phi, kts2Phi, deg2Phi,
-                                                        coeffsPhi,0,1)
-                drPhi_k[i,j]     /= endPts_k1_r[i,j]
-                
-                dthetaPhi_k[i,j] = eval_spline_2d_scalar(endPts_k1_q[i,j],endPts_k1_r[i,j],
-                                                        kts1Phi, deg1Phi, kts2Phi, deg2Phi,
-                                                        coeffsPhi,1,0)
-                dthetaPhi_k[i,j] /= endPts_k1_r[i,j]
-            else:
-                drPhi_k[i,j]     = 0.0
-                dthetaPhi_k[i,j] = 0.0
+                if (not (endPts_k1_r[i,j]<rPts[0] or 
+                         endPts_k1_r[i,j]>rMax)):
+                    # Add the new value of phi to the derivatives
+                    # x^{n+1} = x^n + 0.5( f(x^n) + f(x^n + f(x^n)) )
+                    #                               ^^^^^^^^^^^^^^^
+                    eval_spline_2d_multi_work(endPts_k1_q[i,j],endPts_k1_r[i,j],
+                                        kts1Phi, deg1Phi, kts2Phi, deg2Phi,
+                                        coeffsPhi,phiDers,phiVals,phiBasis1,phiBasis2)
+                    drPhi_k[i,j]     = phiVals[0]/endPts_k1_r[i,j]
+                    dthetaPhi_k[i,j] = phiVals[1]/endPts_k1_r[i,j]
+                else:
+                    drPhi_k[i,j]     = 0.0
+                    dthetaPhi_k[i,j] = 0.0
             
-            # Step two of Heun method
-            # x^{n+1} = x^n + 0.5( f(x^n) + f(x^n + f(x^n)) )
-            endPts_k2_q[i,j] = (qPts[i] - (drPhi_0[i,j]     + drPhi_k[i,j])*multFactor_half) % (2*pi)
-            endPts_k2_r[i,j] = rPts[j] + (dthetaPhi_0[i,j] + dthetaPhi_k[i,j])*multFactor_half
+                # Step two of Heun method
+                # x^{n+1} = x^n + 0.5( f(x^n) + f(x^n + f(x^n)) )
+                endPts_k2_q[i,j] = (qPts[i] - (drPhi_0[i,j]     + drPhi_k[i,j])*multFactor_half) % (2*pi)
+                endPts_k2_r[i,j] = rPts[j] + (dthetaPhi_0[i,j] + dthetaPhi_k[i,j])*multFactor_half
+    
+    else:
+        poloidal_advection_feet_rk( rkOrder, multFactor, rPts, qPts, nPts,
+                        drPhi_0, dthetaPhi_0, endPts_k2_q, endPts_k2_r,
+                        kts1Phi, kts2Phi, coeffsPhi, deg1Phi, deg2Phi )
     
     # Find value at the determined point
     if (nulBound):
@@ -107,9 +268,9 @@ def poloidal_advection_step_expl( f, dt, v, rPts, qPts, nPts,
                         endPts_k2_q[i,j]-=2*pi
                     while (endPts_k2_q[i,j]<0):
                         endPts_k2_q[i,j]+=2*pi
-                    f[i,j]=eval_spline_2d_scalar(endPts_k2_q[i,j],endPts_k2_r[i,j],
+                    f[i,j]=eval_spline_2d_scalar_work(endPts_k2_q[i,j],endPts_k2_r[i,j],
                                                         kts1Pol, deg1Pol, kts2Pol, deg2Pol,
-                                                        coeffsPol,0,0)
+                                                        coeffsPol,0,0,basis1,basis2)
     else:
         for i,theta in enumerate(qPts):
             for j,r in enumerate(rPts):
@@ -124,8 +285,61 @@ def poloidal_advection_step_expl( f, dt, v, rPts, qPts, nPts,
                         endPts_k2_q[i,j]-=2*pi
                     while (endPts_k2_q[i,j]<0):
                         endPts_k2_q[i,j]+=2*pi
-                    f[i,j]=eval_spline_2d_scalar(endPts_k2_q[i,j],endPts_k2_r[i,j],
-                                                kts1Pol, deg1Pol, kts2Pol, deg2Pol, coeffsPol,0,0)
+                    f[i,j]=eval_spline_2d_scalar_work(endPts_k2_q[i,j],endPts_k2_r[i,j],
+                                                kts1Pol, deg1Pol, kts2Pol, deg2Pol, coeffsPol,0,0,basis1,basis2)
+
+@cc.export('poloidal_advection_step_expl', (f8[:,:],f8,f8,f8[:],f8[:], \
+                                          shape2,f8[:,:],f8[:,:],f8[:,:],\
+                                          f8[:,:],f8[:,:],f8[:,:],f8[:,:],\
+                                          f8[:,:],f8[:],f8[:],f8[:,:],\
+                                          i4,i4, f8[:],f8[:],f8[:,:],\
+                                          i4,i4,f8,f8,f8,f8,f8,f8,f8,f8,i4,b1))
+def poloidal_advection_step_expl( f, dt, v, rPts, qPts, nPts,
+                        drPhi_0, dthetaPhi_0, drPhi_k, dthetaPhi_k,
+                        endPts_k1_q, endPts_k1_r, endPts_k2_q, endPts_k2_r,
+                        kts1Phi, kts2Phi, coeffsPhi, deg1Phi, deg2Phi,
+                        kts1Pol, kts2Pol, coeffsPol, deg1Pol, deg2Pol,
+                        CN0, kN0, deltaRN0, rp, CTi,
+                        kTi, deltaRTi, B0, rkOrder = 2, nulBound = False ):
+    """
+    Carry out an advection step for the poloidal advection
+
+    Parameters
+    ----------
+    f: array_like
+        The current value of the function at the nodes.
+        The result will be stored here
+    
+    dt: float
+        Time-step
+    
+    phi: Spline2D
+        Advection parameter d_tf + {phi,f}=0
+    
+    r: float
+        The parallel velocity coordinate
+    
+    rkOrder: int
+        The order of the explicit method used to find the foot of the
+        characteristics. 2 uses Heun's method, 3 the strong stability
+        preserving RK3 method and 4 the classic RK4 method
+    
+    """
+    eval_spline_2d_cross(qPts,rPts, kts1Phi, deg1Phi, kts2Phi, deg2Phi, coeffsPhi,drPhi_0, 0,1)
+    eval_spline_2d_cross(qPts,rPts, kts1Phi, deg1Phi, kts2Phi, deg2Phi, coeffsPhi,dthetaPhi_0, 1,0)
+    
+    for i in range(nPts[0]):
+        for j in range(nPts[1]):
+            drPhi_0[i,j]/=rPts[j]
+            dthetaPhi_0[i,j]/=rPts[j]
+    
+    poloidal_advection_step_expl_core( f, dt, v, rPts, qPts, nPts,
+                        drPhi_0, dthetaPhi_0, drPhi_k, dthetaPhi_k,
+                        endPts_k1_q, endPts_k1_r, endPts_k2_q, endPts_k2_r,
+                        kts1Phi, kts2Phi, coeffsPhi, deg1Phi, deg2Phi,
+                        kts1Pol, kts2Pol, coeffsPol, deg1Pol, deg2Pol,
+                        CN0, kN0, deltaRN0, rp, CTi, kTi, deltaRTi,
+                        B0, rkOrder, nulBound )
 
 @cc.export('v_parallel_advection_eval_step','(f8[:],f8[:],f8,f8,f8,f8[:],i4,f8[:],\
                                         f8,f8,f8,f8,f8,f8,f8,i4)')
@@ -157,40 +371,86 @@ def v_parallel_advection_eval_step( f, vPts, rPos,vMin, vMax,kts, deg,
                 v-=vDiff
             f[i]=eval_spline_1d_scalar(v,kts,deg,coeffs,0)
 
-@cc.export('get_lagrange_vals','(i4,i4,i4[:],f8[:,:,:],f8[:],f8[:],f8[:],i4,f8[:])')
-def get_lagrange_vals(i,nr,shifts,vals,qVals,thetaShifts,kts,deg,coeffs):
-    for j,s in enumerate(shifts):
-        for k,q in enumerate(qVals):
-            new_q = q+thetaShifts[j]
-            while (new_q<0):
-                new_q+=2*pi
-            while (new_q>2*pi):
-                new_q-=2*pi
-            vals[(i-s)%nr,k,j]=eval_spline_1d_scalar(new_q,kts,deg,coeffs,0)
-
-@cc.export('flux_advection','(i4,i4,f8[:,:],f8[:],f8[:,:,:])')
-def flux_advection(nq,nr,f,coeffs,vals):
-    for j in range(nq):
+@cc.export('v_parallel_advection_eval_step_batch','(f8[:,:,:],f8[:],f8[:],f8[:,:],f8,f8,f8,\
+                                        f8[:],i4,f8[:,:,:],f8,f8,f8,f8,f8,f8,f8,i4)')
+def v_parallel_advection_eval_step_batch( f, vPts, rPts, c, dt, vMin, vMax, kts, deg,
+                        coeffs, CN0, kN0, deltaRN0, rp, CTi, kTi, deltaRTi, bound ):
+    """
+    Carry out the evaluation step of the v-parallel advection for all
+    lines of a block at once
+
+    Parameters
+    ----------
+    f: array_like
+        The values of the function at the nodes ordered as (r,line,v).
+        The result will be stored here
+
+    vPts: array_like
+        The v parallel coordinates of the nodes
+
+    rPts: array_like
+        The radial coordinate of each line
+
+    c: array_like
+        The advection parameter d_tf + c d_xf=0 for each line ordered
+        as (r,line)
+
+    dt: float
+        Time-step
+
+    coeffs: array_like
+        The spline coefficients of each line ordered as (r,line,coefficient)
+
+    """
+    nr = f.shape[0]
+    nLines = f.shape[1]
+    nv = f.shape[2]
+    if (bound==0):
         for i in range(nr):
-            f[j,i] = coeffs[0]*vals[i,j,0]
-            for k in range(1,len(coeffs)):
-                f[j,i] += coeffs[k]*vals[i,j,k]
+            for j in range(nLines):
+                shift = c[i,j]*dt
+                for k in range(nv):
+                    v=vPts[k]-shift
+                    if (v<vMin or v>vMax):
+                        f[i,j,k]=fEq(rPts[i],v,CN0,kN0,deltaRN0,rp,CTi,
+                                            kTi,deltaRTi)
+                    else:
+                        f[i,j,k]=eval_spline_1d_scalar(v,kts,deg,coeffs[i,j],0)
+    elif (bound==1):
+        for i in range(nr):
+            for j in range(nLines):
+                shift = c[i,j]*dt
+                for k in range(nv):
+                    v=vPts[k]-shift
+                    if (v<vMin or v>vMax):
+                        f[i,j,k]=0.0
+                    else:
+                        f[i,j,k]=eval_spline_1d_scalar(v,kts,deg,coeffs[i,j],0)
+    elif (bound==2):
+        vDiff = vMax-vMin
+        for i in range(nr):
+            for j in range(nLines):
+                shift = c[i,j]*dt
+                for k in range(nv):
+                    v=vPts[k]-shift
+                    while (v<vMin):
+                        v+=vDiff
+                    while (v>vMax):
+                        v-=vDiff
+                    f[i,j,k]=eval_spline_1d_scalar(v,kts,deg,coeffs[i,j],0)
 
-@cc.export('poloidal_advection_step_impl', (f8[:,:],f8,f8,f8[:],f8[:], \
-                                          shape2,f8[:,:],f8[:,:],f8[:,:],\
-                                          f8[:,:],f8[:,:],f8[:,:],f8[:,:],\
-                                          f8[:,:],f8[:],f8[:],f8[:,:],\
-                                          i4,i4, f8[:],f8[:],f8[:,:],\
-                                          i4,i4,f8,f8,f8,f8,f8,f8,f8,f8,f8,b1))
-def poloidal_advection_step_impl( f, dt, v, rPts, qPts, nPts,
+@njit
+def poloidal_advection_step_impl_core( f, dt, v, rPts, qPts, nPts,
                         drPhi_0, dthetaPhi_0, drPhi_k, dthetaPhi_k,
                         endPts_k1_q, endPts_k1_r, endPts_k2_q, endPts_k2_r,
                         kts1Phi, kts2Phi, coeffsPhi, deg1Phi, deg2Phi,
                         kts1Pol, kts2Pol, coeffsPol, deg1Pol, deg2Pol,
                         CN0, kN0, deltaRN0, rp, CTi, kTi, deltaRTi,
-                        B0, tol, nulBound = False ):
+                        B0, tol, maxLoops, converged, counters, nulBound = False ):
     """
-    Carry out an advection step for the poloidal advection
+    Carry out an advection step for the poloidal advection using the
+    derivatives of phi at the nodes, divided by r, which are provided
+    in drPhi_0 and dthetaPhi_0
 
     Parameters
     ----------
@@ -207,32 +467,65 @@ def poloidal_advection_step_impl( f, dt, v, rPts, qPts, nPts,
     r: float
         The parallel velocity coordinate
     
+    tol: float
+        The tolerance used for the implicit trapezoidal rule
+    
+    maxLoops: int
+        The maximum number of fixed point iterations
+    
+    converged: array_like
+        Work array in which the points whose foot has converged are
+        marked
+    
+    counters: array_like
+        The number of iterations carried out and the number of points
+        which have not converged are added to counters[0] and counters[1]
+    
     """
     
     multFactor = dt/B0
     
-    eval_spline_2d_cross(qPts,rPts, kts1Phi, deg1Phi, kts2Phi, deg2Phi, coeffsPhi,drPhi_0, 0,1)
-    eval_spline_2d_cross(qPts,rPts, kts1Phi, deg1Phi, kts2Phi, deg2Phi, coeffsPhi,dthetaPhi_0, 1,0)
-    
     idx = nPts[1]-1
     rMax = rPts[idx]
     
+    # Work arrays in which the values of the basis functions are stored.
+    # They are allocated once so that no memory is allocated in the
+    # loops over the points
+    basis1 = empty(max(deg1Phi,deg1Pol)+1)
+    basis2 = empty(max(deg2Phi,deg2Pol)+1)
+    
+    # Work arrays used to evaluate the derivatives (0,1) and (1,0) of phi
+    # together
+    phiBasis1 = empty((2,deg1Phi+1))
+    phiBasis2 = empty((2,deg2Phi+1))
+    phiVals = empty(2)
+    phiDers = empty((2,2),dtype=int32)
+    phiDers[0,0] = 0
+    phiDers[0,1] = 1
+    phiDers[1,0] = 1
+    phiDers[1,1] = 0
+    
     for i in range(nPts[0]):
         for j in range(nPts[1]):
             # Step one of Heun method
             # x' = x^n + f(x^n)
-            drPhi_0[i,j]/=rPts[j]
-            dthetaPhi_0[i,j]/=rPts[j]
             endPts_k1_q[i,j] = qPts[i] - drPhi_0[i,j]*multFactor
             endPts_k1_r[i,j] = rPts[j] + dthetaPhi_0[i,j]*multFactor
+            converged[i,j] = 0
 
     multFactor *= 0.5
     
-    norm=tol+1
-    while (norm>tol):
-        norm=0.0
+    nLoops = 0
+    nUnconverged = nPts[0]*nPts[1]
+    while (nUnconverged>0 and nLoops<maxLoops):
+        nLoops += 1
+        nUnconverged = 0
         for i in range(nPts[0]):
             for j in range(nPts[1]):
+                # Points whose foot has converged are not recomputed
+                if (converged[i,j]==1):
+                    continue
+                
                 # Handle theta boundary conditions
                 while (endPts_k1_q[i,j]<0):
                     endPts_k1_q[i,j]+=2*pi
@@ -244,14 +537,11 @@ def poloidal_advection_step_impl( f, dt, v, rPts, qPts, nPts,
                     # Add the new value of phi to the derivatives
                     # x^{n+1} = x^n + 0.5( f(x^n) + f(x^n + f(x^n)) )
                     #                               ^^^^^^^^^^^^^^^
-                    drPhi_k[i,j]     = eval_spline_2d_scalar(endPts_k1_q[i,j],endPts_k1_r[i,j],
-                                                        kts1Phi, deg1Phi, kts2Phi, deg2Phi,
-                                                        coeffsPhi,0,1)
-                    drPhi_k[i,j]     /= endPts_k1_r[i,j]
-                    dthetaPhi_k[i,j] = eval_spline_2d_scalar(endPts_k1_q[i,j],endPts_k1_r[i,j],
-                                                        kts1Phi, deg1Phi, kts2Phi, deg2Phi,
-                                                        coeffsPhi,1,0)
-                    dthetaPhi_k[i,j] /= endPts_k1_r[i,j]
+                    eval_spline_2d_multi_work(endPts_k1_q[i,j],endPts_k1_r[i,j],
+                                        kts1Phi, deg1Phi, kts2Phi, deg2Phi,
+                                        coeffsPhi,phiDers,phiVals,phiBasis1,phiBasis2)
+                    drPhi_k[i,j]     = phiVals[0]/endPts_k1_r[i,j]
+                    dthetaPhi_k[i,j] = phiVals[1]/endPts_k1_r[i,j]
                 else:
                     drPhi_k[i,j]     = 0.0
                     dthetaPhi_k[i,j] = 0.0
@@ -261,22 +551,24 @@ def poloidal_advection_step_impl( f, dt, v, rPts, qPts, nPts,
                 # Clipping is one method of avoiding infinite loops due to
                 # boundary conditions
                 # Using the splines to extrapolate is not sufficient
-                endPts_k2_q[i,j] = (qPts[i] - (drPhi_0[i,j]     + drPhi_k[i,j])*multFactor) % 2*pi
+                endPts_k2_q[i,j] = (qPts[i] - (drPhi_0[i,j]     + drPhi_k[i,j])*multFactor) % (2*pi)
                 endPts_k2_r[i,j] = rPts[j] + (dthetaPhi_0[i,j] + dthetaPhi_k[i,j])*multFactor
                 if (endPts_k2_r[i,j]<rPts[0]):
                     endPts_k2_r[i,j]=rPts[0]
                 elif (endPts_k2_r[i,j]>rMax):
                     endPts_k2_r[i,j]=rMax
                 
-                diff=abs(endPts_k2_q[i,j]-endPts_k1_q[i,j])
-                if (diff>norm):
-                    norm=diff
-                diff=abs(endPts_k2_r[i,j]-endPts_k1_r[i,j])
-                if (diff>norm):
-                    norm=diff
+                if (abs(endPts_k2_q[i,j]-endPts_k1_q[i,j])<=tol and
+                    abs(endPts_k2_r[i,j]-endPts_k1_r[i,j])<=tol):
+                    converged[i,j] = 1
+                else:
+                    nUnconverged += 1
                 endPts_k1_q[i,j]=endPts_k2_q[i,j]
                 endPts_k1_r[i,j]=endPts_k2_r[i,j]
     
+    counters[0] += nLoops
+    counters[1] += nUnconverged
+    
     # Find value at the determined point
     if (nulBound):
         for i,theta in enumerate(qPts):
@@ -290,9 +582,9 @@ def poloidal_advection_step_impl( f, dt, v, rPts, qPts, nPts,
                         endPts_k2_q[i,j]-=2*pi
                     while (endPts_k2_q[i,j]<0):
                         endPts_k2_q[i,j]+=2*pi
-                    f[i,j]=eval_spline_2d_scalar(endPts_k2_q[i,j],endPts_k2_r[i,j],
+                    f[i,j]=eval_spline_2d_scalar_work(endPts_k2_q[i,j],endPts_k2_r[i,j],
                                                         kts1Pol, deg1Pol, kts2Pol, deg2Pol,
-                                                        coeffsPol,0,0)
+                                                        coeffsPol,0,0,basis1,basis2)
     else:
         for i,theta in enumerate(qPts):
             for j,r in enumerate(rPts):
@@ -307,8 +599,177 @@ def poloidal_advection_step_impl( f, dt, v, rPts, qPts, nPts,
                         endPts_k2_q[i,j]-=2*pi
                     while (endPts_k2_q[i,j]<0):
                         endPts_k2_q[i,j]+=2*pi
-                    f[i,j]=eval_spline_2d_scalar(endPts_k2_q[i,j],endPts_k2_r[i,j],
-                                                kts1Pol, deg1Pol, kts2Pol, deg2Pol, coeffsPol,0,0)
+                    f[i,j]=eval_spline_2d_scalar_work(endPts_k2_q[i,j],endPts_k2_r[i,j],
+                                                kts1Pol, deg1Pol, kts2Pol, deg2Pol, coeffsPol,0,0,basis1,basis2)
+
+@cc.export('poloidal_advection_step_impl', (f8[:,:],f8,f8,f8[:],f8[:], \
+                                          shape2,f8[:,:],f8[:,:],f8[:,:],\
+                                          f8[:,:],f8[:,:],f8[:,:],f8[:,:],\
+                                          f8[:,:],f8[:],f8[:],f8[:,:],\
+                                          i4,i4, f8[:],f8[:],f8[:,:],\
+                                          i4,i4,f8,f8,f8,f8,f8,f8,f8,f8,f8,\
+                                          i4,i4[:,:],i4[:],b1))
+def poloidal_advection_step_impl( f, dt, v, rPts, qPts, nPts,
+                        drPhi_0, dthetaPhi_0, drPhi_k, dthetaPhi_k,
+                        endPts_k1_q, endPts_k1_r, endPts_k2_q, endPts_k2_r,
+                        kts1Phi, kts2Phi, coeffsPhi, deg1Phi, deg2Phi,
+                        kts1Pol, kts2Pol, coeffsPol, deg1Pol, deg2Pol,
+                        CN0, kN0, deltaRN0, rp, CTi, kTi, deltaRTi,
+                        B0, tol, maxLoops, converged, counters, nulBound = False ):
+    """
+    Carry out an advection step for the poloidal advection
+
+    Parameters
+    ----------
+    f: array_like
+        The current value of the function at the nodes.
+        The result will be stored here
+    
+    dt: float
+        Time-step
+    
+    phi: Spline2D
+        Advection parameter d_tf + {phi,f}=0
+    
+    r: float
+        The parallel velocity coordinate
+    
+    tol: float
+        The tolerance used for the implicit trapezoidal rule
+    
+    maxLoops: int
+        The maximum number of fixed point iterations
+    
+    converged: array_like
+        Work array in which the points whose foot has converged are
+        marked
+    
+    counters: array_like
+        The number of iterations carried out and the number of points
+        which have not converged are added to counters[0] and counters[1]
+    
+    """
+    eval_spline_2d_cross(qPts,rPts, kts1Phi, deg1Phi, kts2Phi, deg2Phi, coeffsPhi,drPhi_0, 0,1)
+    eval_spline_2d_cross(qPts,rPts, kts1Phi, deg1Phi, kts2Phi, deg2Phi, coeffsPhi,dthetaPhi_0, 1,0)
+    
+    for i in range(nPts[0]):
+        for j in range(nPts[1]):
+            drPhi_0[i,j]/=rPts[j]
+            dthetaPhi_0[i,j]/=rPts[j]
+    
+    poloidal_advection_step_impl_core( f, dt, v, rPts, qPts, nPts,
+                        drPhi_0, dthetaPhi_0, drPhi_k, dthetaPhi_k,
+                        endPts_k1_q, endPts_k1_r, endPts_k2_q, endPts_k2_r,
+                        kts1Phi, kts2Phi, coeffsPhi, deg1Phi, deg2Phi,
+                        kts1Pol, kts2Pol, coeffsPol, deg1Pol, deg2Pol,
+                        CN0, kN0, deltaRN0, rp, CTi, kTi, deltaRTi,
+                        B0, tol, maxLoops, converged, counters, nulBound )
+
+@cc.export('poloidal_advection_step_batch', (f8[:,:,:,:],f8,f8[:],f8[:],f8[:], \
+                                          shape2,f8[:,:,:],f8[:,:,:],f8[:,:],\
+                                          f8[:,:],f8[:,:],f8[:,:],f8[:,:],\
+                                          f8[:,:],f8[:],f8[:],f8[:,:,:],\
+                                          i4,i4, f8[:],f8[:],f8[:,:,:,:],\
+                                          i4,i4,f8,f8,f8,f8,f8,f8,f8,f8,b1,i4,f8,\
+                                          i4,i4[:,:],i4[:],b1))
+def poloidal_advection_step_batch( f, dt, vPts, rPts, qPts, nPts,
+                        drPhi_0, dthetaPhi_0, drPhi_k, dthetaPhi_k,
+                        endPts_k1_q, endPts_k1_r, endPts_k2_q, endPts_k2_r,
+                        kts1Phi, kts2Phi, coeffsPhi, deg1Phi, deg2Phi,
+                        kts1Pol, kts2Pol, coeffsPol, deg1Pol, deg2Pol,
+                        CN0, kN0, deltaRN0, rp, CTi, kTi, deltaRTi,
+                        B0, explicitTrap, rkOrder, tol, maxLoops, converged, counters,
+                        nulBound ):
+    """
+    Carry out an advection step for the poloidal advection on all the
+    (v,z) planes of a block
+
+    Parameters
+    ----------
+    f: array_like
+        The current value of the function at the nodes ordered as
+        (v,z,theta,r). The result will be stored here
+    
+    dt: float
+        Time-step
+    
+    vPts: array_like
+        The parallel velocity coordinate of each plane
+    
+    drPhi_0: array_like
+        The derivative of phi with respect to r, divided by r, at the
+        nodes of each z plane
+    
+    dthetaPhi_0: array_like
+        The derivative of phi with respect to theta, divided by r, at the
+        nodes of each z plane
+    
+    coeffsPhi: array_like
+        The coefficients of the spline approximating phi for each z
+    
+    coeffsPol: array_like
+        The coefficients of the spline approximating f on each plane
+    
+    explicitTrap: bool
+        Indicates whether the explicit trapezoidal method should be used
+        rather than the implicit trapezoidal method
+    
+    rkOrder: int
+        The order of the explicit method used to find the foot of the
+        characteristics if explicitTrap is True
+    
+    tol: float
+        The tolerance used for the implicit trapezoidal rule
+    
+    maxLoops: int
+        The maximum number of fixed point iterations on each plane
+    
+    converged: array_like
+        Work array used by the implicit trapezoidal rule
+    
+    counters: array_like
+        The total number of iterations carried out and the total number
+        of points which have not converged are added to counters[0] and
+        counters[1]
+    
+    """
+    nv = f.shape[0]
+    nz = f.shape[1]
+    
+    for j in range(nz):
+        for i in range(nv):
+            if (explicitTrap):
+                poloidal_advection_step_expl_core( f[i,j], dt, vPts[i], rPts, qPts, nPts,
+                        drPhi_0[j], dthetaPhi_0[j], drPhi_k, dthetaPhi_k,
+                        endPts_k1_q, endPts_k1_r, endPts_k2_q, endPts_k2_r,
+                        kts1Phi, kts2Phi, coeffsPhi[j], deg1Phi, deg2Phi,
+                        kts1Pol, kts2Pol, coeffsPol[i,j], deg1Pol, deg2Pol,
+                        CN0, kN0, deltaRN0, rp, CTi, kTi, deltaRTi,
+                        B0, rkOrder, nulBound )
+            else:
+                poloidal_advection_step_impl_core( f[i,j], dt, vPts[i], rPts, qPts, nPts,
+                        drPhi_0[j], dthetaPhi_0[j], drPhi_k, dthetaPhi_k,
+                        endPts_k1_q, endPts_k1_r, endPts_k2_q, endPts_k2_r,
+                        kts1Phi, kts2Phi, coeffsPhi[j], deg1Phi, deg2Phi,
+                        kts1Pol, kts2Pol, coeffsPol[i,j], deg1Pol, deg2Pol,
+                        CN0, kN0, deltaRN0, rp, CTi, kTi, deltaRTi,
+                        B0, tol, maxLoops, converged, counters, nulBound )
+
+@cc.export('set_num_threads','(i4,)')
+def set_num_threads(n):
+    """
+    Set the number of threads used by the advection steps.
+    The loops are only threaded in the fortran version compiled
+    with OpenMP so this has no effect here
+
+    Parameters
+    ----------
+    n: int
+        The number of threads
+
+    """
+    pass
+
 
 if __name__ == "__main__":
     cc.compile()
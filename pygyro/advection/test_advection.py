@@ -7,6 +7,7 @@ from ..initialisation.mod_initialiser_funcs     import fEq
 from .advection                                 import *
 from ..                                         import splines as spl
 from ..initialisation.constants                 import get_constants, Constants
+from ..model.layout                             import getLayoutHandler
 
 def gauss(x):
     return np.exp(-x**2/4)
@@ -303,6 +304,43 @@ def test_fluxSurfaceAdvection_gridIntegration():
         for j,v in grid.getCoords(1):
             fluxAdv.step(grid.get2DSlice([i,j]),j)
 
+@pytest.mark.serial
+def test_fluxSurfaceAdvection_footPoints():
+    npts = [4,20,10,6]
+    grid,constants,t = setupCylindricalGrid(npts   = npts,
+                                layout = 'flux_surface')
+    
+    dt=2
+    
+    fluxAdv = FluxSurfaceAdvection(grid.eta_grid, grid.get2DSpline(),
+                                    grid.getLayout('flux_surface'),dt,constants)
+    
+    bspline = grid.get2DSpline()[0]
+    spline = spl.Spline1D(bspline)
+    interp = spl.SplineInterpolator1D(bspline)
+    qVals = grid.eta_grid[1]
+    nz = npts[2]
+    
+    np.random.seed(2)
+    
+    # Carry out two steps to check that the foot points are correctly reused
+    for n in range(2):
+        for i,r in grid.getCoords(0):
+            for j,v in grid.getCoords(1):
+                f = grid.get2DSlice([i,j])
+                f[:] = np.random.uniform(-1,1,f.shape)
+                
+                expected = np.zeros(f.shape)
+                for s,thetaShift,c in zip(fluxAdv._shifts[i,j],fluxAdv._thetaShifts[i,j],
+                                          fluxAdv._lagrangeCoeffs[i,j]):
+                    for k in range(nz):
+                        interp.compute_interpolant(f[:,(k+s)%nz],spline)
+                        expected[:,k] += c*spline.eval(np.mod(qVals+thetaShift,2*pi))
+                
+                fluxAdv.step(f,j,i)
+                
+                assert(np.allclose(expected,f))
+
 @pytest.mark.serial
 def test_vParallelAdvection_gridIntegration():
     npts = [4,4,4,100]
@@ -323,6 +361,30 @@ def test_vParallelAdvection_gridIntegration():
     
     assert(np.allclose(old_f,grid._f))
 
+@pytest.mark.serial
+@pytest.mark.parametrize( "edge", ['fEq','null','periodic'] )
+def test_vParallelAdvection_gridStep(edge):
+    npts = [4,6,5,30]
+    grid,constants,t = setupCylindricalGrid(npts   = npts,
+                                layout = 'v_parallel')
+    
+    dt=0.1
+    
+    np.random.seed(1)
+    parGradVals = np.random.uniform(-5,5,[npts[0],npts[2],npts[1]])
+    
+    vParAdv = VParallelAdvection(grid.eta_grid, grid.get1DSpline(),constants,edge)
+    
+    expected = grid._f.copy()
+    for i,r in grid.getCoords(0):
+        for j,z in grid.getCoords(1):
+            for k,q in grid.getCoords(2):
+                vParAdv.step(expected[i,j,k],dt,parGradVals[i,j,k],r)
+    
+    vParAdv.gridStepKeepGradient(grid,parGradVals,dt)
+    
+    assert(np.allclose(expected,grid._f))
+
 @pytest.mark.serial
 def test_poloidalAdvection_gridIntegration():
     npts = [10,20,10,10]
@@ -345,6 +407,123 @@ def test_poloidalAdvection_gridIntegration():
         for j,v in grid.getCoords(1):
             polAdv.step(grid.get2DSlice([i,j]),dt,phi,v)
 
+@pytest.mark.serial
+@pytest.mark.parametrize( "explicit,rkOrder", [(True,2),(False,2),(True,3),(True,4)] )
+def test_poloidalAdvection_gridStep(explicit,rkOrder):
+    npts = [10,12,4,6]
+    grid,constants,t = setupCylindricalGrid(npts   = npts,
+                                layout = 'poloidal')
+    
+    basis = grid.get2DSpline()
+    
+    polAdv = PoloidalAdvection(grid.eta_grid, basis, constants,
+                                explicitTrap = explicit, rkOrder = rkOrder)
+    
+    layouts = {'poloidal': [2,1,0]}
+    remapper = getLayoutHandler(MPI.COMM_WORLD, layouts, [1], grid.eta_grid[:3])
+    phi = Grid(grid.eta_grid[:3],grid.getSpline(slice(0,3)),remapper,'poloidal',
+                MPI.COMM_WORLD,dtype=np.float64)
+    
+    for i,z in phi.getCoords(0):
+        for j,q in phi.getCoords(1):
+            phi._f[i,j,:] = np.cos(q+z)*grid.eta_grid[0]**2
+    
+    dt=0.1
+    
+    expected = grid._f.copy()
+    phiSpline = Spline2D(basis[0],basis[1])
+    interp = SplineInterpolator2D(basis[0],basis[1])
+    for j,z in grid.getCoords(1):
+        interp.compute_interpolant(phi._f[j],phiSpline)
+        for i,v in grid.getCoords(0):
+            polAdv.step(expected[i,j],dt,phiSpline,v)
+    
+    polAdv.gridStep(grid,phi,dt)
+    
+    assert(np.allclose(expected,grid._f))
+    
+    polAdv.gridStep_SplinesUnchanged(grid,dt)
+    for j,z in grid.getCoords(1):
+        interp.compute_interpolant(phi._f[j],phiSpline)
+        for i,v in grid.getCoords(0):
+            polAdv.step(expected[i,j],dt,phiSpline,v)
+    
+    assert(np.allclose(expected,grid._f))
+
+@pytest.mark.serial
+def test_poloidalAdvection_implicitCounters():
+    npts = [10,12,4,6]
+    grid,constants,t = setupCylindricalGrid(npts   = npts,
+                                layout = 'poloidal')
+    
+    basis = grid.get2DSpline()
+    
+    layouts = {'poloidal': [2,1,0]}
+    remapper = getLayoutHandler(MPI.COMM_WORLD, layouts, [1], grid.eta_grid[:3])
+    phi = Grid(grid.eta_grid[:3],grid.getSpline(slice(0,3)),remapper,'poloidal',
+                MPI.COMM_WORLD,dtype=np.float64)
+    
+    for i,z in phi.getCoords(0):
+        for j,q in phi.getCoords(1):
+            phi._f[i,j,:] = np.cos(q+z)*grid.eta_grid[0]**2
+    
+    nPlanes = grid._f.shape[0]*grid._f.shape[1]
+    dt=0.1
+    
+    polAdv = PoloidalAdvection(grid.eta_grid, basis, constants,
+                                explicitTrap = False)
+    polAdv.gridStep(grid,phi,dt)
+    assert(polAdv.nUnconverged==0)
+    assert(polAdv.nIterations>nPlanes)
+    
+    # The iteration stops at the limit even if the feet have not converged
+    polAdv = PoloidalAdvection(grid.eta_grid, basis, constants,
+                                explicitTrap = False, maxLoops = 1)
+    polAdv.gridStep(grid,phi,dt)
+    assert(polAdv.nIterations==nPlanes)
+    assert(polAdv.nUnconverged>0)
+
+@pytest.mark.serial
+@pytest.mark.parametrize( "explicit", [True,False] )
+def test_poloidalAdvection_allocation(explicit):
+    import tracemalloc
+    
+    def stepPeakMemory(nv):
+        npts = [8,8,4,nv]
+        grid,constants,t = setupCylindricalGrid(npts   = npts,
+                                    layout = 'poloidal')
+        
+        basis = grid.get2DSpline()
+        
+        layouts = {'poloidal': [2,1,0]}
+        remapper = getLayoutHandler(MPI.COMM_WORLD, layouts, [1], grid.eta_grid[:3])
+        phi = Grid(grid.eta_grid[:3],grid.getSpline(slice(0,3)),remapper,'poloidal',
+                    MPI.COMM_WORLD,dtype=np.float64)
+        
+        for i,z in phi.getCoords(0):
+            for j,q in phi.getCoords(1):
+                phi._f[i,j,:] = np.cos(q+z)*grid.eta_grid[0]**2
+        
+        polAdv = PoloidalAdvection(grid.eta_grid, basis, constants,
+                                    explicitTrap = explicit)
+        
+        # The first step allocates the workspace
+        polAdv.gridStep(grid,phi,0.1)
+        
+        tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+        polAdv.gridStep_SplinesUnchanged(grid,0.1)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak-start, grid._f.nbytes
+    
+    peak1, size1 = stepPeakMemory(4)
+    peak2, size2 = stepPeakMemory(8)
+    
+    # The temporary arrays only have the size of a few planes so the memory
+    # allocated during a step does not grow with the number of planes
+    assert(peak2-peak1<(size2-size1)/4)
+
 """
 # Tests are too slow
 @pytest.mark.parallel
@@ -521,6 +700,57 @@ def test_vParGrad():
     assert(np.isfinite(der).all())
     assert((np.abs(der)<1e-12).all())
 
+@pytest.mark.serial
+def test_vParGrad_setLayout():
+    comm = MPI.COMM_WORLD
+    
+    npts = [8,20,10,8]
+    grid,constants,t = setupCylindricalGrid(npts   = npts,
+                                layout = 'flux_surface',
+                                eps    = 0,
+                                comm   = comm)
+    
+    layout = grid.getLayout(grid.currentLayout)
+    pG = ParallelGradient(grid.getSpline(1),grid.eta_grid,layout,constants)
+    
+    phiVals = np.sin(grid.eta_grid[1])[None,:]*np.cos(grid.eta_grid[2])[:,None]
+    
+    expected = np.empty([npts[2],npts[1]])
+    pG.parallel_gradient(phiVals,3,expected)
+    
+    # Use a layout which only stores the first half of the values of r
+    lh = getLayoutHandler(comm, {'split':[1,0,2,3]}, [1], [grid.eta_grid[0][:npts[0]//2]]+grid.eta_grid[1:])
+    pG.setLayout(lh.getLayout('split'))
+    assert(all(op is None for op in pG._operators))
+    assert(len(pG._operators)==npts[0]//2)
+    
+    der = np.empty([npts[2],npts[1]])
+    pG.parallel_gradient(phiVals,3,der)
+    assert(np.allclose(der,expected,rtol=0,atol=1e-14))
+
+@pytest.mark.serial
+def test_vParGrad_operatorSize():
+    comm = MPI.COMM_WORLD
+    
+    def operatorSize(nz):
+        npts = [4,32,nz,4]
+        grid,constants,t = setupCylindricalGrid(npts   = npts,
+                                    layout = 'flux_surface',
+                                    eps    = 0,
+                                    comm   = comm)
+        
+        pG = ParallelGradient(grid.getSpline(1),grid.eta_grid,grid.getLayout(grid.currentLayout),constants)
+        
+        phiVals = np.sin(grid.eta_grid[1])[None,:]*np.cos(grid.eta_grid[2])[:,None]
+        der = np.empty([npts[2],npts[1]])
+        pG.parallel_gradient(phiVals,0,der)
+        assert(np.isfinite(der).all())
+        
+        return sum(evalMat.nnz for s,evalMat in pG._operators[0])
+    
+    # The matrices do not depend on z so they are not duplicated for each plane
+    assert(operatorSize(8)==operatorSize(32))
+
 def pg_Phi(theta,z):
     #return np.cos(z*pi*0.1) + np.sin(theta)
     return np.sin(z*pi*0.1)**2 + np.cos(theta)**2
@@ -0,0 +1,219 @@
+import importlib
+import importlib.machinery
+import importlib.util
+import os
+import re
+import warnings
+import numpy as np
+
+__all__ = ['load_kernels', 'active_backends']
+
+# Modules containing the accelerated kernels used in each time step. They
+# are compiled by both the numba and the pyccel targets of the makefile
+COMPILED_MODULES = ('splines.spline_eval_funcs',
+                    'advection.accelerated_advection_steps')
+
+# Environment variable used to choose the backend
+BACKEND_VARIABLE = 'PYGYRO_BACKEND'
+BACKENDS = ('auto', 'python', 'numba', 'pyccel')
+
+_active = {}
+_loaded = {}
+
+def _multi_dimensional_arguments( func ):
+    """
+    Find the arguments of a function compiled with f2py which are arrays
+    with more than one dimension. They are read from the signature in the
+    docstring generated by f2py
+
+    Returns
+    -------
+    positions : tuple of int
+        The positions of these arguments
+
+    names : frozenset of str
+        The names of these arguments
+
+    None is returned if the docstring does not have the f2py format
+    """
+    doc = getattr(func,'__doc__',None) or ''
+    signature = re.match(r'[^(\n]*\(([^\[)\n]*)',doc)
+    if (signature is None or 'Parameters' not in doc):
+        return None
+    args  = [a.strip() for a in signature.group(1).split(',') if a.strip()]
+    names = frozenset(name for name,rank in
+                        re.findall(r'^\s*(\w+) : [\w/]+ rank-(\d+) array',doc,re.M)
+                        if int(rank)>1)
+    return tuple(i for i,a in enumerate(args) if a in names), names
+
+def _fortran_ordered( func ):
+    """
+    Wrap a function compiled with f2py so that it can be called with the
+    arrays in the same order as the python and numba versions. The
+    indices of an array are reversed in fortran so the transpose of each
+    multi-dimensional array is passed. This is a view in the fortran
+    order so no copy is made.
+
+    The arguments which must be transposed are found once from the
+    signature of the function. Functions without multi-dimensional
+    arrays are returned unchanged so they have no overhead. For the
+    others the wrapper adds a small python cost to each call, which
+    matters for kernels called once per point or per line. Such callers
+    can use FortranKernels.raw with arrays which are already transposed
+    """
+    arguments = _multi_dimensional_arguments(func)
+
+    if (arguments is None):
+        # Unknown signature: check the arguments at each call
+        def wrapper( *args, **kwargs ):
+            args   = [a.T if isinstance(a,np.ndarray) and a.ndim>1 else a for a in args]
+            kwargs = {k: (a.T if isinstance(a,np.ndarray) and a.ndim>1 else a)
+                        for k,a in kwargs.items()}
+            return func(*args,**kwargs)
+    else:
+        positions, names = arguments
+        if (not names):
+            return func
+
+        def wrapper( *args, **kwargs ):
+            args = list(args)
+            for i in positions:
+                if (i<len(args)):
+                    args[i] = args[i].T
+            for k in names.intersection(kwargs):
+                kwargs[k] = kwargs[k].T
+            return func(*args,**kwargs)
+
+    wrapper.__name__ = getattr(func,'__name__',None) or repr(func)
+    wrapper.__doc__  = func.__doc__
+    return wrapper
+
+class FortranKernels:
+    """
+    FortranKernels: Class giving access to the functions of a module
+    generated by pyccel and compiled with f2py. The functions take their
+    arguments in the same order as the python versions
+
+    Parameters
+    ----------
+    module : fortran object
+        The fortran module (e.g. mod_pygyro_splines_spline_eval_funcs)
+
+    """
+    def __init__( self, module ):
+        self._module = module
+
+    def __getattr__( self, name ):
+        attr = getattr(self._module,name)
+        if (callable(attr)):
+            attr = _fortran_ordered(attr)
+        # Store the wrapped function so it is only created once
+        setattr(self,name,attr)
+        return attr
+
+    def __dir__( self ):
+        return dir(self._module)
+
+    @property
+    def raw( self ):
+        """ The fortran module. Its functions expect the multi-dimensional
+        arrays in the fortran order (i.e. transposed)
+        """
+        return self._module
+
+def _requested_backend():
+    backend = os.environ.get(BACKEND_VARIABLE,'auto').lower()
+    if (backend not in BACKENDS):
+        raise ValueError("{0}={1} is not valid. The backend must be one of {2}"
+                            .format(BACKEND_VARIABLE,backend,BACKENDS))
+    return backend
+
+def _load_python( fullname ):
+    """
+    Load the pure python version of a module, even if a compiled
+    version is found first on the path
+    """
+    package = importlib.import_module(fullname.rpartition('.')[0])
+    filename = os.path.join(os.path.dirname(package.__file__),
+                            fullname.rpartition('.')[2]+'.py')
+    spec = importlib.util.spec_from_file_location(fullname,filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def load_kernels( name: str ):
+    """
+    Load the fastest available version of a module containing accelerated
+    kernels. A compiled module (numba or pyccel) is preferred to the
+    pure python version. The functions of the returned object all expect
+    arrays in the python (C) order so the caller does not need to know
+    which backend is used.
+
+    The environment variable PYGYRO_BACKEND can be used to choose the
+    backend. It can take the values:
+    - auto (default) : the compiled version is used if it exists,
+                       otherwise a warning is raised and python is used
+    - python         : the pure python version is used
+    - numba/pyccel   : an ImportError is raised if the module was not
+                       compiled with this backend
+
+    Parameters
+    ----------
+    name : str
+        The name of the module relative to the pygyro package
+        e.g. 'splines.spline_eval_funcs'
+
+    Returns
+    -------
+    kernels : module or FortranKernels
+        An object whose attributes are the functions of the module
+
+    """
+    if (name in _loaded):
+        return _loaded[name]
+
+    fullname = __name__.rpartition('.')[0]+'.'+name
+    requested = _requested_backend()
+
+    if (requested=='python'):
+        module = _load_python(fullname)
+        backend = 'python'
+    else:
+        module = importlib.import_module(fullname)
+        fortran_name = 'mod_'+fullname.replace('.','_')
+        if (not isinstance(module.__spec__.loader,importlib.machinery.ExtensionFileLoader)):
+            backend = 'python'
+        elif (hasattr(module,fortran_name)):
+            module = FortranKernels(getattr(module,fortran_name))
+            backend = 'pyccel'
+        else:
+            backend = 'numba'
+
+        if (backend=='python' and name in COMPILED_MODULES):
+            if (requested=='auto'):
+                warnings.warn(("No compiled version of {0} was found so the pure python "
+                               "version is used. This is much slower. Run 'make' to "
+                               "compile it, or set {1}=python to hide this warning")
+                                .format(fullname,BACKEND_VARIABLE),RuntimeWarning,stacklevel=2)
+            else:
+                raise ImportError("{0} was requested but {1} has not been compiled with it"
+                                    .format(requested,fullname))
+        elif (backend!='python' and requested not in ('auto',backend)):
+            raise ImportError("{0} was requested but {1} was compiled with {2}"
+                                .format(requested,fullname,backend))
+
+    _active[name] = backend
+    _loaded[name] = module
+    return module
+
+def active_backends():
+    """
+    Get the backend used by each module of accelerated kernels which has
+    been loaded
+
+    Returns
+    -------
+    backends : dict
+        The backend ('python', 'numba' or 'pyccel') used by each module
+    """
+    return dict(_active)
@@ -1,13 +1,8 @@
 from math import pi
-import numpy as np
 
-from . import initialiser_func as IF_MOD
+from ..backends import load_kernels
 
-if ('mod_pygyro_initialisation_initialiser_func' in dir(IF_MOD)):
-    IF_MOD = IF_MOD.mod_pygyro_initialisation_initialiser_func
-    modFunc = np.transpose
-else:
-    modFunc = lambda c: c
+IF_MOD = load_kernels('initialisation.initialiser_func')
 
 def initialise_flux_surface(grid,constants):
     for i,r in grid.getCoords(0):
@@ -18,7 +13,7 @@ def initialise_flux_surface(grid,constants):
             theta = grid.getCoordVals(2)
             z = grid.getCoordVals(3)
             
-            IF_MOD.init_f_flux(modFunc(FluxSurface),r,theta,z,v,
+            IF_MOD.init_f_flux(FluxSurface,r,theta,z,v,
                     constants.m,constants.n,constants.eps,
                     constants.CN0,constants.kN0,constants.deltaRN0,
                     constants.rp,constants.CTi,constants.kTi,
@@ -33,7 +28,7 @@ def initialise_poloidal(grid,constants):
             theta = grid.getCoordVals(2)
             r = grid.getCoordVals(3)
             
-            IF_MOD.init_f_pol(modFunc(PoloidalSurface),r,theta,z,v,
+            IF_MOD.init_f_pol(PoloidalSurface,r,theta,z,v,
                     constants.m,constants.n,constants.eps,
                     constants.CN0,constants.kN0,constants.deltaRN0,
                     constants.rp,constants.CTi,constants.kTi,
@@ -48,9 +43,7 @@ def initialise_v_parallel(grid,constants):
             theta = grid.getCoordVals(2)
             v = grid.getCoordVals(3)
             
-            # transpose theta to use ufuncs
-            theta = theta.reshape(theta.size,1)
-            IF_MOD.init_f_vpar(modFunc(Surface),r,theta,z,v,
+            IF_MOD.init_f_vpar(Surface,r,theta,z,v,
                     constants.m,constants.n,constants.eps,
                     constants.CN0,constants.kN0,constants.deltaRN0,
                     constants.rp,constants.CTi,constants.kTi,
@@ -307,6 +307,207 @@ class LayoutManager(ABC):
 
 #===============================================================================
 
+class TransposePlan:
+    """
+    TransposePlan: Class containing the information needed to change
+    the data from one layout to a compatible layout. The shapes of the
+    blocks, the slices used to access them and the transposition orders
+    only depend on the layouts so they are computed once. Where MPI-4
+    persistent collectives are available the Alltoall requests are also
+    reused between calls so a transpose only packs the blocks, starts
+    the communication and unpacks the blocks
+
+    Parameters
+    ----------
+    layout_source : Layout
+        The layout in which the data is stored
+
+    layout_dest : Layout
+        The layout in which the data will be stored
+
+    axis : list of int
+        The axes being swapped (see LayoutHandler._get_swap_axes)
+
+    comm : MPI.Comm
+        The communicator on which the swapped axis is distributed.
+        It is not used if no distributed axis is swapped
+
+    """
+    # Persistent requests are linked to the memory blocks used for the
+    # communication. The grid only uses 2 or 3 blocks so few requests
+    # are saved for each plan
+    max_requests = 6
+    persistent = (MPI.Get_version()[0]>=4 and hasattr(MPI.Comm,'Alltoall_init'))
+    
+    def __init__( self, layout_source: Layout, layout_dest: Layout, axis: list, comm: MPI.Comm ):
+        self._source_size  = layout_source.size
+        self._source_shape = tuple(layout_source.shape)
+        self._dest_size    = layout_dest.size
+        self._dest_shape   = tuple(layout_dest.shape)
+        
+        self._comm = comm
+        self._requests = {}
+        
+        # If the axes being swapped are not distributed the data is
+        # only transposed
+        self._distributed = (len(axis)!=0)
+        if (not self._distributed):
+            self._transposition = tuple(layout_source.dims_order.index(i) for i in layout_dest.dims_order)
+            return
+        
+        mpi_size = comm.Get_size()
+        
+        #--------------------------------------------------------------
+        # Blocks extracted from the source
+        #--------------------------------------------------------------
+        
+        # Get the shape of the block
+        shape=list(layout_source.shape)
+        shape[axis[0]]=layout_source.max_block_shape[axis[0]]
+        shape[axis[1]]=layout_dest.max_block_shape[axis[0]]
+        size = int(np.prod(shape))
+        
+        ranges = [slice(x) for x in layout_source.shape ]
+        source_range = [slice(x) for x in layout_source.shape ]
+        
+        # Find the order to which the axes will be transposed for sending
+        # This is the same as before but the axis to be concatenated 
+        # must be the 0-th axis
+        order = list(range(layout_source.ndims))
+        
+        if (axis[0]!=0):
+            order[0], order[axis[0]] = order[axis[0]], order[0]
+            shape[0], shape[axis[0]] = shape[axis[0]], shape[0]
+            ranges[0], ranges[axis[0]] = ranges[axis[0]], ranges[0]
+        
+        self._order = tuple(order)
+        
+        # For each block save the position in the buffer, the shape, the
+        # slices of the elements used on the block and the slices of the
+        # source which are stored there
+        self._pack_blocks = []
+        start = 0
+        for (split_length,mpi_start) in zip(layout_dest.mpi_lengths(axis[0]),layout_dest.mpi_starts(axis[0])):
+            ranges[axis[1]]=slice(split_length)
+            source_range[axis[1]] = slice(mpi_start,mpi_start+split_length)
+            self._pack_blocks.append((start,start+size,tuple(shape),
+                                      tuple(ranges),tuple(source_range)))
+            start+=size
+        
+        #--------------------------------------------------------------
+        # Blocks received from the other processes
+        #--------------------------------------------------------------
+        
+        # Get the shape of the send block
+        source_shape = list(layout_source.shape)
+        source_shape[axis[1]] = layout_dest.max_block_shape[axis[0]]
+        source_shape[axis[0]] = layout_source.max_block_shape[axis[0]]*mpi_size
+        
+        self._send_size = int(np.prod(source_shape))
+        
+        source_order = list(layout_source.dims_order)
+        
+        # Reorder the shape to the current format
+        if (axis[0]!=0):
+            source_order[0], source_order[axis[0]] = source_order[axis[0]], source_order[0]
+            source_shape[0], source_shape[axis[0]] = source_shape[axis[0]], source_shape[0]
+        
+        self._buf_shape = tuple(source_shape)
+        self._transposition = tuple(source_order.index(i) for i in layout_dest.dims_order)
+        
+        # If all blocks are the same shape with no padding then the
+        # transposition can be carried out directly
+        self._uniform = (layout_dest.shape[axis[2]]%mpi_size==0 and layout_source.shape[axis[1]]%mpi_size==0)
+        
+        # Otherwise save the slices of each block in the buffer and in the
+        # destination
+        self._unpack_blocks = []
+        for r in range(mpi_size):
+            start = layout_source.max_block_shape[axis[0]]*r
+            
+            bufRanges=[slice(x) for x in source_shape]
+            bufRanges[axis[1]]=slice(layout_dest.shape[axis[0]])
+            bufRanges[0]=slice(start,start+layout_source.mpi_lengths(axis[0])[r])
+            
+            destRanges=[slice(x) for x in layout_dest.shape]
+            destRanges[axis[2]]=slice(layout_source.mpi_starts(axis[0])[r],
+                               layout_source.mpi_starts(axis[0])[r]+layout_source.mpi_lengths(axis[0])[r])
+            
+            self._unpack_blocks.append((tuple(bufRanges),tuple(destRanges)))
+    
+    def execute( self, source, dest, buf ):
+        """
+        Change the layout of the data
+
+        Parameters
+        ----------
+        source : array_like
+            The entire memory block where the data is currently stored
+
+        dest : array_like
+            The entire memory block where the data will be stored
+
+        buf : array_like
+            The memory block where the blocks are received. This may be
+            source if it does not need to be kept intact
+
+        """
+        sourceView = source[:self._source_size].reshape(self._source_shape)
+        destView = dest[:self._dest_size].reshape(self._dest_shape)
+        
+        if (not self._distributed):
+            destView[:]=sourceView.transpose(self._transposition)
+            return
+        
+        # Save the blocks into the send buffer (dest). The blocks are
+        # transposed so that the axis to be concatenated is the 0-th axis
+        for start,stop,shape,ranges,source_range in self._pack_blocks:
+            dest[start:stop].reshape(shape)[ranges] = sourceView[source_range].transpose(self._order)
+        
+        # Pass the blocks to the correct processes, concatenating in the process
+        self._alltoall(dest,buf)
+        
+        # Transpose the result to get the final layout in the destination
+        bufView = buf[:self._send_size].reshape(self._buf_shape)
+        if (self._uniform):
+            destView[:] = bufView.transpose(self._transposition)
+        else:
+            for bufRanges,destRanges in self._unpack_blocks:
+                destView[destRanges] = bufView[bufRanges].transpose(self._transposition)
+    
+    def _alltoall( self, sendArr, rcvArr ):
+        """
+        Send the first blocks of sendArr to the other processes and
+        receive their blocks in rcvArr. A persistent request is used
+        if possible. As the request is linked to the memory, one is saved
+        for each pair of arrays. The arrays are saved with the request
+        so that they cannot be freed while it exists
+        """
+        if (TransposePlan.persistent):
+            key = (id(sendArr),id(rcvArr))
+            saved = self._requests.get(key,None)
+            if (saved is None):
+                try:
+                    request = self._comm.Alltoall_init(sendArr[:self._send_size],
+                                                       rcvArr[:self._send_size])
+                except NotImplementedError:
+                    # The MPI library does not provide persistent collectives
+                    TransposePlan.persistent = False
+                else:
+                    if (len(self._requests)==self.max_requests):
+                        oldest = next(iter(self._requests))
+                        self._requests.pop(oldest)[2].Free()
+                    saved = (sendArr,rcvArr,request)
+                    self._requests[key] = saved
+            if (saved is not None):
+                saved[2].Start()
+                saved[2].Wait()
+                return
+        
+        self._comm.Alltoall( sendArr[:self._send_size], rcvArr[:self._send_size] )
+
+#===============================================================================
+
 def getLayoutHandler(comm: MPI.Comm, layouts : dict, nprocs: list, eta_grids: list):
     """
     getLayoutHandler: Create a LayoutHandler object with the described
@@ -406,13 +607,17 @@ class LayoutHandler(LayoutManager):
         self._buffer_size = layoutObjects[0][1].size
         
         # Calculate direct layout connections
+        # and the plans used to switch between them
         myMap = []
+        self._plans = {}
         for n,(name1,l1) in enumerate(layoutObjects):
             myMap.append((name1,[]))
             for i,(name2,l2) in enumerate(layoutObjects[:n]):
                 if (self.compatible(l1,l2)):
                     myMap[i][1].append(name1)
                     myMap[n][1].append(name2)
+                    self._plans[(name1,name2)] = self._makePlan(l1,l2)
+                    self._plans[(name2,name1)] = self._makePlan(l2,l1)
                     
                     # Find the size of the block required to switch between these layouts
                     blockshape=list(l1.shape)
@@ -587,47 +792,20 @@ class LayoutHandler(LayoutManager):
             nowLayoutKey=nextLayoutKey
             fromBuf, toBuf = toBuf, fromBuf
     
-    def _transpose(self, source, dest, layout_source, layout_dest):
-        # get axis information
+    def _makePlan(self, layout_source, layout_dest):
+        """
+        Create the plan used to change from one layout to a compatible layout
+        """
         axis = self._get_swap_axes(layout_source,layout_dest)
-        
-        # get views of the important parts of the data
-        sourceView = np.split(source,[layout_source.size])[0].reshape(layout_source.shape)
-        
-        # If both axes being swapped are not distributed
-        if (len(axis)==0):
-            destView = np.split(dest,[layout_dest.size])[0].reshape(layout_dest.shape)
-            assert(destView.base is dest)
-            transposition = [layout_source.dims_order.index(i) for i in layout_dest.dims_order]
-            destView[:]=np.transpose(sourceView,transposition)
-            return
-        
-        # carry out transpose
-        comm = self._subcomms[axis[0]]
-        self._extract_from_source(sourceView,dest,layout_source,layout_dest,axis,comm)
-        self._rearrange_from_buffer(dest,source,layout_source,layout_dest,axis,comm)
-        
-        f=np.split(dest,[layout_dest.size])[0].reshape(layout_dest.shape)
+        comm = self._subcomms[axis[0]] if len(axis)!=0 else None
+        return TransposePlan(layout_source,layout_dest,axis,comm)
+    
+    def _transpose(self, source, dest, layout_source, layout_dest):
+        # The source is used as the buffer
+        self._plans[(layout_source.name,layout_dest.name)].execute(source,dest,source)
     
     def _transpose_source_intact(self, source, dest, buf, layout_source, layout_dest):
-        # get views of the important parts of the data
-        sourceView = np.split(source,[layout_source.size])[0].reshape(layout_source.shape)
-        
-        # get axis information
-        axis = self._get_swap_axes(layout_source,layout_dest)
-        
-        # If the axes being swapped are not distributed
-        if (len(axis)==0):
-            dest   = np.split(dest,[layout_dest  .size])[0].reshape(layout_dest  .shape)
-            transposition = [layout_source.dims_order.index(i) for i in layout_dest.dims_order]
-            dest[:]=np.transpose(sourceView,transposition)
-            return
-        
-        # carry out transpose
-        comm = self._subcomms[axis[0]]
-        self._extract_from_source(sourceView,dest,layout_source,layout_dest,axis,comm)
-        
-        self._rearrange_from_buffer(dest,buf,layout_source,layout_dest,axis,comm)
+        self._plans[(layout_source.name,layout_dest.name)].execute(source,dest,buf)
     
     def _get_swap_axes(self,layout_source,layout_dest):
         # Find the axes which will be swapped
@@ -648,124 +826,6 @@ class LayoutHandler(LayoutManager):
         
         return axis
     
-    def _extract_from_source(self, source, tobuffer, layout_source : Layout,
-                            layout_dest : Layout, axis : list, comm : MPI.Comm):
-        """
-        Take the information from the source and save it blockwise into
-        the buffer. The saved blocks are also transposed
-        """
-        # get the number of processes that the data is split across
-        nSplits=layout_source.nprocs[axis[0]]
-        
-        start = 0
-        
-        # Get the shape of the block
-        shape=list(layout_source.shape)
-        shape[axis[0]]=layout_source.max_block_shape[axis[0]]
-        shape[axis[1]]=layout_dest.max_block_shape[axis[0]]
-        size = np.prod(shape)
-        
-        ranges = [slice(x) for x in layout_source.shape ]
-        source_range = [slice(x) for x in layout_source.shape ]
-        
-        # Find the order to which the axes will be transposed for sending
-        # This is the same as before but the axis to be concatenated 
-        # must be the 0-th axis
-        order = list(range(layout_source.ndims))
-        
-        if (axis[0]!=0):
-            order[0], order[axis[0]] = order[axis[0]], order[0]
-            shape[0], shape[axis[0]] = shape[axis[0]], shape[0]
-            ranges[0], ranges[axis[0]] = ranges[axis[0]], ranges[0]
-        
-        for (split_length,mpi_start) in zip(layout_dest.mpi_lengths(axis[0]),layout_dest.mpi_starts(axis[0])):
-            # Get a view on the buffer which is the same size as the block
-            arr = tobuffer[start:start+size].reshape(shape)
-            assert(arr.base is tobuffer)
-            
-            # Use the list of slices to access the relevant elements on the block
-            ranges[axis[1]]=slice(split_length)
-            arrView = arr[tuple(ranges)]
-            assert(arrView.base is tobuffer)
-            
-            source_range[axis[1]] = slice(mpi_start,mpi_start+split_length)
-            
-            # Save the block into the buffer via the source
-            # This may result in a copy, however this copy would only be
-            # the size of the block
-            # The data should however be written directly in the buffer
-            # as the shapes agree
-            arrView[:] = source[tuple(source_range)].transpose(order)
-            
-            start+=size
-    
-    def _rearrange_from_buffer(self, data, buf, layout_source : Layout, 
-                                layout_dest : Layout, axis : list , comm: MPI.Comm):
-        """
-        Swap the axes of the blocks
-        Pass the blocks to the correct processes, concatenating in the process
-        Transpose the result to get the final layout in the destination
-        """
-        mpi_size = comm.Get_size()
-        
-        # Get the shape of the send block
-        source_shape = list(layout_source.shape)
-        source_shape[axis[1]] = layout_dest.max_block_shape[axis[0]]
-        source_shape[axis[0]] = layout_source.max_block_shape[axis[0]]*mpi_size
-        
-        size = np.prod(source_shape)
-        
-        # Get a view on the data to be sent
-        sendBuf=np.split(data,[size],axis=0)[0]
-        assert(sendBuf.base is data)
-        
-        # Get a view where the data will be received
-        rcvBuf=np.split(buf,[size],axis=0)[0]
-        assert(rcvBuf.base is buf)
-        
-        comm.Alltoall( sendBuf, rcvBuf )
-        
-        source_order = list(layout_source.dims_order)
-        
-        # Reorder the shape to the current format
-        if (axis[0]!=0):
-            source_order[0], source_order[axis[0]] = source_order[axis[0]], source_order[0]
-            source_shape[0], source_shape[axis[0]] = source_shape[axis[0]], source_shape[0]
-        
-        transposition = [source_order.index(i) for i in layout_dest.dims_order]
-        
-        # Get a view on the destination
-        destView = np.split(data,[layout_dest.size])[0].reshape(layout_dest.shape)
-        assert(destView.base is data)
-        
-        # Get a view on the actual data received
-        bufView = np.split(buf,[size])[0].reshape(source_shape)
-        assert(bufView.base is buf)
-        
-        if (layout_dest.shape[axis[2]]%mpi_size==0 and layout_source.shape[axis[1]]%mpi_size==0):
-            # If all blocks are the same shape with no padding then the
-            # transposition can be carried out directly
-            destView[:] = np.transpose(bufView,transposition)
-        else:
-        
-            for r in range(mpi_size):
-                start = layout_source.max_block_shape[axis[0]]*r
-                
-                # Get a view on the block
-                bufRanges=[slice(x) for x in source_shape]
-                bufRanges[axis[1]]=slice(layout_dest.shape[axis[0]])
-                bufRanges[0]=slice(start,start+layout_source.mpi_lengths(axis[0])[r])
-                assert(bufView[tuple(bufRanges)].base is buf)
-                
-                # Get a view on the block in the destination memory
-                destRanges=[slice(x) for x in layout_dest.shape]
-                destRanges[axis[2]]=slice(layout_source.mpi_starts(axis[0])[r],
-                                   layout_source.mpi_starts(axis[0])[r]+layout_source.mpi_lengths(axis[0])[r])
-                
-                # Transpose the data. As the axes to be concatenated are the first dimension
-                # the concatenation is done automatically
-                destView[tuple(destRanges)] = np.transpose(bufView[tuple(bufRanges)],transposition)
-    
     def compatible(self, l1: Layout, l2: Layout):
         """
         Check if the data can be passed from one layout to the other in
@@ -455,6 +455,53 @@ def test_LayoutSwap():
     assert(not f_v_2.flags['OWNDATA'])
     assert(not f_p_2.flags['OWNDATA'])
 
+@pytest.mark.parallel
+def test_RepeatedLayoutSwap():
+    npts = [40,20,10,30]
+    comm = MPI.COMM_WORLD
+    
+    nprocs = compute_2d_process_grid( npts, comm.Get_size() )
+    
+    eta_grids=[np.linspace(0,1,npts[0]),
+               np.linspace(0,6.28318531,npts[1]),
+               np.linspace(0,10,npts[2]),
+               np.linspace(0,10,npts[3])]
+    
+    layouts = {'flux_surface': [0,3,1,2],
+               'v_parallel'  : [0,2,1,3],
+               'poloidal'    : [3,2,1,0]}
+    remapper = getLayoutHandler( comm, layouts, nprocs, eta_grids )
+    
+    # A plan is created for each direction of each direct transition
+    for pair in [('flux_surface','v_parallel'),('v_parallel','poloidal')]:
+        assert(pair in remapper._plans)
+        assert(pair[::-1] in remapper._plans)
+    
+    fsLayout = remapper.getLayout('flux_surface')
+    
+    # The plans are reused with the same and with different memory blocks
+    blocks = [np.empty(remapper.bufferSize) for i in range(3)]
+    
+    f_fs = np.split( blocks[0], [fsLayout.size] )[0].reshape(fsLayout.shape)
+    define_f(eta_grids[0],eta_grids[1],eta_grids[2],eta_grids[3],fsLayout,f_fs)
+    
+    route = ['flux_surface','v_parallel','poloidal','v_parallel']
+    current = 0
+    for step in range(12):
+        source_name = route[step%4]
+        dest_name = route[(step+1)%4]
+        dest = (current+1)%3
+        if (step%3==0):
+            remapper.transpose(blocks[current],blocks[dest],source_name,dest_name)
+        else:
+            remapper.transpose(blocks[current],blocks[dest],source_name,dest_name,
+                                blocks[(current+2)%3])
+        current = dest
+        
+        layout = remapper.getLayout(dest_name)
+        f = np.split( blocks[current], [layout.size] )[0].reshape(layout.shape)
+        compare_f(eta_grids[0],eta_grids[1],eta_grids[2],eta_grids[3],layout,f)
+
 @pytest.mark.parallel
 def test_IncompatibleLayoutError():
     npts = [10,10,10,10]
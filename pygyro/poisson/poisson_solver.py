@@ -1,32 +1,22 @@
 from scipy.integrate                import fixed_quad, quadrature   # fixed_quad = fixed order
                                                                     # quadrature = fixed tolerance
-from scipy.fftpack                  import fft,ifft
+from scipy.fftpack                  import fft,ifft,rfft,irfft
 import scipy.sparse                 as sparse
-from scipy.sparse.linalg            import spsolve
+from scipy.linalg                   import solve
+from scipy.sparse.linalg            import splu
 import numpy                        as np
 from numpy.polynomial.legendre      import leggauss
 import warnings
 
 from ..model.grid                   import Grid
 from ..initialisation               import mod_initialiser_funcs    as initialiser
-from ..initialisation               import initialiser_func as MOD_IF
-from ..splines.splines              import BSplines, Spline1D
+from ..splines.splines              import BSplines, Spline1D, SplineEvaluationPlan
 from ..splines.spline_interpolators import SplineInterpolator1D
-from ..splines                      import spline_eval_funcs as SEF
+from ..backends                     import load_kernels
 
 __all__ = ['make_knots', 'BSplines', 'Spline1D', 'Spline2D']
 
-if ('mod_pygyro_splines_spline_eval_funcs' in dir(SEF)):
-    SEF = SEF.mod_pygyro_splines_spline_eval_funcs
-    modFunc = np.transpose
-else:
-    modFunc = lambda c: c
-
-if ('mod_pygyro_initialisation_initialiser_func' in dir(MOD_IF)):
-    MOD_IF = MOD_IF.mod_pygyro_initialisation_initialiser_func
-    modFunc_init = np.transpose
-else:
-    modFunc_init = lambda c: c
+MOD_IF = load_kernels('initialisation.initialiser_func')
 
 class DensityFinder:
     """
@@ -61,15 +51,24 @@ class DensityFinder:
         self._points = np.repeat(starts,n) + np.tile(self._multFact*points,len(starts))
         self._weights = np.tile(weights,len(starts))
         
-        # Create the tools required for the interpolation
-        self._interpolator = SplineInterpolator1D(spline)
-        self._spline = Spline1D(spline)
-        
-        self._splineMem = np.empty_like(self._points)
-        
-        self._fEq = np.empty([eta_grid[0].size,self._points.size])
-        MOD_IF.feq_vector(modFunc_init(self._fEq),eta_grid[0],self._points,constants.CN0,constants.kN0,
+        # As the interpolation and the evaluation are both linear, the
+        # quadrature of the interpolated spline is a dot product with a
+        # fixed weight vector w:
+        # \int f dv = q^T E c = q^T E A^{-1} f = w^T f
+        # where A is the interpolation matrix, E is the collocation matrix
+        # at the quadrature points and q contains the quadrature weights
+        interpMat = SplineInterpolator1D.collocation_matrix(spline.knots,spline.degree,
+                                        spline.greville,spline.periodic)
+        evalMat = SplineInterpolator1D.collocation_matrix(spline.knots,spline.degree,
+                                        self._points,spline.periodic)
+        quadWeights = self._multFact*self._weights
+        self._vWeights = solve(interpMat.T,evalMat.T.dot(quadWeights))
+        
+        # The contribution of the equilibrium only depends on r
+        fEqVals = np.empty([eta_grid[0].size,self._points.size])
+        MOD_IF.feq_vector(fEqVals,eta_grid[0],self._points,constants.CN0,constants.kN0,
                                 constants.deltaRN0,constants.rp,constants.CTi,constants.kTi,constants.deltaRTi)
+        self._fEqIntegral = fEqVals.dot(quadWeights)
     
     def getPerturbedRho ( self, grid: Grid , rho: Grid ):
         """
@@ -90,15 +89,7 @@ class DensityFinder:
         assert(rho.getLayout(rho.currentLayout).dims_order==(0,2,1))
         
         rIndices = grid.getGlobalIdxVals(0)
-        for i,(r,rIdx) in enumerate(zip(grid.getCoordVals(0),rIndices)):
-            for j,z in grid.getCoords(1):
-                rho_qv = rho.get1DSlice([i,j])
-                for k,theta in grid.getCoords(2):
-                    self._interpolator.compute_interpolant(grid.get1DSlice([i,j,k]),self._spline)
-                    SEF.eval_spline_1d_vector(self._points,self._spline.basis.knots,self._spline.basis.degree,
-                            self._spline.coeffs,self._splineMem,0)
-                    rho_qv[k] = np.sum(self._multFact*self._weights*(self._splineMem
-                                        -self._fEq[rIdx]))
+        rho._f[:] = grid._f.dot(self._vWeights) - self._fEqIntegral[rIndices][:,None,None]
     
     def getRho ( self, grid: Grid , rho: Grid ):
         """
@@ -118,14 +109,7 @@ class DensityFinder:
         assert(grid.getLayout(grid.currentLayout).dims_order==(0,2,1,3))
         assert(rho.getLayout(rho.currentLayout).dims_order==(0,2,1))
         
-        for i,r in grid.getCoords(0):
-            for j,z in grid.getCoords(1):
-                rho_qv = rho.get1DSlice([i,j])
-                for k,theta in grid.getCoords(2):
-                    self._interpolator.compute_interpolant(grid.get1DSlice([i,j,k]),self._spline)
-                    SEF.eval_spline_1d_vector(self._points,self._spline.basis.knots,self._spline.basis.degree,
-                            self._spline.coeffs,self._splineMem,0)
-                    rho_qv[k] = np.sum(self._multFact*self._weights*(self._splineMem))
+        rho._f[:] = grid._f.dot(self._vWeights)
     
 class DiffEqSolver:
     """
@@ -206,9 +190,6 @@ class DiffEqSolver:
         startPoints = (rspline.breaks[1:]+rspline.breaks[:-1])*0.5
         self._evalPts = startPoints[:,None]+points[None,:]*multFactor
         
-        # Initialise the memory used for the calculated result
-        self._coeffs = np.empty([rspline.nbasis],np.complex128)
-        
         # Ensure dirichlet boundaries are not used at both boundaries on
         # any mode
         poorlyDefined = [b for b in lNeumannIdx if b in uNeumannIdx]
@@ -319,12 +300,18 @@ class DiffEqSolver:
         
         # Create the tools required for the interpolation
         self._interpolator = SplineInterpolator1D(rspline,dtype=np.complex)
+        self._realInterpolator = SplineInterpolator1D(rspline)
         self._spline = Spline1D(rspline,np.complex128)
-        self._real_spline = Spline1D(rspline)
         
-        self._realMem = np.empty(nr)
-        self._imagMem = np.empty(nr)
-        self._evalRes = np.empty(self._evalPts.size)
+        # The values of the basis functions at the quadrature points
+        self._quadPlan = SplineEvaluationPlan(rspline,self._evalPts.flatten())
+        
+        # The LU factorisation of the stiffness matrix of each mode is
+        # computed the first time the mode is solved and reused afterwards
+        self._stiffnessLU = {}
+        
+        # Plan used to evaluate the solution on the grid
+        self._evalPlan = None
     
     def funcIsNull( self, f ):
         vals = f(self._evalPts)
@@ -337,6 +324,10 @@ class DiffEqSolver:
         """
         Get the Fourier transform of the right hand side of the
         differential equation.
+        
+        If rho is a real grid then only the non-negative modes are stored,
+        using the packed format of scipy.fftpack.rfft:
+        [y(0),Re(y(1)),Im(y(1)),...,Re(y(n/2))]
 
         Parameters
         ----------
@@ -345,13 +336,15 @@ class DiffEqSolver:
             differential equation.
         
         """
-        assert(type(rho.get1DSlice([0,0])[0])==np.complex128)
+        assert(rho._f.dtype in (np.float64,np.complex128))
         assert(rho.getLayout(rho.currentLayout).dims_order==(0,2,1))
-        for i,r in rho.getCoords(0):
-            for j,z in rho.getCoords(1):
-                vec=rho.get1DSlice([i,j])
-                mode=fft(vec,overwrite_x=True)
-                vec[:]=mode
+        
+        # Transform all the lines along theta at once. The transform is
+        # carried out in place and fftpack caches the plan for each size
+        if (np.iscomplexobj(rho._f)):
+            rho._f[:] = fft(rho._f,axis=-1,overwrite_x=True)
+        else:
+            rho._f[:] = rfft(rho._f,axis=-1,overwrite_x=True)
     
     def solveEquation( self, phi: Grid, rho: Grid ):
         """
@@ -375,17 +368,7 @@ class DiffEqSolver:
         assert(rho.getLayout(rho.currentLayout).dims_order[-1]==0)
         
         for i,I in enumerate(rho.getGlobalIdxVals(0)):
-            # For each mode on this process, create the necessary matrix
-            stiffnessMatrix = (self._stiffnessMatrix - self._mVals[I]*self._k2PhiPsi) \
-                                    [self._stiffness_range[I],self._stiffness_range[I]]
-            
-            # Set Dirichlet boundary conditions
-            # In the case of Neumann boundary conditions these values
-            # will be overwritten
-            self._coeffs[0] = 0
-            self._coeffs[-1] = 0
-            
-            self._solveMode(phi,rho,stiffnessMatrix,i,I)
+            self._solveMode(phi,rho,i,self._getModeIdx(rho,I))
     
     def solveEquationForFunction( self, phi: Grid, rho ):
         """
@@ -407,81 +390,99 @@ class DiffEqSolver:
         """
         
         for i,I in enumerate(phi.getGlobalIdxVals(0)):
-            # For each mode on this process, create the necessary matrix
-            stiffnessMatrix = (self._stiffnessMatrix - self._mVals[I]*self._k2PhiPsi) \
-                                    [self._stiffness_range[I],self._stiffness_range[I]]
-            
-            # Set Dirichlet boundary conditions
-            # In the case of Neumann boundary conditions these values
-            # will be overwritten
-            self._coeffs[0] = 0
-            self._coeffs[-1] = 0
-            
-            self._solveModeFunc(phi,rho,stiffnessMatrix,i,I)
+            self._solveModeFunc(phi,rho,i,self._getModeIdx(phi,I))
     
-    def _solveMode(self, phi: Grid, rho: Grid, stiffnessMatrix: sparse.csc.csc_matrix, i: int, I: int):
+    def _getModeIdx( self, grid: Grid, I: int ):
+        """
+        Get the index of the mode stored at the index I of a grid
+        """
+        if (np.iscomplexobj(grid._f)):
+            return I
+        else:
+            # The real and imaginary parts of each mode are stored next
+            # to each other in the packed format of scipy.fftpack.rfft
+            return (I+1)//2
+    
+    def _getStiffnessMatrix( self, I: int ):
+        """
+        Get the stiffness matrix for the I-th mode
+        """
+        return (self._stiffnessMatrix - self._mVals[I]*self._k2PhiPsi) \
+                    [self._stiffness_range[I],self._stiffness_range[I]]
+    
+    def _getFactorisation( self, I: int ):
+        """
+        Get the LU factorisation of the stiffness matrix for the I-th mode
+        """
+        if (I not in self._stiffnessLU):
+            self._stiffnessLU[I] = splu(sparse.csc_matrix(self._getStiffnessMatrix(I)))
+        return self._stiffnessLU[I]
+    
+    def _solveFactorised( self, I: int, rhs: np.ndarray ):
+        """
+        Solve the system for the I-th mode for all the columns of rhs
+        """
+        lu = self._getFactorisation(I)
+        if (np.iscomplexobj(rhs)):
+            # The matrix is real so the real and imaginary parts are
+            # solved together as independent columns
+            sol = lu.solve(np.ascontiguousarray(rhs).view(np.float64))
+            return np.ascontiguousarray(sol).view(np.complex128)
+        else:
+            return lu.solve(rhs)
+    
+    def _getEvalPlan( self, pts: np.ndarray ):
+        """
+        Get the plan which evaluates a spline along r at the points pts
+        """
+        if (self._evalPlan is None or not np.array_equal(self._evalPlan.points,pts)):
+            self._evalPlan = SplineEvaluationPlan(self._rspline,pts)
+        return self._evalPlan
+    
+    def _solveMode(self, phi: Grid, rho: Grid, i: int, I: int):
         massMat = self._massMatrix[self._stiffness_range[I],:]
-        coeffs= self._coeffs[self._coeff_range[I]]
-        for j,z in rho.getCoords(1):
-            # Calculate the coefficients related to rho
-            self._interpolator.compute_interpolant(rho.get1DSlice([i,j]),self._spline)
-            
-            # Save the solution to the preprepared buffer
-            # The boundary values of this buffer are already set if
-            # dirichlet boundary conditions are used
-            coeffs[:] = spsolve(stiffnessMatrix, massMat.dot(self._spline.coeffs))
-            
-            # Find the values at the greville points by interpolating
-            # the real and imaginary parts of the coefficients individually
-            self._real_spline.coeffs[:] = np.real(self._coeffs)
-            SEF.eval_spline_1d_vector(phi.getCoordVals(2),self._real_spline.basis.knots,
-                                    self._real_spline.basis.degree,self._real_spline.coeffs,
-                                    self._realMem,0)
-            
-            self._real_spline.coeffs[:] = np.imag(self._coeffs)
-            SEF.eval_spline_1d_vector(phi.getCoordVals(2),self._real_spline.basis.knots,
-                                    self._real_spline.basis.degree,self._real_spline.coeffs,
-                                    self._imagMem,0)
-            
-            phi.get1DSlice([i,j])[:] = self._realMem+1j*self._imagMem
-    
-    def _solveModeFunc(self, phi: Grid, rho, stiffnessMatrix: sparse.csc.csc_matrix, i: int, I: int):
-        coeffs  = self._coeffs[self._coeff_range[I]]
-        
-        rhoVec = np.zeros(self._rspline.greville.size)
-        
-        for j in range(self._rspline.nbasis):
-            SEF.eval_spline_1d_vector(self._evalPts.flatten(),self._rspline[j].basis.knots,
-                                    self._rspline[j].basis.degree,self._rspline[j].coeffs,
-                                    self._evalRes,0)
-            rhoVec[j]=np.sum(np.tile(self._weights,len(self._evalPts))*self._multFactor \
-                            * self._evalRes * self._evalPts.flatten() \
-                            * rho(self._evalPts.flatten()))
-        
-        for j,z in phi.getCoords(1):
-            # Save the solution to the preprepared buffer
-            # The boundary values of this buffer are already set if
-            # dirichlet boundary conditions are used
-            coeffs[:] = spsolve(stiffnessMatrix, rhoVec[self._coeff_range[I]])
-            
-            # Find the values at the greville points by interpolating
-            # the real and imaginary parts of the coefficients individually
-            self._real_spline.coeffs[:] = np.real(self._coeffs)
-            SEF.eval_spline_1d_vector(phi.getCoordVals(2),self._real_spline.basis.knots,
-                                    self._real_spline.basis.degree,self._real_spline.coeffs,
-                                    self._realMem,0)
-            
-            self._real_spline.coeffs[:] = np.imag(self._coeffs)
-            SEF.eval_spline_1d_vector(phi.getCoordVals(2),self._real_spline.basis.knots,
-                                    self._real_spline.basis.degree,self._real_spline.coeffs,
-                                    self._imagMem,0)
-            
-            phi.get1DSlice([i,j])[:] = self._realMem+1j*self._imagMem
+        
+        # Calculate the coefficients related to rho for all values of z
+        rho_i = rho.get2DSlice([i])
+        rhoCoeffs = np.empty([rho_i.shape[0],self._spline.coeffs.size],dtype=rho_i.dtype)
+        if (np.iscomplexobj(rho_i)):
+            self._interpolator.compute_interpolant_batch(rho_i,rhoCoeffs)
+        else:
+            self._realInterpolator.compute_interpolant_batch(rho_i,rhoCoeffs)
+        
+        # Solve the system for all values of z at once.
+        # The boundary values are left at 0 if dirichlet boundary
+        # conditions are used
+        coeffs = np.zeros_like(rhoCoeffs)
+        coeffs[:,self._coeff_range[I]] = self._solveFactorised(I, massMat.dot(rhoCoeffs.T)).T
+        
+        # Find the values at the greville points
+        phi.get2DSlice([i])[:] = self._getEvalPlan(phi.getCoordVals(2)).eval(coeffs)
+    
+    def _solveModeFunc(self, phi: Grid, rho, i: int, I: int):
+        # The integral of rho multiplied by each basis function is a
+        # product with the values of the basis functions at the
+        # quadrature points
+        evalPts = self._evalPts.flatten()
+        rhoVec = self._quadPlan.matrix.T.dot(np.tile(self._weights,len(self._evalPts)) \
+                            * self._multFactor * evalPts * rho(evalPts))
+        
+        # The boundary values are left at 0 if dirichlet boundary
+        # conditions are used
+        coeffs = np.zeros(self._rspline.nbasis)
+        coeffs[self._coeff_range[I]] = self._solveFactorised(I, rhoVec[self._coeff_range[I]])
+        
+        # The right hand side does not depend on z so the values at the
+        # greville points are the same for all values of z
+        phi.get2DSlice([i])[:] = self._getEvalPlan(phi.getCoordVals(2)).eval(coeffs)[None,:]
     
     def findPotential( self, phi: Grid ):
         """
         Get the inverse Fourier transform of the (solved) unknown
         
+        If phi is a real grid then the modes are expected in the packed
+        format of scipy.fftpack.rfft
+        
         Parameters
         ----------
         phi : Grid
@@ -490,14 +491,15 @@ class DiffEqSolver:
         
         """
         
-        assert(type(phi.get1DSlice([0,0])[0])==np.complex128)
+        assert(phi._f.dtype in (np.float64,np.complex128))
         assert(phi.getLayout(phi.currentLayout).dims_order==(0,2,1))
         
-        for i,r in phi.getCoords(0):
-            for j,z in phi.getCoords(1):
-                vec=phi.get1DSlice([i,j])
-                mode=ifft(vec,overwrite_x=True)
-                vec[:]=mode
+        # Transform all the lines along theta at once. The transform is
+        # carried out in place and fftpack caches the plan for each size
+        if (np.iscomplexobj(phi._f)):
+            phi._f[:] = ifft(phi._f,axis=-1,overwrite_x=True)
+        else:
+            phi._f[:] = irfft(phi._f,axis=-1,overwrite_x=True)
 
 class QuasiNeutralitySolver(DiffEqSolver):
     """
@@ -606,40 +608,11 @@ class QuasiNeutralitySolver(DiffEqSolver):
             else:
                 raise ValueError("The argument chi must be either 0 or 1")
     
-    def solveEquation( self, phi: Grid, rho: Grid ):
+    def _getStiffnessMatrix( self, I: int ):
         """
-        Solve the differential equation.
-        The equation is solved in Fourier space. The application of the
-        Fourier transform and inverse Fourier transform is not handled 
-        by this function
-        
-        Parameters
-        ----------
-        phi : Grid
-            The grid in which the calculated values of the Fourier transform
-            of the unknown will be stored
-        
-        rho : Grid
-            A grid containing the values of the the right hand side of the
-            differential equation.
-        
+        Get the stiffness matrix for the I-th mode
         """
-        
-        assert(rho.getLayout(rho.currentLayout).dims_order[-1]==0)
-        
-        for i,I in enumerate(rho.getGlobalIdxVals(0)):
-            #m = i + rho.getLayout(rho.currentLayout).starts[0]-self._nq2
-            # For each mode on this process, create the necessary matrix
-            if (self._mVals[I]==0):
-                stiffnessMatrix = self._stiffness0
-            else:
-                stiffnessMatrix = (self._stiffnessMatrix - self._mVals[I]*self._k2PhiPsi) \
-                                    [self._stiffness_range[I],self._stiffness_range[I]]
-            
-            # Set Dirichlet boundary conditions
-            # In the case of Neumann boundary conditions these values
-            # will be overwritten
-            self._coeffs[0] = 0
-            self._coeffs[-1] = 0
-            
-            self._solveMode(phi,rho,stiffnessMatrix,i,I)
+        if (self._mVals[I]==0):
+            return self._stiffness0
+        else:
+            return DiffEqSolver._getStiffnessMatrix(self,I)
@@ -931,6 +931,45 @@ def test_QNSolver():
     
     qnSolver.findPotential(phi)
 
+@pytest.mark.serial
+@pytest.mark.parametrize( "nq", [32,33] )
+def test_QNSolver_real(nq):
+    comm = MPI.COMM_WORLD
+    
+    npts = [32, nq, 8]
+    nptsGrid = [*npts, 16]
+    
+    layout_poisson = {'mode_solve': [1,2,0],
+                      'v_parallel': [0,2,1]}
+    
+    grid,constants,t = setupCylindricalGrid(npts=nptsGrid,layout='v_parallel')
+    
+    remapper = getLayoutHandler(comm,layout_poisson,[comm.Get_size()],grid.eta_grid[:3])
+    
+    splines = grid.getSpline(slice(0,3))
+    rho  = Grid(grid.eta_grid[:3],splines,remapper,'v_parallel',comm,dtype=np.float64)
+    phi  = Grid(grid.eta_grid[:3],splines,remapper,'mode_solve',comm,dtype=np.float64)
+    rhoC = Grid(grid.eta_grid[:3],splines,remapper,'v_parallel',comm,dtype=np.complex128)
+    phiC = Grid(grid.eta_grid[:3],splines,remapper,'mode_solve',comm,dtype=np.complex128)
+    
+    df = DensityFinder(3,grid.getSpline(3),grid.eta_grid,constants)
+    
+    df.getPerturbedRho(grid,rho)
+    rhoC._f[:] = rho._f
+    
+    qnSolver = QuasiNeutralitySolver(grid.eta_grid,6,rho.getSpline(0),constants,chi=0)
+    
+    for r,p in [(rho,phi),(rhoC,phiC)]:
+        qnSolver.getModes(r)
+        r.setLayout('mode_solve')
+        qnSolver.solveEquation(p,r)
+        p.setLayout('v_parallel')
+        qnSolver.findPotential(p)
+    
+    assert(np.abs(phi._f).max()>0)
+    assert(np.allclose(phi._f,np.real(phiC._f),rtol=1e-10,atol=1e-12))
+    assert(np.abs(np.imag(phiC._f)).max()<1e-10)
+
 @pytest.mark.parallel
 def test_Equilibrium():
     comm = MPI.COMM_WORLD
@@ -25,7 +25,9 @@ integer(kind=4) :: low
 !                                                            !
 !    For a degree p, the knot span index i identifies the    !
 !    indices [i-p:i] of all p+1 non-zero basis functions at a!
-!    given location x.                                       !
+!    given location x. The span is found in O(1) operations  !
+!    if the knots are uniform, otherwise a binary search is  !
+!    used.                                                   !
 !                                                            !
 !    Parameters                                              !
 !    ----------                                              !
@@ -58,16 +60,23 @@ if (x <= knots(low)) then
 else if (x >= knots(high)) then
   returnVal = high - 1
 else
-  ! Perform binary search
-  span = Int(0.5d0*(high + low))
-  do while (x >= knots(span + 1) .or. x < knots(span))
-    if (x < knots(span)) then
-      high = span
-    else
-      low = span
-    end if
+  ! Compute the span assuming that the knots are uniform. This is
+  ! exact for the uniform breakpoints used in the simulations
+  span = low + Int((x - knots(low))*(high - low)/(knots(high) - knots(low &
+      )))
+  span = min(span, high - 1)
+  if (x < knots(span) .or. x >= knots(span + 1)) then
+    ! Perform binary search
     span = Int(0.5d0*(high + low))
-  end do
+    do while (x >= knots(span + 1) .or. x < knots(span))
+      if (x < knots(span)) then
+        high = span
+      else
+        low = span
+      end if
+      span = Int(0.5d0*(high + low))
+    end do
+  end if
   returnVal = span
 
 
@@ -90,9 +99,9 @@ real(kind=8), intent(in)  :: x
 integer(kind=4), intent(in)  :: span
 real(kind=8), intent(inout)  :: values (0:)
 real(kind=8) :: saved
-real(kind=8), allocatable :: right (:)
+real(kind=8) :: right
 integer(kind=4) :: j
-real(kind=8), allocatable :: left (:)
+real(kind=8) :: left
 integer(kind=4) :: r
 real(kind=8) :: temp
 
@@ -125,25 +134,23 @@ real(kind=8) :: temp
 !    -----                                                   !
 !    The original Algorithm A2.2 in The NURBS Book [1] is her!
 !e                                                           !
-!    slightly improved by using 'left' and 'right' temporary !
-!    arrays that are one element shorter.                    !
+!    modified so that the 'left' and 'right' knot differences!
+! are                                                        !
+!    computed when they are needed instead of being stored in!
+!    temporary arrays. No memory is therefore allocated.     !
 !                                                            !
 !                                                            !
 !____________________________________________________________!
 
-allocate(left(0:degree - 1))
-allocate(right(0:degree - 1))
-
-
 values(0) = 1.0d0
 do j = 0, degree - 1, 1
-  left(j) = x - knots(-j + span)
-  right(j) = -x + knots(span + j + 1)
   saved = 0.0d0
   do r = 0, j, 1
-    temp = values(r)/(left(j - r) + right(r))
-    values(r) = saved + temp*right(r)
-    saved = temp*left(j - r)
+    left = x - knots(r - j + span)
+    right = -x + knots(span + r + 1)
+    temp = values(r)/(left + right)
+    values(r) = saved + temp*right
+    saved = temp*left
   end do
 
   values(j + 1) = saved
@@ -163,7 +170,6 @@ integer(kind=4), intent(in)  :: degree
 real(kind=8), intent(in)  :: x
 integer(kind=4), intent(in)  :: span
 real(kind=8), intent(inout)  :: ders (0:)
-real(kind=8), allocatable :: values (:)
 real(kind=8) :: saved
 integer(kind=4) :: j
 real(kind=8) :: temp
@@ -204,10 +210,9 @@ real(kind=8) :: temp
 !______________________________________________________________!
 ! Compute nonzero basis functions and knot differences for spl
 ! ines
-! up to degree deg-1
-
-allocate(values(0:degree - 1))
-call basis_funs(knots, degree - 1, x, span, values)
+! up to degree deg-1. They are stored in ders and overwritten by
+! the derivatives
+call basis_funs(knots, degree - 1, x, span, ders)
 
 
 ! Compute derivatives at x using formula based on difference o
@@ -215,12 +220,12 @@ call basis_funs(knots, degree - 1, x, span, values)
 ! splines of degree deg-1
 ! -------
 ! j = 0
-saved = degree*(values(0)/(knots(span + 1) - knots(span - degree + 1)))
+saved = degree*(ders(0)/(knots(span + 1) - knots(span - degree + 1)))
 ders(0) = -saved
 ! j = 1,...,degree-1
 do j = 1, degree - 1, 1
   temp = saved
-  saved = degree*(values(j)/(knots(span + j + 1) - knots(span + j - &
+  saved = degree*(ders(j)/(knots(span + j + 1) - knots(span + j - &
       degree + 1)))
   ders(j) = -saved + temp
 end do
@@ -10,7 +10,8 @@ def find_span( knots, degree, x ):
 
     For a degree p, the knot span index i identifies the
     indices [i-p:i] of all p+1 non-zero basis functions at a
-    given location x.
+    given location x. The span is found in O(1) operations
+    if the knots are uniform, otherwise a binary search is used.
 
     Parameters
     ----------
@@ -38,14 +39,19 @@ def find_span( knots, degree, x ):
     if x <= knots[low ]: returnVal = low
     elif x >= knots[high]: returnVal = high-1
     else:
-        # Perform binary search
-        span = (low+high)//2
-        while x < knots[span] or x >= knots[span+1]:
-            if x < knots[span]:
-               high = span
-            else:
-               low  = span
+        # Compute the span assuming that the knots are uniform. This is
+        # exact for the uniform breakpoints used in the simulations
+        span = low + int((x-knots[low])*(high-low)/(knots[high]-knots[low]))
+        span = min(span,high-1)
+        if x < knots[span] or x >= knots[span+1]:
+            # Perform binary search
             span = (low+high)//2
+            while x < knots[span] or x >= knots[span+1]:
+                if x < knots[span]:
+                   high = span
+                else:
+                   low  = span
+                span = (low+high)//2
         returnVal = span
 
     return returnVal
@@ -80,23 +86,20 @@ def basis_funs( knots, degree, x, span, values ):
     Notes
     -----
     The original Algorithm A2.2 in The NURBS Book [1] is here
-    slightly improved by using 'left' and 'right' temporary
-    arrays that are one element shorter.
+    modified so that the 'left' and 'right' knot differences are
+    computed when they are needed instead of being stored in
+    temporary arrays. No memory is therefore allocated.
 
     """
-    from numpy      import empty
-    left   = empty( degree  , dtype=float )
-    right  = empty( degree  , dtype=float )
-
     values[0] = 1.0
     for j in range(0,degree):
-        left [j] = x - knots[span-j]
-        right[j] = knots[span+1+j] - x
         saved    = 0.0
         for r in range(0,j+1):
-            temp      = values[r] / (right[r] + left[j-r])
-            values[r] = saved + right[r] * temp
-            saved     = left[j-r] * temp
+            left      = x - knots[span-j+r]
+            right     = knots[span+1+r] - x
+            temp      = values[r] / (right + left)
+            values[r] = saved + right * temp
+            saved     = left * temp
         values[j+1] = saved
 
 @types('double[:]','int','double','int','double[:]')
@@ -131,21 +134,20 @@ def basis_funs_1st_der( knots, degree, x, span, ders ):
 
     """
     # Compute nonzero basis functions and knot differences for splines
-    # up to degree deg-1
-    from numpy      import empty
-    values = empty(degree)
-    basis_funs( knots, degree-1, x, span, values )
+    # up to degree deg-1. They are stored in ders and overwritten by
+    # the derivatives
+    basis_funs( knots, degree-1, x, span, ders )
 
     # Compute derivatives at x using formula based on difference of
     # splines of degree deg-1
     # -------
     # j = 0
-    saved = degree * values[0] / (knots[span+1]-knots[span+1-degree])
+    saved = degree * ders[0] / (knots[span+1]-knots[span+1-degree])
     ders[0] = -saved
     # j = 1,...,degree-1
     for j in range(1,degree):
         temp    = saved
-        saved   = degree * values[j] / (knots[span+j+1]-knots[span+j+1-degree])
+        saved   = degree * ders[j] / (knots[span+j+1]-knots[span+j+1-degree])
         ders[j] = temp - saved
     # j = degree
     ders[degree] = saved
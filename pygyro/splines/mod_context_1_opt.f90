@@ -33,7 +33,9 @@ integer(kind=4) :: low
 !                                                            !
 !    For a degree p, the knot span index i identifies the    !
 !    indices [i-p:i] of all p+1 non-zero basis functions at a!
-!    given location x.                                       !
+!    given location x. The span is found in O(1) operations  !
+!    if the knots are uniform, otherwise a binary search is  !
+!    used.                                                   !
 !                                                            !
 !    Parameters                                              !
 !    ----------                                              !
@@ -67,16 +69,22 @@ if (x <= knots(low)) then
 else if (x >= knots(high)) then
   returnVal = high - 1
 else
-  ! Perform binary search
-  span = (low+high)/2
-  do while (x >= knots(span + 1) .or. x < knots(span))
-    if (x < knots(span)) then
-      high = span
-    else
-      low = span
-    end if
+  ! Compute the span assuming that the knots are uniform. This is
+  ! exact for the uniform breakpoints used in the simulations
+  span = low + int((x-knots(low))*(high-low)/(knots(high)-knots(low)))
+  span = min(span, high-1)
+  if (x < knots(span) .or. x >= knots(span + 1)) then
+    ! Perform binary search
     span = (low+high)/2
-  end do
+    do while (x >= knots(span + 1) .or. x < knots(span))
+      if (x < knots(span)) then
+        high = span
+      else
+        low = span
+      end if
+      span = (low+high)/2
+    end do
+  end if
   returnVal = span
 end if
 
@@ -25,7 +25,9 @@ integer(kind=4) :: high
 !                                                            !
 !    For a degree p, the knot span index i identifies the    !
 !    indices [i-p:i] of all p+1 non-zero basis functions at a!
-!    given location x.                                       !
+!    given location x. The span is found in O(1) operations  !
+!    if the knots are uniform, otherwise a binary search is  !
+!    used.                                                   !
 !                                                            !
 !    Parameters                                              !
 !    ----------                                              !
@@ -58,16 +60,23 @@ if (x <= knots(low)) then
 else if (x >= knots(high)) then
   returnVal = high - 1
 else
-  ! Perform binary search
-  span = Int(0.5d0*(high + low))
-  do while (x >= knots(span + 1) .or. x < knots(span))
-    if (x < knots(span)) then
-      high = span
-    else
-      low = span
-    end if
+  ! Compute the span assuming that the knots are uniform. This is
+  ! exact for the uniform breakpoints used in the simulations
+  span = low + Int((x - knots(low))*(high - low)/(knots(high) - knots(low &
+      )))
+  span = min(span, high - 1)
+  if (x < knots(span) .or. x >= knots(span + 1)) then
+    ! Perform binary search
     span = Int(0.5d0*(high + low))
-  end do
+    do while (x >= knots(span + 1) .or. x < knots(span))
+      if (x < knots(span)) then
+        high = span
+      else
+        low = span
+      end if
+      span = Int(0.5d0*(high + low))
+    end do
+  end if
   returnVal = span
 
 
@@ -91,9 +100,9 @@ integer(kind=4), intent(in)  :: span
 real(kind=8), intent(inout)  :: values (0:)
 real(kind=8) :: saved
 integer(kind=4) :: j
-real(kind=8), allocatable :: left (:)
+real(kind=8) :: left
 integer(kind=4) :: r
-real(kind=8), allocatable :: right (:)
+real(kind=8) :: right
 real(kind=8) :: temp
 
 !________________________CommentBlock________________________!
@@ -125,25 +134,23 @@ real(kind=8) :: temp
 !    -----                                                   !
 !    The original Algorithm A2.2 in The NURBS Book [1] is her!
 !e                                                           !
-!    slightly improved by using 'left' and 'right' temporary !
-!    arrays that are one element shorter.                    !
+!    modified so that the 'left' and 'right' knot differences!
+! are                                                        !
+!    computed when they are needed instead of being stored in!
+!    temporary arrays. No memory is therefore allocated.     !
 !                                                            !
 !                                                            !
 !____________________________________________________________!
 
-allocate(left(0:degree - 1))
-allocate(right(0:degree - 1))
-
-
 values(0) = 1.0d0
 do j = 0, degree - 1, 1
-  left(j) = x - knots(-j + span)
-  right(j) = -x + knots(span + j + 1)
   saved = 0.0d0
   do r = 0, j, 1
-    temp = values(r)/(left(j - r) + right(r))
-    values(r) = saved + temp*right(r)
-    saved = temp*left(j - r)
+    left = x - knots(r - j + span)
+    right = -x + knots(span + r + 1)
+    temp = values(r)/(left + right)
+    values(r) = saved + temp*right
+    saved = temp*left
   end do
 
   values(j + 1) = saved
@@ -167,7 +174,6 @@ integer(kind=4), intent(in)  :: span
 real(kind=8), intent(inout)  :: ders (0:)
 real(kind=8) :: saved
 integer(kind=4) :: j
-real(kind=8), allocatable :: values (:)
 real(kind=8) :: temp
 
 !_________________________CommentBlock_________________________!
@@ -206,10 +212,9 @@ real(kind=8) :: temp
 !______________________________________________________________!
 ! Compute nonzero basis functions and knot differences for spl
 ! ines
-! up to degree deg-1
-
-allocate(values(0:degree - 1))
-call basis_funs(knots, degree - 1, x, span, values)
+! up to degree deg-1. They are stored in ders and overwritten by
+! the derivatives
+call basis_funs(knots, degree - 1, x, span, ders)
 
 
 ! Compute derivatives at x using formula based on difference o
@@ -217,12 +222,12 @@ call basis_funs(knots, degree - 1, x, span, values)
 ! splines of degree deg-1
 ! -------
 ! j = 0
-saved = degree*(values(0)/(knots(span + 1) - knots(span - degree + 1)))
+saved = degree*(ders(0)/(knots(span + 1) - knots(span - degree + 1)))
 ders(0) = -saved
 ! j = 1,...,degree-1
 do j = 1, degree - 1, 1
   temp = saved
-  saved = degree*(values(j)/(knots(span + j + 1) - knots(span + j - &
+  saved = degree*(ders(j)/(knots(span + j + 1) - knots(span + j - &
       degree + 1)))
   ders(j) = -saved + temp
 end do
@@ -343,9 +348,9 @@ real(kind=8), intent(in)  :: coeffs (0:,0:)
 integer(kind=4), intent(in)  :: der1
 integer(kind=4), intent(in)  :: der2
 integer(kind=4) :: span2
-real(kind=8), allocatable :: basis2 (:)
-real(kind=8), allocatable :: basis1 (:)
-real(kind=8), allocatable :: theCoeffs (:,:)
+real(kind=8) :: basis2 (0:deg2)
+real(kind=8) :: basis1 (0:deg1)
+real(kind=8) :: theCoeff
 integer(kind=4) :: i
 integer(kind=4) :: span1
 integer(kind=4) :: j
@@ -355,8 +360,6 @@ span2 = find_span(kts2, deg2, y)
 
 
 
-allocate(basis1(0:deg1))
-allocate(basis2(0:deg2))
 if (der1 == 0 ) then
 call basis_funs(kts1, deg1, x, span1, basis1)
 else if (der1 == 1 ) then
@@ -369,18 +372,17 @@ call basis_funs_1st_der(kts2, deg2, y, span2, basis2)
 
 
 end if
-allocate(theCoeffs(0:deg2, 0:deg1))
-theCoeffs(:, :) = coeffs(-deg2 + span2:span2, -deg1 + span1:span1)
 
 
 z = 0.0d0
 do i = 0, deg1, 1
-theCoeffs(0, i) = basis2(0)*theCoeffs(0, i)
+theCoeff = basis2(0)*coeffs(span2 - deg2, span1 - deg1 + i)
 do j = 1, deg2, 1
-theCoeffs(0, i) = basis2(j)*theCoeffs(j, i) + theCoeffs(0, i)
+theCoeff = basis2(j)*coeffs(span2 - deg2 + j, span1 - deg1 + i) + &
+      theCoeff
 end do
 
-z = z + basis1(i)*theCoeffs(0, i)
+z = z + basis1(i)*theCoeff
 end do
 
 return
@@ -391,6 +393,71 @@ return
 end function
 ! ........................................
 
+! ........................................
+subroutine eval_spline_2d_multi(x, y, kts1, deg1, kts2, deg2, coeffs, &
+      ders, z)
+
+implicit none
+real(kind=8), intent(in)  :: x
+real(kind=8), intent(in)  :: y
+real(kind=8), intent(in)  :: kts1 (0:)
+integer(kind=4), intent(in)  :: deg1
+real(kind=8), intent(in)  :: kts2 (0:)
+integer(kind=4), intent(in)  :: deg2
+real(kind=8), intent(in)  :: coeffs (0:,0:)
+integer(kind=4), intent(in)  :: ders (0:,0:)
+real(kind=8), intent(inout)  :: z (0:)
+integer(kind=4) :: span2
+real(kind=8) :: basis2 (0:deg2,0:1)
+real(kind=8) :: basis1 (0:deg1,0:1)
+real(kind=8) :: theCoeff
+integer(kind=4) :: der1
+integer(kind=4) :: der2
+integer(kind=4) :: i
+integer(kind=4) :: span1
+integer(kind=4) :: j
+integer(kind=4) :: k
+
+!________________________CommentBlock________________________!
+!                                                            !
+!    Evaluate several derivatives of a 2D spline at the      !
+!    point (x,y). The spans and the values of the basis      !
+!    functions and of their first derivatives are only       !
+!    computed once for all the derivatives.                  !
+!    ders[k] contains the orders (der1,der2) of the k-th     !
+!    derivative whose value is stored in z[k]                !
+!                                                            !
+!____________________________________________________________!
+span1 = find_span(kts1, deg1, x)
+span2 = find_span(kts2, deg2, y)
+
+
+
+call basis_funs(kts1, deg1, x, span1, basis1(:, 0))
+call basis_funs_1st_der(kts1, deg1, x, span1, basis1(:, 1))
+call basis_funs(kts2, deg2, y, span2, basis2(:, 0))
+call basis_funs_1st_der(kts2, deg2, y, span2, basis2(:, 1))
+
+
+do k = 0, size(ders,2) - 1, 1
+der1 = ders(0, k)
+der2 = ders(1, k)
+z(k) = 0.0d0
+do i = 0, deg1, 1
+theCoeff = basis2(0, der2)*coeffs(span2 - deg2, span1 - deg1 + i)
+do j = 1, deg2, 1
+theCoeff = basis2(j, der2)*coeffs(span2 - deg2 + j, span1 - deg1 + i) &
+      + theCoeff
+end do
+
+z(k) = z(k) + basis1(i, der1)*theCoeff
+end do
+
+end do
+
+end subroutine
+! ........................................
+
 ! ........................................
 subroutine eval_spline_2d_cross(xVec, yVec, kts1, deg1, kts2, deg2, &
       coeffs, z, der1, der2)
@@ -10,7 +10,8 @@ def find_span( knots, degree, x ):
 
     For a degree p, the knot span index i identifies the
     indices [i-p:i] of all p+1 non-zero basis functions at a
-    given location x.
+    given location x. The span is found in O(1) operations
+    if the knots are uniform, otherwise a binary search is used.
 
     Parameters
     ----------
@@ -38,14 +39,19 @@ def find_span( knots, degree, x ):
     if x <= knots[low ]: returnVal = low
     elif x >= knots[high]: returnVal = high-1
     else:
-        # Perform binary search
-        span = (low+high)//2
-        while x < knots[span] or x >= knots[span+1]:
-            if x < knots[span]:
-               high = span
-            else:
-               low  = span
+        # Compute the span assuming that the knots are uniform. This is
+        # exact for the uniform breakpoints used in the simulations
+        span = low + int((x-knots[low])*(high-low)/(knots[high]-knots[low]))
+        span = min(span,high-1)
+        if x < knots[span] or x >= knots[span+1]:
+            # Perform binary search
             span = (low+high)//2
+            while x < knots[span] or x >= knots[span+1]:
+                if x < knots[span]:
+                   high = span
+                else:
+                   low  = span
+                span = (low+high)//2
         returnVal = span
 
     return returnVal
@@ -80,23 +86,20 @@ def basis_funs( knots, degree, x, span, values ):
     Notes
     -----
     The original Algorithm A2.2 in The NURBS Book [1] is here
-    slightly improved by using 'left' and 'right' temporary
-    arrays that are one element shorter.
+    modified so that the 'left' and 'right' knot differences are
+    computed when they are needed instead of being stored in
+    temporary arrays. No memory is therefore allocated.
 
     """
-    from numpy      import empty
-    left   = empty( degree  , dtype=float )
-    right  = empty( degree  , dtype=float )
-
     values[0] = 1.0
     for j in range(0,degree):
-        left [j] = x - knots[span-j]
-        right[j] = knots[span+1+j] - x
         saved    = 0.0
         for r in range(0,j+1):
-            temp      = values[r] / (right[r] + left[j-r])
-            values[r] = saved + right[r] * temp
-            saved     = left[j-r] * temp
+            left      = x - knots[span-j+r]
+            right     = knots[span+1+r] - x
+            temp      = values[r] / (right + left)
+            values[r] = saved + right * temp
+            saved     = left * temp
         values[j+1] = saved
 
 #==============================================================================
@@ -132,21 +135,20 @@ def basis_funs_1st_der( knots, degree, x, span, ders ):
 
     """
     # Compute nonzero basis functions and knot differences for splines
-    # up to degree deg-1
-    from numpy      import empty
-    values = empty(degree)
-    basis_funs( knots, degree-1, x, span, values )
+    # up to degree deg-1. They are stored in ders and overwritten by
+    # the derivatives
+    basis_funs( knots, degree-1, x, span, ders )
 
     # Compute derivatives at x using formula based on difference of
     # splines of degree deg-1
     # -------
     # j = 0
-    saved = degree * values[0] / (knots[span+1]-knots[span+1-degree])
+    saved = degree * ders[0] / (knots[span+1]-knots[span+1-degree])
     ders[0] = -saved
     # j = 1,...,degree-1
     for j in range(1,degree):
         temp    = saved
-        saved   = degree * values[j] / (knots[span+j+1]-knots[span+j+1-degree])
+        saved   = degree * ders[j] / (knots[span+j+1]-knots[span+j+1-degree])
         ders[j] = temp - saved
     # j = degree
     ders[degree] = saved
@@ -210,24 +212,51 @@ def eval_spline_2d_scalar(x,y,kts1,deg1,kts2,deg2,coeffs,der1=0,der2=0):
     elif (der2==1):
         basis_funs_1st_der( kts2, deg2, y, span2, basis2 )
     
-    theCoeffs = empty([deg1+1,deg2+1])
-    theCoeffs[:,:] = coeffs[span1-deg1:span1+1,span2-deg2:span2+1]
-    
     z = 0.0
     for i in range(deg1+1):
-        theCoeffs[i,0] = theCoeffs[i,0]*basis2[0]
+        theCoeff = coeffs[span1-deg1+i,span2-deg2]*basis2[0]
         for j in range(1,deg2+1):
-            theCoeffs[i,0] += theCoeffs[i,j]*basis2[j]
-        z+=theCoeffs[i,0]*basis1[i]
+            theCoeff += coeffs[span1-deg1+i,span2-deg2+j]*basis2[j]
+        z+=theCoeff*basis1[i]
     return z
 
+#==============================================================================
+@types('double','double','double[:]','int','double[:]','int','double[:,:]','int[:,:]','double[:]')
+def eval_spline_2d_multi(x,y,kts1,deg1,kts2,deg2,coeffs,ders,z):
+    """
+    Evaluate several derivatives of a 2D spline at the point (x,y). The
+    spans and the values of the basis functions and of their first
+    derivatives are only computed once for all the derivatives.
+    ders[k] contains the orders (der1,der2) of the k-th derivative whose
+    value is stored in z[k]
+    """
+    span1  =  find_span( kts1, deg1, x )
+    span2  =  find_span( kts2, deg2, y )
+    
+    from numpy      import empty
+    basis1  = empty( (2,deg1+1), dtype=float )
+    basis2  = empty( (2,deg2+1), dtype=float )
+    basis_funs        ( kts1, deg1, x, span1, basis1[0] )
+    basis_funs_1st_der( kts1, deg1, x, span1, basis1[1] )
+    basis_funs        ( kts2, deg2, y, span2, basis2[0] )
+    basis_funs_1st_der( kts2, deg2, y, span2, basis2[1] )
+    
+    for k in range(ders.shape[0]):
+        der1 = ders[k,0]
+        der2 = ders[k,1]
+        z[k] = 0.0
+        for i in range(deg1+1):
+            theCoeff = coeffs[span1-deg1+i,span2-deg2]*basis2[der2,0]
+            for j in range(1,deg2+1):
+                theCoeff += coeffs[span1-deg1+i,span2-deg2+j]*basis2[der2,j]
+            z[k]+=theCoeff*basis1[der1,i]
+
 #==============================================================================
 @types('double[:]','double[:]','double[:]','int','double[:]','int','double[:,:]','double[:,:]','int','int')
 def eval_spline_2d_cross(xVec,yVec,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
     from numpy      import empty
     basis1  = empty( deg1+1 )
     basis2  = empty( deg2+1 )
-    theCoeffs = empty((deg1+1,deg2+1))
     
     nx=len(xVec)
     ny=len(yVec)
@@ -241,14 +270,12 @@ def eval_spline_2d_cross(xVec,yVec,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
                 span2  =  find_span( kts2, deg2, y )
                 basis_funs( kts2, deg2, y, span2, basis2 )
                 
-                theCoeffs[:,:] = coeffs[span1-deg1:span1+1,span2-deg2:span2+1]
-                
                 z[i,j] = 0.0
                 for k in range(deg1+1):
-                    theCoeffs[k,0] = theCoeffs[k,0]*basis2[0]
+                    theCoeff = coeffs[span1-deg1+k,span2-deg2]*basis2[0]
                     for l in range(1,deg2+1):
-                        theCoeffs[k,0] += theCoeffs[k,l]*basis2[l]
-                    z[i,j]+=theCoeffs[k,0]*basis1[k]
+                        theCoeff += coeffs[span1-deg1+k,span2-deg2+l]*basis2[l]
+                    z[i,j]+=theCoeff*basis1[k]
     elif (der1==0 and der2==1):
         for i in range(nx):
             x=xVec[i]
@@ -259,14 +286,12 @@ def eval_spline_2d_cross(xVec,yVec,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
                 span2  =  find_span( kts2, deg2, y )
                 basis_funs_1st_der( kts2, deg2, y, span2, basis2 )
                 
-                theCoeffs[:,:] = coeffs[span1-deg1:span1+1,span2-deg2:span2+1]
-                
                 z[i,j] = 0.0
                 for k in range(deg1+1):
-                    theCoeffs[k,0] = theCoeffs[k,0]*basis2[0]
+                    theCoeff = coeffs[span1-deg1+k,span2-deg2]*basis2[0]
                     for l in range(1,deg2+1):
-                        theCoeffs[k,0] += theCoeffs[k,l]*basis2[l]
-                    z[i,j]+=theCoeffs[k,0]*basis1[k]
+                        theCoeff += coeffs[span1-deg1+k,span2-deg2+l]*basis2[l]
+                    z[i,j]+=theCoeff*basis1[k]
     elif (der1==1 and der2==0):
         for i in range(nx):
             x=xVec[i]
@@ -277,14 +302,12 @@ def eval_spline_2d_cross(xVec,yVec,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
                 span2  =  find_span( kts2, deg2, y )
                 basis_funs( kts2, deg2, y, span2, basis2 )
                 
-                theCoeffs[:,:] = coeffs[span1-deg1:span1+1,span2-deg2:span2+1]
-                
                 z[i,j] = 0.0
                 for k in range(deg1+1):
-                    theCoeffs[k,0] = theCoeffs[k,0]*basis2[0]
+                    theCoeff = coeffs[span1-deg1+k,span2-deg2]*basis2[0]
                     for l in range(1,deg2+1):
-                        theCoeffs[k,0] += theCoeffs[k,l]*basis2[l]
-                    z[i,j]+=theCoeffs[k,0]*basis1[k]
+                        theCoeff += coeffs[span1-deg1+k,span2-deg2+l]*basis2[l]
+                    z[i,j]+=theCoeff*basis1[k]
     elif (der1==1 and der2==1):
         for i in range(nx):
             x=xVec[i]
@@ -295,14 +318,12 @@ def eval_spline_2d_cross(xVec,yVec,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
                 span2  =  find_span( kts2, deg2, y )
                 basis_funs_1st_der( kts2, deg2, y, span2, basis2 )
                 
-                theCoeffs[:,:] = coeffs[span1-deg1:span1+1,span2-deg2:span2+1]
-                
                 z[i,j] = 0.0
                 for k in range(deg1+1):
-                    theCoeffs[k,0] = theCoeffs[k,0]*basis2[0]
+                    theCoeff = coeffs[span1-deg1+k,span2-deg2]*basis2[0]
                     for l in range(1,deg2+1):
-                        theCoeffs[k,0] += theCoeffs[k,l]*basis2[l]
-                    z[i,j]+=theCoeffs[k,0]*basis1[k]
+                        theCoeff += coeffs[span1-deg1+k,span2-deg2+l]*basis2[l]
+                    z[i,j]+=theCoeff*basis1[k]
 
 #==============================================================================
 @types('double[:]','double[:]','double[:]','int','double[:]','int','double[:,:]','double[:]','int','int')
@@ -10,6 +10,7 @@ public :: &
   eval_spline_1d_vector, &
   eval_spline_2d_scalar, &
   eval_spline_2d_cross , &
+  eval_spline_2d_multi , &
   eval_spline_2d_vector
 
 private
@@ -38,7 +39,9 @@ integer(kind=4) :: low
 !                                                            !
 !    For a degree p, the knot span index i identifies the    !
 !    indices [i-p:i] of all p+1 non-zero basis functions at a!
-!    given location x.                                       !
+!    given location x. The span is found in O(1) operations  !
+!    if the knots are uniform, otherwise a binary search is  !
+!    used.                                                   !
 !                                                            !
 !    Parameters                                              !
 !    ----------                                              !
@@ -72,16 +75,22 @@ if (x <= knots(low)) then
 else if (x >= knots(high)) then
   returnVal = high - 1
 else
-  ! Perform binary search
-  span = (low+high)/2
-  do while (x >= knots(span + 1) .or. x < knots(span))
-    if (x < knots(span)) then
-      high = span
-    else
-      low = span
-    end if
+  ! Compute the span assuming that the knots are uniform. This is
+  ! exact for the uniform breakpoints used in the simulations
+  span = low + int((x-knots(low))*(high-low)/(knots(high)-knots(low)))
+  span = min(span, high-1)
+  if (x < knots(span) .or. x >= knots(span + 1)) then
+    ! Perform binary search
     span = (low+high)/2
-  end do
+    do while (x >= knots(span + 1) .or. x < knots(span))
+      if (x < knots(span)) then
+        high = span
+      else
+        low = span
+      end if
+      span = (low+high)/2
+    end do
+  end if
   returnVal = span
 end if
 
@@ -354,6 +363,56 @@ pure function eval_spline_2d_scalar( x, y, kts1, deg1, &
 
 end function
 
+!==============================================================================
+pure subroutine eval_spline_2d_multi( x, y, kts1, deg1, kts2, deg2, coeffs, &
+      ders, z )
+
+  real   (kind=8), intent(in)    :: x
+  real   (kind=8), intent(in)    :: y
+  real   (kind=8), intent(in)    :: kts1 (0:)
+  integer(kind=4), intent(in)    :: deg1
+  real   (kind=8), intent(in)    :: kts2 (0:)
+  integer(kind=4), intent(in)    :: deg2
+  real   (kind=8), intent(in)    :: coeffs (0:, 0:)
+  integer(kind=4), intent(in)    :: ders (0:, 0:)
+  real   (kind=8), intent(inout) :: z (0:)
+
+  real   (kind=8) :: basis1 (0:deg1, 0:1)
+  real   (kind=8) :: basis2 (0:deg2, 0:1)
+  real   (kind=8) :: theCoeff
+  integer(kind=4) :: span1
+  integer(kind=4) :: span2
+  integer(kind=4) :: der1
+  integer(kind=4) :: der2
+  integer(kind=4) :: i
+  integer(kind=4) :: j
+  integer(kind=4) :: k
+
+  ! The spans and the values of the basis functions and of their first
+  ! derivatives are only computed once for all the derivatives in ders
+  span1 = find_span(kts1, deg1, x)
+  span2 = find_span(kts2, deg2, y)
+
+  call basis_funs        (kts1, deg1, x, span1, basis1(:, 0))
+  call basis_funs_1st_der(kts1, deg1, x, span1, basis1(:, 1))
+  call basis_funs        (kts2, deg2, y, span2, basis2(:, 0))
+  call basis_funs_1st_der(kts2, deg2, y, span2, basis2(:, 1))
+
+  do k = 0, size(ders,2) - 1
+    der1 = ders(0, k)
+    der2 = ders(1, k)
+    z(k) = 0.0d0
+    do i = 0, deg1
+      theCoeff = basis2(0, der2)*coeffs(span2 - deg2, span1 - deg1 + i)
+      do j = 1, deg2
+        theCoeff = basis2(j, der2)*coeffs(span2 - deg2 + j, span1 - deg1 + i) + theCoeff
+      end do
+      z(k) = z(k) + basis1(i, der1)*theCoeff
+    end do
+  end do
+
+end subroutine
+
 !==============================================================================
 pure subroutine eval_spline_2d_cross( xVec, yVec, kts1, deg1, kts2, deg2, &
       coeffs, z, der1, der2 )
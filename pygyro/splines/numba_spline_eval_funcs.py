@@ -15,7 +15,8 @@ def find_span( knots, degree, x ):
 
     For a degree p, the knot span index i identifies the
     indices [i-p:i] of all p+1 non-zero basis functions at a
-    given location x.
+    given location x. The span is found in O(1) operations
+    if the knots are uniform, otherwise a binary search is used.
 
     Parameters
     ----------
@@ -43,14 +44,19 @@ def find_span( knots, degree, x ):
     if x <= knots[low ]: returnVal = low
     elif x >= knots[high]: returnVal = high-1
     else:
-        # Perform binary search
-        span = (low+high)//2
-        while x < knots[span] or x >= knots[span+1]:
-            if x < knots[span]:
-               high = span
-            else:
-               low  = span
+        # Compute the span assuming that the knots are uniform. This is
+        # exact for the uniform breakpoints used in the simulations
+        span = low + int((x-knots[low])*(high-low)/(knots[high]-knots[low]))
+        span = min(span,high-1)
+        if x < knots[span] or x >= knots[span+1]:
+            # Perform binary search
             span = (low+high)//2
+            while x < knots[span] or x >= knots[span+1]:
+                if x < knots[span]:
+                   high = span
+                else:
+                   low  = span
+                span = (low+high)//2
         returnVal = span
 
     return returnVal
@@ -86,22 +92,20 @@ def basis_funs( knots, degree, x, span, values ):
     Notes
     -----
     The original Algorithm A2.2 in The NURBS Book [1] is here
-    slightly improved by using 'left' and 'right' temporary
-    arrays that are one element shorter.
+    modified so that the 'left' and 'right' knot differences are
+    computed when they are needed instead of being stored in
+    temporary arrays. No memory is therefore allocated.
 
     """
-    left   = empty( degree  )
-    right  = empty( degree  )
-
     values[0] = 1.0
     for j in range(0,degree):
-        left [j] = x - knots[span-j]
-        right[j] = knots[span+1+j] - x
         saved    = 0.0
         for r in range(0,j+1):
-            temp      = values[r] / (right[r] + left[j-r])
-            values[r] = saved + right[r] * temp
-            saved     = left[j-r] * temp
+            left      = x - knots[span-j+r]
+            right     = knots[span+1+r] - x
+            temp      = values[r] / (right + left)
+            values[r] = saved + right * temp
+            saved     = left * temp
         values[j+1] = saved
 
 @cc.export('basis_funs_1st_der', '(f8[:], i4,f8,i4,f8[:])')
@@ -137,20 +141,20 @@ def basis_funs_1st_der( knots, degree, x, span, ders ):
 
     """
     # Compute nonzero basis functions and knot differences for splines
-    # up to degree deg-1
-    values = empty(degree)
-    basis_funs( knots, degree-1, x, span, values )
+    # up to degree deg-1. They are stored in ders and overwritten by
+    # the derivatives
+    basis_funs( knots, degree-1, x, span, ders )
 
     # Compute derivatives at x using formula based on difference of
     # splines of degree deg-1
     # -------
     # j = 0
-    saved = degree * values[0] / (knots[span+1]-knots[span+1-degree])
+    saved = degree * ders[0] / (knots[span+1]-knots[span+1-degree])
     ders[0] = -saved
     # j = 1,...,degree-1
     for j in range(1,degree):
         temp    = saved
-        saved   = degree * values[j] / (knots[span+j+1]-knots[span+j+1-degree])
+        saved   = degree * ders[j] / (knots[span+j+1]-knots[span+j+1-degree])
         ders[j] = temp - saved
     # j = degree
     ders[degree] = saved
@@ -195,14 +199,61 @@ def eval_spline_1d_vector(x,knots,degree,coeffs,y,der=0):
                 y[i]+=coeffs[span-degree+j]*basis[j]
     return y
 
+@cc.export('eval_interpolant_1d', '(f8[:,:],i4,f8[:,:],i4,i4,i4[:],f8[:,:],f8[:,:],i4[:],f8[:,:],f8[:,:])')
+@njit
+def eval_interpolant_1d(ug,shift,lu,kl,ku,ipiv,corrZ,corrV,spans,basis,y):
+    n      = ug.shape[1]
+    kd     = kl+ku
+    nCorr  = corrZ.shape[0]
+    degree = basis.shape[1]-1
+    c = empty( n )
+    w = empty( nCorr )
+    for line in range(ug.shape[0]):
+        for j in range(n):
+            c[j] = ug[line,(j-shift)%n]
+        
+        # Solve the banded system using the LU factors from dgbtrf
+        for j in range(n-1):
+            jp = ipiv[j]
+            if (jp!=j):
+                temp  = c[j]
+                c[j]  = c[jp]
+                c[jp] = temp
+            for i in range(1,min(kl,n-1-j)+1):
+                c[j+i] -= lu[kd+i,j]*c[j]
+        for j in range(n-1,-1,-1):
+            c[j] = c[j]/lu[kd,j]
+            for i in range(1,min(kd,j)+1):
+                c[j-i] -= lu[kd-i,j]*c[j]
+        
+        # Correct for the periodic corners which are not in the band
+        for k in range(nCorr):
+            w[k] = 0.0
+            for j in range(n):
+                w[k] += corrV[k,j]*c[j]
+        for k in range(nCorr):
+            for j in range(n):
+                c[j] -= corrZ[k,j]*w[k]
+        
+        # Evaluate the spline at the new points
+        for i in range(len(spans)):
+            y[line,i] = 0.0
+            for j in range(degree+1):
+                y[line,i] += c[(spans[i]-degree+j)%n]*basis[i,j]
+
 @cc.export('eval_spline_2d_scalar', 'f8(f8,f8,f8[:],i4,f8[:],i4,f8[:,:],i4,i4)')
 @njit
 def eval_spline_2d_scalar(x,y,kts1,deg1,kts2,deg2,coeffs,der1=0,der2=0):
+    basis1  = empty( deg1+1 )
+    basis2  = empty( deg2+1 )
+    return eval_spline_2d_scalar_work(x,y,kts1,deg1,kts2,deg2,coeffs,der1,der2,basis1,basis2)
+
+@cc.export('eval_spline_2d_scalar_work', 'f8(f8,f8,f8[:],i4,f8[:],i4,f8[:,:],i4,i4,f8[:],f8[:])')
+@njit
+def eval_spline_2d_scalar_work(x,y,kts1,deg1,kts2,deg2,coeffs,der1,der2,basis1,basis2):
     span1  =  find_span( kts1, deg1, x )
     span2  =  find_span( kts2, deg2, y )
     
-    basis1  = empty( deg1+1 )
-    basis2  = empty( deg2+1 )
     if (der1==0):
         basis_funs( kts1, deg1, x, span1, basis1 )
     elif (der1==1):
@@ -212,15 +263,12 @@ def eval_spline_2d_scalar(x,y,kts1,deg1,kts2,deg2,coeffs,der1=0,der2=0):
     elif (der2==1):
         basis_funs_1st_der( kts2, deg2, y, span2, basis2 )
     
-    theCoeffs = empty((deg1+1,deg2+1))
-    theCoeffs[:] = coeffs[span1-deg1:span1+1,span2-deg2:span2+1]
-    
     z = 0.0
     for i in range(deg1+1):
-        theCoeffs[i,0] = theCoeffs[i,0]*basis2[0]
+        theCoeff = coeffs[span1-deg1+i,span2-deg2]*basis2[0]
         for j in range(1,deg2+1):
-            theCoeffs[i,0] += theCoeffs[i,j]*basis2[j]
-        z+=theCoeffs[i,0]*basis1[i]
+            theCoeff += coeffs[span1-deg1+i,span2-deg2+j]*basis2[j]
+        z+=theCoeff*basis1[i]
     return z
 
 
@@ -229,7 +277,6 @@ def eval_spline_2d_scalar(x,y,kts1,deg1,kts2,deg2,coeffs,der1=0,der2=0):
 def eval_spline_2d_cross(X,Y,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
     basis1  = empty( deg1+1 )
     basis2  = empty( deg2+1 )
-    theCoeffs = empty((deg1+1,deg2+1))
     
     if (der1==0 and der2==0):
         for i,x in enumerate(X):
@@ -239,14 +286,12 @@ def eval_spline_2d_cross(X,Y,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
                 span2  =  find_span( kts2, deg2, y )
                 basis_funs( kts2, deg2, y, span2, basis2 )
                 
-                theCoeffs[:,:] = coeffs[span1-deg1:span1+1,span2-deg2:span2+1]
-                
                 z[i,j] = 0.0
                 for k in range(deg1+1):
-                    theCoeffs[k,0] = theCoeffs[k,0]*basis2[0]
+                    theCoeff = coeffs[span1-deg1+k,span2-deg2]*basis2[0]
                     for l in range(1,deg2+1):
-                        theCoeffs[k,0] += theCoeffs[k,l]*basis2[l]
-                    z[i,j]+=theCoeffs[k,0]*basis1[k]
+                        theCoeff += coeffs[span1-deg1+k,span2-deg2+l]*basis2[l]
+                    z[i,j]+=theCoeff*basis1[k]
     elif (der1==0 and der2==1):
         for i,x in enumerate(X):
             span1  =  find_span( kts1, deg1, x )
@@ -255,14 +300,12 @@ def eval_spline_2d_cross(X,Y,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
                 span2  =  find_span( kts2, deg2, y )
                 basis_funs_1st_der( kts2, deg2, y, span2, basis2 )
                 
-                theCoeffs[:,:] = coeffs[span1-deg1:span1+1,span2-deg2:span2+1]
-                
                 z[i,j] = 0.0
                 for k in range(deg1+1):
-                    theCoeffs[k,0] = theCoeffs[k,0]*basis2[0]
+                    theCoeff = coeffs[span1-deg1+k,span2-deg2]*basis2[0]
                     for l in range(1,deg2+1):
-                        theCoeffs[k,0] += theCoeffs[k,l]*basis2[l]
-                    z[i,j]+=theCoeffs[k,0]*basis1[k]
+                        theCoeff += coeffs[span1-deg1+k,span2-deg2+l]*basis2[l]
+                    z[i,j]+=theCoeff*basis1[k]
     elif (der1==1 and der2==0):
         for i,x in enumerate(X):
             span1  =  find_span( kts1, deg1, x )
@@ -271,14 +314,12 @@ def eval_spline_2d_cross(X,Y,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
                 span2  =  find_span( kts2, deg2, y )
                 basis_funs( kts2, deg2, y, span2, basis2 )
                 
-                theCoeffs[:,:] = coeffs[span1-deg1:span1+1,span2-deg2:span2+1]
-                
                 z[i,j] = 0.0
                 for k in range(deg1+1):
-                    theCoeffs[k,0] = theCoeffs[k,0]*basis2[0]
+                    theCoeff = coeffs[span1-deg1+k,span2-deg2]*basis2[0]
                     for l in range(1,deg2+1):
-                        theCoeffs[k,0] += theCoeffs[k,l]*basis2[l]
-                    z[i,j]+=theCoeffs[k,0]*basis1[k]
+                        theCoeff += coeffs[span1-deg1+k,span2-deg2+l]*basis2[l]
+                    z[i,j]+=theCoeff*basis1[k]
     elif (der1==1 and der2==1):
         for i,x in enumerate(X):
             span1  =  find_span( kts1, deg1, x )
@@ -287,17 +328,113 @@ def eval_spline_2d_cross(X,Y,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
                 span2  =  find_span( kts2, deg2, y )
                 basis_funs_1st_der( kts2, deg2, y, span2, basis2 )
                 
-                theCoeffs[:,:] = coeffs[span1-deg1:span1+1,span2-deg2:span2+1]
-                
                 z[i,j] = 0.0
                 for k in range(deg1+1):
-                    theCoeffs[k,0] = theCoeffs[k,0]*basis2[0]
+                    theCoeff = coeffs[span1-deg1+k,span2-deg2]*basis2[0]
                     for l in range(1,deg2+1):
-                        theCoeffs[k,0] += theCoeffs[k,l]*basis2[l]
-                    z[i,j]+=theCoeffs[k,0]*basis1[k]
+                        theCoeff += coeffs[span1-deg1+k,span2-deg2+l]*basis2[l]
+                    z[i,j]+=theCoeff*basis1[k]
+    
+    return z
+
+@cc.export('eval_spline_2d_multi_work', '(f8,f8,f8[:],i4,f8[:],i4,f8[:,:],i4[:,:],f8[:],f8[:,:],f8[:,:])')
+@njit
+def eval_spline_2d_multi_work(x,y,kts1,deg1,kts2,deg2,coeffs,ders,z,basis1,basis2):
+    """
+    Evaluate several derivatives of a 2D spline at the point (x,y). The
+    spans and the values of the basis functions and of their first
+    derivatives are only computed once for all the derivatives.
+    ders[k] contains the orders (der1,der2) of the k-th derivative whose
+    value is stored in z[k]. basis1 and basis2 are work arrays of shape
+    (2,deg1+1) and (2,deg2+1)
+    """
+    span1  =  find_span( kts1, deg1, x )
+    span2  =  find_span( kts2, deg2, y )
+    
+    basis_funs        ( kts1, deg1, x, span1, basis1[0] )
+    basis_funs_1st_der( kts1, deg1, x, span1, basis1[1] )
+    basis_funs        ( kts2, deg2, y, span2, basis2[0] )
+    basis_funs_1st_der( kts2, deg2, y, span2, basis2[1] )
+    
+    for k in range(ders.shape[0]):
+        der1 = ders[k,0]
+        der2 = ders[k,1]
+        z[k] = 0.0
+        for i in range(deg1+1):
+            theCoeff = coeffs[span1-deg1+i,span2-deg2]*basis2[der2,0]
+            for j in range(1,deg2+1):
+                theCoeff += coeffs[span1-deg1+i,span2-deg2+j]*basis2[der2,j]
+            z[k]+=theCoeff*basis1[der1,i]
+
+@cc.export('eval_spline_2d_multi', '(f8,f8,f8[:],i4,f8[:],i4,f8[:,:],i4[:,:],f8[:])')
+@njit
+def eval_spline_2d_multi(x,y,kts1,deg1,kts2,deg2,coeffs,ders,z):
+    basis1  = empty( (2,deg1+1) )
+    basis2  = empty( (2,deg2+1) )
+    eval_spline_2d_multi_work(x,y,kts1,deg1,kts2,deg2,coeffs,ders,z,basis1,basis2)
+
+@cc.export('eval_spline_2d_multi_vector', '(f8[:],f8[:],f8[:],i4,f8[:],i4,f8[:,:],i4[:,:],f8[:,:])')
+@njit
+def eval_spline_2d_multi_vector(x,y,kts1,deg1,kts2,deg2,coeffs,ders,z):
+    basis1  = empty( (2,deg1+1) )
+    basis2  = empty( (2,deg2+1) )
+    vals    = empty( ders.shape[0] )
+    for i in range(len(x)):
+        eval_spline_2d_multi_work(x[i],y[i],kts1,deg1,kts2,deg2,coeffs,ders,vals,basis1,basis2)
+        for k in range(ders.shape[0]):
+            z[k,i] = vals[k]
+
+@cc.export('eval_spline_2d_scalar_complex', 'c16(f8,f8,f8[:],i4,f8[:],i4,c16[:,:],i4,i4)')
+@njit
+def eval_spline_2d_scalar_complex(x,y,kts1,deg1,kts2,deg2,coeffs,der1=0,der2=0):
+    basis1  = empty( deg1+1 )
+    basis2  = empty( deg2+1 )
+    span1  =  find_span( kts1, deg1, x )
+    span2  =  find_span( kts2, deg2, y )
+    
+    if (der1==0):
+        basis_funs( kts1, deg1, x, span1, basis1 )
+    else:
+        basis_funs_1st_der( kts1, deg1, x, span1, basis1 )
+    if (der2==0):
+        basis_funs( kts2, deg2, y, span2, basis2 )
+    else:
+        basis_funs_1st_der( kts2, deg2, y, span2, basis2 )
     
+    z = 0.0j
+    for i in range(deg1+1):
+        theCoeff = coeffs[span1-deg1+i,span2-deg2]*basis2[0]
+        for j in range(1,deg2+1):
+            theCoeff += coeffs[span1-deg1+i,span2-deg2+j]*basis2[j]
+        z+=theCoeff*basis1[i]
     return z
 
+@cc.export('eval_spline_2d_cross_complex', '(f8[:],f8[:],f8[:],i4,f8[:],i4,c16[:,:],c16[:,:],i4,i4)')
+@njit
+def eval_spline_2d_cross_complex(X,Y,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
+    basis1  = empty( deg1+1 )
+    basis2  = empty( deg2+1 )
+    
+    for i,x in enumerate(X):
+        span1  =  find_span( kts1, deg1, x )
+        if (der1==0):
+            basis_funs( kts1, deg1, x, span1, basis1 )
+        else:
+            basis_funs_1st_der( kts1, deg1, x, span1, basis1 )
+        for j,y in enumerate(Y):
+            span2  =  find_span( kts2, deg2, y )
+            if (der2==0):
+                basis_funs( kts2, deg2, y, span2, basis2 )
+            else:
+                basis_funs_1st_der( kts2, deg2, y, span2, basis2 )
+            
+            z[i,j] = 0.0j
+            for k in range(deg1+1):
+                theCoeff = coeffs[span1-deg1+k,span2-deg2]*basis2[0]
+                for l in range(1,deg2+1):
+                    theCoeff += coeffs[span1-deg1+k,span2-deg2+l]*basis2[l]
+                z[i,j]+=theCoeff*basis1[k]
+
 @cc.export('eval_spline_2d_vector', 'f8[:](f8[:],f8[:],f8[:],i4,f8[:],i4,f8[:,:],i4,i4)')
 @njit
 def eval_spline_2d_vector(x,y,kts1,deg1,kts2,deg2,coeffs,der1=0,der2=0):
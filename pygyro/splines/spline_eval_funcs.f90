@@ -105,6 +105,118 @@ subroutine eval_spline_1d_vector(n0_x, x, n0_knots, knots, degree, &
 end subroutine
 ! ........................................
 
+! ........................................
+subroutine eval_interpolant_1d(n0_ug, n1_ug, ug, shift, n0_lu, n1_lu, &
+      lu, kl, ku, n0_ipiv, ipiv, n0_corrZ, n1_corrZ, corrZ, n0_corrV, n1_corrV, &
+      corrV, n0_spans, spans, n0_basis, n1_basis, basis, n0_y, n1_y, y)
+
+  implicit none
+  integer(kind=4), intent(in)  :: n0_ug
+  integer(kind=4), intent(in)  :: n1_ug
+  real(kind=8), intent(in)  :: ug (0:n0_ug - 1,0:n1_ug - 1)
+  integer(kind=4), intent(in)  :: shift
+  integer(kind=4), intent(in)  :: n0_lu
+  integer(kind=4), intent(in)  :: n1_lu
+  real(kind=8), intent(in)  :: lu (0:n0_lu - 1,0:n1_lu - 1)
+  integer(kind=4), intent(in)  :: kl
+  integer(kind=4), intent(in)  :: ku
+  integer(kind=4), intent(in)  :: n0_ipiv
+  integer(kind=4), intent(in)  :: ipiv (0:n0_ipiv - 1)
+  integer(kind=4), intent(in)  :: n0_corrZ
+  integer(kind=4), intent(in)  :: n1_corrZ
+  real(kind=8), intent(in)  :: corrZ (0:n0_corrZ - 1,0:n1_corrZ - 1)
+  integer(kind=4), intent(in)  :: n0_corrV
+  integer(kind=4), intent(in)  :: n1_corrV
+  real(kind=8), intent(in)  :: corrV (0:n0_corrV - 1,0:n1_corrV - 1)
+  integer(kind=4), intent(in)  :: n0_spans
+  integer(kind=4), intent(in)  :: spans (0:n0_spans - 1)
+  integer(kind=4), intent(in)  :: n0_basis
+  integer(kind=4), intent(in)  :: n1_basis
+  real(kind=8), intent(in)  :: basis (0:n0_basis - 1,0:n1_basis - 1)
+  integer(kind=4), intent(in)  :: n0_y
+  integer(kind=4), intent(in)  :: n1_y
+  real(kind=8), intent(inout)  :: y (0:n0_y - 1,0:n1_y - 1)
+  integer(kind=4) :: n
+  integer(kind=4) :: kd
+  integer(kind=4) :: nCorr
+  integer(kind=4) :: degree
+  real(kind=8), allocatable :: c (:)
+  real(kind=8), allocatable :: w (:)
+  integer(kind=4) :: line
+  integer(kind=4) :: jp
+  real(kind=8) :: temp
+  integer(kind=4) :: i
+  integer(kind=4) :: j
+  integer(kind=4) :: k
+
+
+  n = size(ug,1)
+  kd = kl + ku
+  nCorr = size(corrZ,2)
+  degree = size(basis,1) - 1
+  allocate(c(0:n - 1))
+  allocate(w(0:nCorr - 1))
+  do line = 0, size(ug,2) - 1, 1
+    do j = 0, n - 1, 1
+      c(j) = ug(modulo(j - shift,n), line)
+    end do
+
+
+
+    do j = 0, n - 2, 1
+      jp = ipiv(j)
+      if (jp /= j ) then
+        temp = c(j)
+        c(j) = c(jp)
+        c(jp) = temp
+      end if
+      do i = 1, min(kl, n - 1 - j), 1
+        c(i + j) = c(i + j) - c(j)*lu(j, kd + i)
+      end do
+
+    end do
+
+    do j = n - 1, 0, -1
+      c(j) = c(j)/lu(j, kd)
+      do i = 1, min(kd, j), 1
+        c(j - i) = c(j - i) - c(j)*lu(j, kd - i)
+      end do
+
+    end do
+
+
+
+    do k = 0, nCorr - 1, 1
+      w(k) = 0.0d0
+      do j = 0, n - 1, 1
+        w(k) = corrV(j, k)*c(j) + w(k)
+      end do
+
+    end do
+
+    do k = 0, nCorr - 1, 1
+      do j = 0, n - 1, 1
+        c(j) = c(j) - corrZ(j, k)*w(k)
+      end do
+
+    end do
+
+
+
+    do i = 0, size(spans,1) - 1, 1
+      y(i, line) = 0.0d0
+      do j = 0, degree, 1
+        y(i, line) = basis(j, i)*c(modulo(spans(i) - degree + j,n)) + y(i &
+      , line)
+      end do
+
+    end do
+
+  end do
+
+end subroutine
+! ........................................
+
 ! ........................................
 subroutine eval_spline_2d_scalar(x, y, n0_kts1, kts1, deg1, n0_kts2, &
       kts2, deg2, n0_coeffs, n1_coeffs, coeffs, der1, der2, z)
@@ -124,12 +236,47 @@ subroutine eval_spline_2d_scalar(x, y, n0_kts1, kts1, deg1, n0_kts2, &
   real(kind=8), intent(in)  :: coeffs (0:n0_coeffs - 1,0:n1_coeffs - 1)
   integer(kind=4), intent(in)  :: der1
   integer(kind=4), intent(in)  :: der2
+  real(kind=8) :: basis1 (0:deg1)
+  real(kind=8) :: basis2 (0:deg2)
+
+  call eval_spline_2d_scalar_work(x, y, n0_kts1, kts1, deg1, n0_kts2, &
+      kts2, deg2, n0_coeffs, n1_coeffs, coeffs, der1, der2, deg1 + 1, &
+      basis1, deg2 + 1, basis2, z)
+
+  return
+
+
+end subroutine
+! ........................................
+
+! ........................................
+subroutine eval_spline_2d_scalar_work(x, y, n0_kts1, kts1, deg1, n0_kts2, &
+      kts2, deg2, n0_coeffs, n1_coeffs, coeffs, der1, der2, n0_basis1, &
+      basis1, n0_basis2, basis2, z)
+
+  implicit none
+  real(kind=8), intent(out)  :: z
+  real(kind=8), intent(in)  :: x
+  real(kind=8), intent(in)  :: y
+  integer(kind=4), intent(in)  :: n0_kts1
+  real(kind=8), intent(in)  :: kts1 (0:n0_kts1 - 1)
+  integer(kind=4), intent(in)  :: deg1
+  integer(kind=4), intent(in)  :: n0_kts2
+  real(kind=8), intent(in)  :: kts2 (0:n0_kts2 - 1)
+  integer(kind=4), intent(in)  :: deg2
+  integer(kind=4), intent(in)  :: n0_coeffs
+  integer(kind=4), intent(in)  :: n1_coeffs
+  real(kind=8), intent(in)  :: coeffs (0:n0_coeffs - 1,0:n1_coeffs - 1)
+  integer(kind=4), intent(in)  :: der1
+  integer(kind=4), intent(in)  :: der2
+  integer(kind=4), intent(in)  :: n0_basis1
+  real(kind=8), intent(inout)  :: basis1 (0:n0_basis1 - 1)
+  integer(kind=4), intent(in)  :: n0_basis2
+  real(kind=8), intent(inout)  :: basis2 (0:n0_basis2 - 1)
   integer(kind=4) :: span1
-  real(kind=8), allocatable :: basis2 (:)
-  real(kind=8), allocatable :: theCoeffs (:,:)
   integer(kind=4) :: span2
+  real(kind=8) :: theCoeff
   integer(kind=4) :: i
-  real(kind=8), allocatable :: basis1 (:)
   integer(kind=4) :: j
 
   span1 = find_span(kts1, deg1, x)
@@ -137,8 +284,6 @@ subroutine eval_spline_2d_scalar(x, y, n0_kts1, kts1, deg1, n0_kts2, &
 
 
 
-  allocate(basis1(0:deg1))
-  allocate(basis2(0:deg2))
   if (der1 == 0 ) then
     call basis_funs(kts1, deg1, x, span1, basis1)
   else if (der1 == 1 ) then
@@ -151,18 +296,15 @@ subroutine eval_spline_2d_scalar(x, y, n0_kts1, kts1, deg1, n0_kts2, &
 
 
   end if
-  allocate(theCoeffs(0:deg2, 0:deg1))
-  theCoeffs(:, :) = coeffs(-deg2 + span2:span2, -deg1 + span1:span1)
-
-
   z = 0.0d0
   do i = 0, deg1, 1
-    theCoeffs(0, i) = basis2(0)*theCoeffs(0, i)
+    theCoeff = basis2(0)*coeffs(span2 - deg2, span1 - deg1 + i)
     do j = 1, deg2, 1
-      theCoeffs(0, i) = basis2(j)*theCoeffs(j, i) + theCoeffs(0, i)
+      theCoeff = basis2(j)*coeffs(span2 - deg2 + j, span1 - deg1 + i) + &
+      theCoeff
     end do
 
-    z = z + basis1(i)*theCoeffs(0, i)
+    z = z + basis1(i)*theCoeff
   end do
 
   return
@@ -339,6 +481,300 @@ subroutine eval_spline_2d_cross(n0_xVec, xVec, n0_yVec, yVec, n0_kts1, &
 end subroutine
 ! ........................................
 
+! ........................................
+subroutine eval_spline_2d_multi(x, y, n0_kts1, kts1, deg1, n0_kts2, &
+      kts2, deg2, n0_coeffs, n1_coeffs, coeffs, n0_ders, n1_ders, ders, &
+      n0_z, z)
+
+  implicit none
+  real(kind=8), intent(in)  :: x
+  real(kind=8), intent(in)  :: y
+  integer(kind=4), intent(in)  :: n0_kts1
+  real(kind=8), intent(in)  :: kts1 (0:n0_kts1 - 1)
+  integer(kind=4), intent(in)  :: deg1
+  integer(kind=4), intent(in)  :: n0_kts2
+  real(kind=8), intent(in)  :: kts2 (0:n0_kts2 - 1)
+  integer(kind=4), intent(in)  :: deg2
+  integer(kind=4), intent(in)  :: n0_coeffs
+  integer(kind=4), intent(in)  :: n1_coeffs
+  real(kind=8), intent(in)  :: coeffs (0:n0_coeffs - 1,0:n1_coeffs - 1)
+  integer(kind=4), intent(in)  :: n0_ders
+  integer(kind=4), intent(in)  :: n1_ders
+  integer(kind=4), intent(in)  :: ders (0:n0_ders - 1,0:n1_ders - 1)
+  integer(kind=4), intent(in)  :: n0_z
+  real(kind=8), intent(inout)  :: z (0:n0_z - 1)
+  real(kind=8), allocatable :: basis1 (:,:)
+  real(kind=8), allocatable :: basis2 (:,:)
+
+
+  allocate(basis1(0:deg1, 0:1))
+  allocate(basis2(0:deg2, 0:1))
+  call eval_spline_2d_multi_work(x, y, n0_kts1, kts1, deg1, n0_kts2, &
+      kts2, deg2, n0_coeffs, n1_coeffs, coeffs, n0_ders, n1_ders, ders, &
+      n0_z, z, deg1 + 1, 2, basis1, deg2 + 1, 2, basis2)
+
+  return
+
+
+end subroutine
+! ........................................
+
+! ........................................
+subroutine eval_spline_2d_multi_work(x, y, n0_kts1, kts1, deg1, n0_kts2, &
+      kts2, deg2, n0_coeffs, n1_coeffs, coeffs, n0_ders, n1_ders, ders, &
+      n0_z, z, n0_basis1, n1_basis1, basis1, n0_basis2, n1_basis2, basis2)
+
+  implicit none
+  real(kind=8), intent(in)  :: x
+  real(kind=8), intent(in)  :: y
+  integer(kind=4), intent(in)  :: n0_kts1
+  real(kind=8), intent(in)  :: kts1 (0:n0_kts1 - 1)
+  integer(kind=4), intent(in)  :: deg1
+  integer(kind=4), intent(in)  :: n0_kts2
+  real(kind=8), intent(in)  :: kts2 (0:n0_kts2 - 1)
+  integer(kind=4), intent(in)  :: deg2
+  integer(kind=4), intent(in)  :: n0_coeffs
+  integer(kind=4), intent(in)  :: n1_coeffs
+  real(kind=8), intent(in)  :: coeffs (0:n0_coeffs - 1,0:n1_coeffs - 1)
+  integer(kind=4), intent(in)  :: n0_ders
+  integer(kind=4), intent(in)  :: n1_ders
+  integer(kind=4), intent(in)  :: ders (0:n0_ders - 1,0:n1_ders - 1)
+  integer(kind=4), intent(in)  :: n0_z
+  real(kind=8), intent(inout)  :: z (0:n0_z - 1)
+  integer(kind=4), intent(in)  :: n0_basis1
+  integer(kind=4), intent(in)  :: n1_basis1
+  real(kind=8), intent(inout)  :: basis1 (0:n0_basis1 - 1,0:n1_basis1 - 1)
+  integer(kind=4), intent(in)  :: n0_basis2
+  integer(kind=4), intent(in)  :: n1_basis2
+  real(kind=8), intent(inout)  :: basis2 (0:n0_basis2 - 1,0:n1_basis2 - 1)
+  integer(kind=4) :: span1
+  integer(kind=4) :: span2
+  real(kind=8) :: theCoeff
+  integer(kind=4) :: der1
+  integer(kind=4) :: der2
+  integer(kind=4) :: i
+  integer(kind=4) :: j
+  integer(kind=4) :: k
+
+  span1 = find_span(kts1, deg1, x)
+  span2 = find_span(kts2, deg2, y)
+
+
+
+  call basis_funs(kts1, deg1, x, span1, basis1(:, 0))
+  call basis_funs_1st_der(kts1, deg1, x, span1, basis1(:, 1))
+  call basis_funs(kts2, deg2, y, span2, basis2(:, 0))
+  call basis_funs_1st_der(kts2, deg2, y, span2, basis2(:, 1))
+
+
+  do k = 0, n1_ders - 1, 1
+    der1 = ders(0, k)
+    der2 = ders(1, k)
+    z(k) = 0.0d0
+    do i = 0, deg1, 1
+      theCoeff = basis2(0, der2)*coeffs(span2 - deg2, span1 - deg1 + i)
+      do j = 1, deg2, 1
+        theCoeff = basis2(j, der2)*coeffs(span2 - deg2 + j, span1 - deg1 &
+      + i) + theCoeff
+      end do
+
+      z(k) = z(k) + basis1(i, der1)*theCoeff
+    end do
+
+  end do
+
+  return
+
+
+end subroutine
+! ........................................
+
+! ........................................
+subroutine eval_spline_2d_multi_vector(n0_x, x, n0_y, y, n0_kts1, kts1, &
+      deg1, n0_kts2, kts2, deg2, n0_coeffs, n1_coeffs, coeffs, n0_ders, &
+      n1_ders, ders, n0_z, n1_z, z)
+
+  implicit none
+  integer(kind=4), intent(in)  :: n0_x
+  real(kind=8), intent(in)  :: x (0:n0_x - 1)
+  integer(kind=4), intent(in)  :: n0_y
+  real(kind=8), intent(in)  :: y (0:n0_y - 1)
+  integer(kind=4), intent(in)  :: n0_kts1
+  real(kind=8), intent(in)  :: kts1 (0:n0_kts1 - 1)
+  integer(kind=4), intent(in)  :: deg1
+  integer(kind=4), intent(in)  :: n0_kts2
+  real(kind=8), intent(in)  :: kts2 (0:n0_kts2 - 1)
+  integer(kind=4), intent(in)  :: deg2
+  integer(kind=4), intent(in)  :: n0_coeffs
+  integer(kind=4), intent(in)  :: n1_coeffs
+  real(kind=8), intent(in)  :: coeffs (0:n0_coeffs - 1,0:n1_coeffs - 1)
+  integer(kind=4), intent(in)  :: n0_ders
+  integer(kind=4), intent(in)  :: n1_ders
+  integer(kind=4), intent(in)  :: ders (0:n0_ders - 1,0:n1_ders - 1)
+  integer(kind=4), intent(in)  :: n0_z
+  integer(kind=4), intent(in)  :: n1_z
+  real(kind=8), intent(inout)  :: z (0:n0_z - 1,0:n1_z - 1)
+  real(kind=8), allocatable :: basis1 (:,:)
+  real(kind=8), allocatable :: basis2 (:,:)
+  real(kind=8), allocatable :: vals (:)
+  integer(kind=4) :: i
+
+
+  allocate(basis1(0:deg1, 0:1))
+  allocate(basis2(0:deg2, 0:1))
+  allocate(vals(0:n1_ders - 1))
+  do i = 0, n0_x - 1, 1
+    call eval_spline_2d_multi_work(x(i), y(i), n0_kts1, kts1, deg1, &
+      n0_kts2, kts2, deg2, n0_coeffs, n1_coeffs, coeffs, n0_ders, &
+      n1_ders, ders, n1_ders, vals, deg1 + 1, 2, basis1, deg2 + 1, 2, &
+      basis2)
+    z(i, :) = vals(:)
+  end do
+
+end subroutine
+! ........................................
+
+! ........................................
+subroutine eval_spline_2d_scalar_complex(x, y, n0_kts1, kts1, deg1, &
+      n0_kts2, kts2, deg2, n0_coeffs, n1_coeffs, coeffs, der1, der2, z)
+
+  implicit none
+  complex(kind=8), intent(out)  :: z
+  real(kind=8), intent(in)  :: x
+  real(kind=8), intent(in)  :: y
+  integer(kind=4), intent(in)  :: n0_kts1
+  real(kind=8), intent(in)  :: kts1 (0:n0_kts1 - 1)
+  integer(kind=4), intent(in)  :: deg1
+  integer(kind=4), intent(in)  :: n0_kts2
+  real(kind=8), intent(in)  :: kts2 (0:n0_kts2 - 1)
+  integer(kind=4), intent(in)  :: deg2
+  integer(kind=4), intent(in)  :: n0_coeffs
+  integer(kind=4), intent(in)  :: n1_coeffs
+  complex(kind=8), intent(in)  :: coeffs (0:n0_coeffs - 1,0:n1_coeffs - 1)
+  integer(kind=4), intent(in)  :: der1
+  integer(kind=4), intent(in)  :: der2
+  real(kind=8), allocatable :: basis1 (:)
+  real(kind=8), allocatable :: basis2 (:)
+  integer(kind=4) :: span1
+  integer(kind=4) :: span2
+  complex(kind=8) :: theCoeff
+  integer(kind=4) :: i
+  integer(kind=4) :: j
+
+
+  allocate(basis1(0:deg1))
+  allocate(basis2(0:deg2))
+  span1 = find_span(kts1, deg1, x)
+  span2 = find_span(kts2, deg2, y)
+
+
+
+  if (der1 == 0 ) then
+    call basis_funs(kts1, deg1, x, span1, basis1)
+  else
+    call basis_funs_1st_der(kts1, deg1, x, span1, basis1)
+  end if
+  if (der2 == 0 ) then
+    call basis_funs(kts2, deg2, y, span2, basis2)
+  else
+    call basis_funs_1st_der(kts2, deg2, y, span2, basis2)
+
+
+  end if
+  z = (0.0d0, 0.0d0)
+  do i = 0, deg1, 1
+    theCoeff = basis2(0)*coeffs(span2 - deg2, span1 - deg1 + i)
+    do j = 1, deg2, 1
+      theCoeff = basis2(j)*coeffs(span2 - deg2 + j, span1 - deg1 + i) + &
+      theCoeff
+    end do
+
+    z = z + basis1(i)*theCoeff
+  end do
+
+  return
+
+
+end subroutine
+! ........................................
+
+! ........................................
+subroutine eval_spline_2d_cross_complex(n0_xVec, xVec, n0_yVec, yVec, &
+      n0_kts1, kts1, deg1, n0_kts2, kts2, deg2, n0_coeffs, n1_coeffs, &
+      coeffs, n0_z, n1_z, z, der1, der2)
+
+  implicit none
+  integer(kind=4), intent(in)  :: n0_xVec
+  real(kind=8), intent(in)  :: xVec (0:n0_xVec - 1)
+  integer(kind=4), intent(in)  :: n0_yVec
+  real(kind=8), intent(in)  :: yVec (0:n0_yVec - 1)
+  integer(kind=4), intent(in)  :: n0_kts1
+  real(kind=8), intent(in)  :: kts1 (0:n0_kts1 - 1)
+  integer(kind=4), intent(in)  :: deg1
+  integer(kind=4), intent(in)  :: n0_kts2
+  real(kind=8), intent(in)  :: kts2 (0:n0_kts2 - 1)
+  integer(kind=4), intent(in)  :: deg2
+  integer(kind=4), intent(in)  :: n0_coeffs
+  integer(kind=4), intent(in)  :: n1_coeffs
+  complex(kind=8), intent(in)  :: coeffs (0:n0_coeffs - 1,0:n1_coeffs - 1)
+  integer(kind=4), intent(in)  :: n0_z
+  integer(kind=4), intent(in)  :: n1_z
+  complex(kind=8), intent(inout)  :: z (0:n0_z - 1,0:n1_z - 1)
+  integer(kind=4), intent(in)  :: der1
+  integer(kind=4), intent(in)  :: der2
+  real(kind=8), allocatable :: basis1 (:)
+  real(kind=8), allocatable :: basis2 (:)
+  complex(kind=8) :: theCoeff
+  integer(kind=4) :: span1
+  integer(kind=4) :: span2
+  real(kind=8) :: x
+  real(kind=8) :: y
+  integer(kind=4) :: i
+  integer(kind=4) :: j
+  integer(kind=4) :: k
+  integer(kind=4) :: l
+
+
+  allocate(basis1(0:deg1))
+  allocate(basis2(0:deg2))
+
+
+  do i = 0, n0_xVec - 1, 1
+    x = xVec(i)
+    span1 = find_span(kts1, deg1, x)
+    if (der1 == 0 ) then
+      call basis_funs(kts1, deg1, x, span1, basis1)
+    else
+      call basis_funs_1st_der(kts1, deg1, x, span1, basis1)
+    end if
+    do j = 0, n0_yVec - 1, 1
+      y = yVec(j)
+      span2 = find_span(kts2, deg2, y)
+      if (der2 == 0 ) then
+        call basis_funs(kts2, deg2, y, span2, basis2)
+      else
+        call basis_funs_1st_der(kts2, deg2, y, span2, basis2)
+      end if
+
+
+      z(j, i) = (0.0d0, 0.0d0)
+      do k = 0, deg1, 1
+        theCoeff = basis2(0)*coeffs(span2 - deg2, span1 - deg1 + k)
+        do l = 1, deg2, 1
+          theCoeff = basis2(l)*coeffs(span2 - deg2 + l, span1 - deg1 + k) &
+      + theCoeff
+        end do
+
+        z(j, i) = basis1(k)*theCoeff + z(j, i)
+      end do
+
+    end do
+
+  end do
+
+end subroutine
+! ........................................
+
 ! ........................................
 subroutine eval_spline_2d_vector(n0_x, x, n0_y, y, n0_kts1, kts1, deg1, &
       n0_kts2, kts2, deg2, n0_coeffs, n1_coeffs, coeffs, n0_z, z, der1, &
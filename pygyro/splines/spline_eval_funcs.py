@@ -40,14 +40,60 @@ def eval_spline_1d_vector(x,knots,degree,coeffs,y,der=0):
             for j in range(degree+1):
                 y[i]+=coeffs[span-degree+j]*basis[j]
 
+@types('double[:,:]','int','double[:,:]','int','int','int[:]','double[:,:]','double[:,:]','int[:]','double[:,:]','double[:,:]')
+def eval_interpolant_1d(ug,shift,lu,kl,ku,ipiv,corrZ,corrV,spans,basis,y):
+    from numpy      import empty
+    n      = ug.shape[1]
+    kd     = kl+ku
+    nCorr  = corrZ.shape[0]
+    degree = basis.shape[1]-1
+    c = empty( n, dtype=float )
+    w = empty( nCorr, dtype=float )
+    for line in range(ug.shape[0]):
+        for j in range(n):
+            c[j] = ug[line,(j-shift)%n]
+        
+        # Solve the banded system using the LU factors from dgbtrf
+        for j in range(n-1):
+            jp = ipiv[j]
+            if (jp!=j):
+                temp  = c[j]
+                c[j]  = c[jp]
+                c[jp] = temp
+            for i in range(1,min(kl,n-1-j)+1):
+                c[j+i] -= lu[kd+i,j]*c[j]
+        for j in range(n-1,-1,-1):
+            c[j] = c[j]/lu[kd,j]
+            for i in range(1,min(kd,j)+1):
+                c[j-i] -= lu[kd-i,j]*c[j]
+        
+        # Correct for the periodic corners which are not in the band
+        for k in range(nCorr):
+            w[k] = 0.0
+            for j in range(n):
+                w[k] += corrV[k,j]*c[j]
+        for k in range(nCorr):
+            for j in range(n):
+                c[j] -= corrZ[k,j]*w[k]
+        
+        # Evaluate the spline at the new points
+        for i in range(len(spans)):
+            y[line,i] = 0.0
+            for j in range(degree+1):
+                y[line,i] += c[(spans[i]-degree+j)%n]*basis[i,j]
+
 @types('double','double','double[:]','int','double[:]','int','double[:,:]','int','int')
 def eval_spline_2d_scalar(x,y,kts1,deg1,kts2,deg2,coeffs,der1=0,der2=0):
-    span1  =  find_span( kts1, deg1, x )
-    span2  =  find_span( kts2, deg2, y )
-    
     from numpy      import empty
     basis1  = empty( deg1+1, dtype=float )
     basis2  = empty( deg2+1, dtype=float )
+    return eval_spline_2d_scalar_work(x,y,kts1,deg1,kts2,deg2,coeffs,der1,der2,basis1,basis2)
+
+@types('double','double','double[:]','int','double[:]','int','double[:,:]','int','int','double[:]','double[:]')
+def eval_spline_2d_scalar_work(x,y,kts1,deg1,kts2,deg2,coeffs,der1,der2,basis1,basis2):
+    span1  =  find_span( kts1, deg1, x )
+    span2  =  find_span( kts2, deg2, y )
+    
     if (der1==0):
         basis_funs( kts1, deg1, x, span1, basis1 )
     elif (der1==1):
@@ -57,15 +103,12 @@ def eval_spline_2d_scalar(x,y,kts1,deg1,kts2,deg2,coeffs,der1=0,der2=0):
     elif (der2==1):
         basis_funs_1st_der( kts2, deg2, y, span2, basis2 )
     
-    theCoeffs = empty([deg1+1,deg2+1])
-    theCoeffs[:,:] = coeffs[span1-deg1:span1+1,span2-deg2:span2+1]
-    
     z = 0.0
     for i in range(deg1+1):
-        theCoeffs[i,0] = theCoeffs[i,0]*basis2[0]
+        theCoeff = coeffs[span1-deg1+i,span2-deg2]*basis2[0]
         for j in range(1,deg2+1):
-            theCoeffs[i,0] += theCoeffs[i,j]*basis2[j]
-        z+=theCoeffs[i,0]*basis1[i]
+            theCoeff += coeffs[span1-deg1+i,span2-deg2+j]*basis2[j]
+        z+=theCoeff*basis1[i]
     return z
 
 @types('double[:]','double[:]','double[:]','int','double[:]','int','double[:,:]','double[:,:]','int','int')
@@ -73,7 +116,6 @@ def eval_spline_2d_cross(xVec,yVec,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
     from numpy      import empty
     basis1  = empty( deg1+1 )
     basis2  = empty( deg2+1 )
-    theCoeffs = empty((deg1+1,deg2+1))
     
     if (der1==0 and der2==0):
         for i,x in enumerate(xVec):
@@ -83,14 +125,12 @@ def eval_spline_2d_cross(xVec,yVec,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
                 span2  =  find_span( kts2, deg2, y )
                 basis_funs( kts2, deg2, y, span2, basis2 )
                 
-                theCoeffs[:,:] = coeffs[span1-deg1:span1+1,span2-deg2:span2+1]
-                
                 z[i,j] = 0.0
                 for k in range(deg1+1):
-                    theCoeffs[k,0] = theCoeffs[k,0]*basis2[0]
+                    theCoeff = coeffs[span1-deg1+k,span2-deg2]*basis2[0]
                     for l in range(1,deg2+1):
-                        theCoeffs[k,0] += theCoeffs[k,l]*basis2[l]
-                    z[i,j]+=theCoeffs[k,0]*basis1[k]
+                        theCoeff += coeffs[span1-deg1+k,span2-deg2+l]*basis2[l]
+                    z[i,j]+=theCoeff*basis1[k]
     elif (der1==0 and der2==1):
         for i,x in enumerate(xVec):
             span1  =  find_span( kts1, deg1, x )
@@ -99,14 +139,12 @@ def eval_spline_2d_cross(xVec,yVec,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
                 span2  =  find_span( kts2, deg2, y )
                 basis_funs_1st_der( kts2, deg2, y, span2, basis2 )
                 
-                theCoeffs[:,:] = coeffs[span1-deg1:span1+1,span2-deg2:span2+1]
-                
                 z[i,j] = 0.0
                 for k in range(deg1+1):
-                    theCoeffs[k,0] = theCoeffs[k,0]*basis2[0]
+                    theCoeff = coeffs[span1-deg1+k,span2-deg2]*basis2[0]
                     for l in range(1,deg2+1):
-                        theCoeffs[k,0] += theCoeffs[k,l]*basis2[l]
-                    z[i,j]+=theCoeffs[k,0]*basis1[k]
+                        theCoeff += coeffs[span1-deg1+k,span2-deg2+l]*basis2[l]
+                    z[i,j]+=theCoeff*basis1[k]
     elif (der1==1 and der2==0):
         for i,x in enumerate(xVec):
             span1  =  find_span( kts1, deg1, x )
@@ -115,14 +153,12 @@ def eval_spline_2d_cross(xVec,yVec,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
                 span2  =  find_span( kts2, deg2, y )
                 basis_funs( kts2, deg2, y, span2, basis2 )
                 
-                theCoeffs[:,:] = coeffs[span1-deg1:span1+1,span2-deg2:span2+1]
-                
                 z[i,j] = 0.0
                 for k in range(deg1+1):
-                    theCoeffs[k,0] = theCoeffs[k,0]*basis2[0]
+                    theCoeff = coeffs[span1-deg1+k,span2-deg2]*basis2[0]
                     for l in range(1,deg2+1):
-                        theCoeffs[k,0] += theCoeffs[k,l]*basis2[l]
-                    z[i,j]+=theCoeffs[k,0]*basis1[k]
+                        theCoeff += coeffs[span1-deg1+k,span2-deg2+l]*basis2[l]
+                    z[i,j]+=theCoeff*basis1[k]
     elif (der1==1 and der2==1):
         for i,x in enumerate(xVec):
             span1  =  find_span( kts1, deg1, x )
@@ -131,14 +167,109 @@ def eval_spline_2d_cross(xVec,yVec,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
                 span2  =  find_span( kts2, deg2, y )
                 basis_funs_1st_der( kts2, deg2, y, span2, basis2 )
                 
-                theCoeffs[:,:] = coeffs[span1-deg1:span1+1,span2-deg2:span2+1]
-                
                 z[i,j] = 0.0
                 for k in range(deg1+1):
-                    theCoeffs[k,0] = theCoeffs[k,0]*basis2[0]
+                    theCoeff = coeffs[span1-deg1+k,span2-deg2]*basis2[0]
                     for l in range(1,deg2+1):
-                        theCoeffs[k,0] += theCoeffs[k,l]*basis2[l]
-                    z[i,j]+=theCoeffs[k,0]*basis1[k]
+                        theCoeff += coeffs[span1-deg1+k,span2-deg2+l]*basis2[l]
+                    z[i,j]+=theCoeff*basis1[k]
+
+@types('double','double','double[:]','int','double[:]','int','double[:,:]','int[:,:]','double[:]')
+def eval_spline_2d_multi(x,y,kts1,deg1,kts2,deg2,coeffs,ders,z):
+    from numpy      import empty
+    basis1  = empty( (2,deg1+1), dtype=float )
+    basis2  = empty( (2,deg2+1), dtype=float )
+    eval_spline_2d_multi_work(x,y,kts1,deg1,kts2,deg2,coeffs,ders,z,basis1,basis2)
+
+@types('double','double','double[:]','int','double[:]','int','double[:,:]','int[:,:]','double[:]','double[:,:]','double[:,:]')
+def eval_spline_2d_multi_work(x,y,kts1,deg1,kts2,deg2,coeffs,ders,z,basis1,basis2):
+    """
+    Evaluate several derivatives of a 2D spline at the point (x,y). The
+    spans and the values of the basis functions and of their first
+    derivatives are only computed once for all the derivatives.
+    ders[k] contains the orders (der1,der2) of the k-th derivative whose
+    value is stored in z[k]. basis1 and basis2 are work arrays of shape
+    (2,deg1+1) and (2,deg2+1)
+    """
+    span1  =  find_span( kts1, deg1, x )
+    span2  =  find_span( kts2, deg2, y )
+    
+    basis_funs        ( kts1, deg1, x, span1, basis1[0] )
+    basis_funs_1st_der( kts1, deg1, x, span1, basis1[1] )
+    basis_funs        ( kts2, deg2, y, span2, basis2[0] )
+    basis_funs_1st_der( kts2, deg2, y, span2, basis2[1] )
+    
+    for k in range(ders.shape[0]):
+        der1 = ders[k,0]
+        der2 = ders[k,1]
+        z[k] = 0.0
+        for i in range(deg1+1):
+            theCoeff = coeffs[span1-deg1+i,span2-deg2]*basis2[der2,0]
+            for j in range(1,deg2+1):
+                theCoeff += coeffs[span1-deg1+i,span2-deg2+j]*basis2[der2,j]
+            z[k]+=theCoeff*basis1[der1,i]
+
+@types('double[:]','double[:]','double[:]','int','double[:]','int','double[:,:]','int[:,:]','double[:,:]')
+def eval_spline_2d_multi_vector(x,y,kts1,deg1,kts2,deg2,coeffs,ders,z):
+    from numpy      import empty
+    basis1  = empty( (2,deg1+1), dtype=float )
+    basis2  = empty( (2,deg2+1), dtype=float )
+    vals    = empty( ders.shape[0], dtype=float )
+    for i in range(len(x)):
+        eval_spline_2d_multi_work(x[i],y[i],kts1,deg1,kts2,deg2,coeffs,ders,vals,basis1,basis2)
+        for k in range(ders.shape[0]):
+            z[k,i] = vals[k]
+
+@types('double','double','double[:]','int','double[:]','int','complex[:,:]','int','int')
+def eval_spline_2d_scalar_complex(x,y,kts1,deg1,kts2,deg2,coeffs,der1=0,der2=0):
+    from numpy      import empty
+    basis1  = empty( deg1+1, dtype=float )
+    basis2  = empty( deg2+1, dtype=float )
+    span1  =  find_span( kts1, deg1, x )
+    span2  =  find_span( kts2, deg2, y )
+    
+    if (der1==0):
+        basis_funs( kts1, deg1, x, span1, basis1 )
+    else:
+        basis_funs_1st_der( kts1, deg1, x, span1, basis1 )
+    if (der2==0):
+        basis_funs( kts2, deg2, y, span2, basis2 )
+    else:
+        basis_funs_1st_der( kts2, deg2, y, span2, basis2 )
+    
+    z = 0.0j
+    for i in range(deg1+1):
+        theCoeff = coeffs[span1-deg1+i,span2-deg2]*basis2[0]
+        for j in range(1,deg2+1):
+            theCoeff += coeffs[span1-deg1+i,span2-deg2+j]*basis2[j]
+        z+=theCoeff*basis1[i]
+    return z
+
+@types('double[:]','double[:]','double[:]','int','double[:]','int','complex[:,:]','complex[:,:]','int','int')
+def eval_spline_2d_cross_complex(xVec,yVec,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
+    from numpy      import empty
+    basis1  = empty( deg1+1 )
+    basis2  = empty( deg2+1 )
+    
+    for i,x in enumerate(xVec):
+        span1  =  find_span( kts1, deg1, x )
+        if (der1==0):
+            basis_funs( kts1, deg1, x, span1, basis1 )
+        else:
+            basis_funs_1st_der( kts1, deg1, x, span1, basis1 )
+        for j,y in enumerate(yVec):
+            span2  =  find_span( kts2, deg2, y )
+            if (der2==0):
+                basis_funs( kts2, deg2, y, span2, basis2 )
+            else:
+                basis_funs_1st_der( kts2, deg2, y, span2, basis2 )
+            
+            z[i,j] = 0.0j
+            for k in range(deg1+1):
+                theCoeff = coeffs[span1-deg1+k,span2-deg2]*basis2[0]
+                for l in range(1,deg2+1):
+                    theCoeff += coeffs[span1-deg1+k,span2-deg2+l]*basis2[l]
+                z[i,j]+=theCoeff*basis1[k]
 
 @types('double[:]','double[:]','double[:]','int','double[:]','int','double[:,:]','double[:]','int','int')
 def eval_spline_2d_vector(x,y,kts1,deg1,kts2,deg2,coeffs,z,der1=0,der2=0):
@@ -2,42 +2,262 @@
 # Copyright 2018 Yaman Güçlü
 
 import numpy as np
-from scipy.linalg        import solve_banded
+from scipy.linalg        import solve_banded, solve
 from scipy.linalg.lapack import zgbtrf, zgbtrs, dgbtrf, dgbtrs
-from scipy.sparse        import csr_matrix, csc_matrix, dia_matrix
-from scipy.sparse.linalg import splu
+from scipy.linalg.blas   import dgemm
 
 from .splines           import BSplines, Spline1D, Spline2D
-from .                  import mod_context_1
+from ..backends         import load_kernels
 
-if ('mod_pygyro_splines_mod_context_1' in dir(mod_context_1)):
-    mod_context_1 = mod_context_1.mod_pygyro_splines_mod_context_1
+SEF = load_kernels('splines.spline_eval_funcs')
 
 __all__ = ["SplineInterpolator1D", "SplineInterpolator2D"]
 
+#===============================================================================
+class CyclicBandedSolver():
+    """
+    Solver for the linear systems A x = b where A is a banded matrix whose
+    band may wrap around the corners, as is the case for the interpolation
+    matrix of a periodic spline.
+
+    The rows of A are shifted cyclically so that the largest entries lie
+    on the diagonal. The band B is factorised with LAPACK and the entries
+    in the corners are taken into account with the Sherman-Morrison-
+    Woodbury formula:
+
+        A^{-1} b = y - Z H V y  ,   y = B^{-1} b
+
+    where the rows of V contain the corner entries and Z H is stored as
+    the rows of corrZ. Real and complex right hand sides are supported and
+    several systems can be solved at once.
+
+    Parameters
+    ----------
+    n : int
+        The size of the matrix.
+
+    rows, cols, vals : 1D array_like
+        The row indices, column indices and values of the non-zero entries
+        of the matrix.
+
+    periodic : bool
+        True if the band wraps around the corners, False otherwise.
+
+    """
+    def __init__( self, n, rows, cols, vals, periodic ):
+        rows = np.asarray( rows )
+        cols = np.asarray( cols )
+        vals = np.asarray( vals, dtype=float )
+
+        if periodic:
+            # Shift the rows so that the largest entry of most rows lies on
+            # the diagonal
+            order    = np.lexsort( (-np.abs( vals ), rows) )
+            first    = np.concatenate( ([True], rows[order][1:] != rows[order][:-1]) )
+            dominant = order[first]
+            shift    = int( np.bincount( (cols[dominant] - rows[dominant]) % n ).argmax() )
+            rows     = (rows + shift) % n
+        else:
+            shift    = 0
+
+        # Offset from the diagonal (measured around the circle if periodic)
+        offsets = cols - rows
+        if periodic:
+            offsets = (offsets + n//2) % n - n//2
+        in_band = ( rows + offsets == cols )
+
+        kl = max( -offsets.min(), 0 )
+        ku = max(  offsets.max(), 0 )
+        bmat = np.zeros( (1+ku+2*kl, n) )
+        np.add.at( bmat, (kl+ku-offsets[in_band],cols[in_band]), vals[in_band] )
+        lu, ipiv, info = dgbtrf( bmat, kl, ku )
+        assert info == 0
+
+        corner_rows = np.unique( rows[~in_band] )
+        k = len( corner_rows )
+        corrV = np.zeros( (k, n) )
+        corrZ = np.zeros( (k, n) )
+        if k > 0:
+            np.add.at( corrV, (np.searchsorted( corner_rows, rows[~in_band] ),cols[~in_band]),
+                       vals[~in_band] )
+            U = np.zeros( (n, k) )
+            U[corner_rows,range(k)] = 1.0
+            Z, info = dgbtrs( lu, kl, ku, U, ipiv )
+            assert info == 0
+            cap = np.eye( k ) + corrV @ Z
+            corrZ[:] = solve( cap.T, Z.T )
+
+        # The factors are stored in the Fortran order expected by LAPACK
+        # and in C order for eval_interpolant_1d
+        self._n           = n
+        self._band_matrix = bmat
+        self._shift       = shift
+        self._kl          = kl
+        self._ku          = ku
+        self._lu_f        = lu
+        self._lu          = np.ascontiguousarray( lu )
+        self._ipiv        = ipiv
+        self._corrZ       = corrZ
+        self._corrZ_f     = np.asfortranarray( corrZ.T )
+        self._corrV       = corrV
+
+    @property
+    def band_matrix( self ):
+        """ The band of the (shifted) matrix in LAPACK band storage.
+        """
+        return self._band_matrix
+
+    @property
+    def shift( self ):
+        """ The cyclic shift applied to the rows of the matrix.
+        """
+        return self._shift
+
+    @property
+    def kl( self ):
+        """ The number of sub-diagonals in the band.
+        """
+        return self._kl
+
+    @property
+    def ku( self ):
+        """ The number of super-diagonals in the band.
+        """
+        return self._ku
+
+    @property
+    def lu( self ):
+        """ The LU factors of the band (C ordered).
+        """
+        return self._lu
+
+    @property
+    def lu_f( self ):
+        """ The LU factors of the band (Fortran ordered).
+        """
+        return self._lu_f
+
+    @property
+    def ipiv( self ):
+        """ The pivot indices of the LU factorisation (0-based).
+        """
+        return self._ipiv
+
+    @property
+    def corrZ( self ):
+        return self._corrZ
+
+    @property
+    def corrV( self ):
+        return self._corrV
+
+    def work_size( self, nrhs ):
+        """
+        The number of doubles in the work array needed to solve nrhs real
+        systems (a complex system counts as two real systems).
+        """
+        return ( self._n + self._corrV.shape[0] ) * nrhs
+
+    def solve( self, b, x, work = None ):
+        """
+        Solve the linear systems A x = b.
+
+        Parameters
+        ----------
+        b : numpy.ndarray
+            The right hand side(s). The first dimension has length n, the
+            remaining dimensions index the different right hand sides.
+            Real or complex. It may be a strided view.
+
+        x : numpy.ndarray
+            Preallocated array with the same shape as b in which the
+            solution is stored. It may be a strided view, and it may share
+            its memory with b. If its first dimension is longer than n the
+            extra entries are filled with the first entries of the
+            solution, as required for the coefficients of a periodic
+            spline.
+
+        work : 1D numpy.ndarray of float, optional
+            Work array with at least work_size entries (see work_size).
+            If it is not provided a temporary array is allocated.
+
+        """
+        n     = self._n
+        shift = self._shift
+        assert b.shape[0] == n
+        assert n <= x.shape[0] <= 2*n
+        assert x.shape[1:] == b.shape[1:]
+
+        # Real and imaginary parts are solved together as separate right
+        # hand sides
+        parts  = ( b.real, b.imag ) if np.iscomplexobj( b ) else ( b, )
+        nrhs   = b[0].size
+        nparts = len(parts)
+        m      = nparts*nrhs
+        k      = self._corrV.shape[0]
+
+        if work is None:
+            work = np.empty( (n+k)*m )
+        assert work.size >= (n+k)*m
+
+        # Shift the rows cyclically into a Fortran ordered array which
+        # LAPACK can overwrite with the solution. The right hand sides are
+        # numbered in Fortran order so that each part of y can be viewed
+        # with the shape of b, whatever the strides of b
+        y = work[:n*m].reshape( (n, nparts, nrhs), order='F' )
+        for i,part in enumerate( parts ):
+            yi = y[:,i].reshape( b.shape, order='F' )
+            yi[shift:] = part[:n-shift]
+            yi[:shift] = part[n-shift:]
+
+        y2 = y.reshape( (n, m), order='F' )
+        y2, info = dgbtrs( self._lu_f, self._kl, self._ku, y2, self._ipiv,
+                           overwrite_b=True )
+        assert info == 0
+        if k > 0:
+            # y -= Z H (V y), computed in place in the work array
+            t = work[n*m:(n+k)*m].reshape( (k, m), order='F' )
+            np.matmul( y2.T, self._corrV.T, out=t.T )
+            y2 = dgemm( -1.0, self._corrZ_f, t, beta=1.0, c=y2, overwrite_c=True )
+        y = y2.reshape( (n, nparts, nrhs), order='F' )
+
+        # The wrapped entries are copied from the work array as a copy
+        # within x would need a temporary array the size of x
+        for xi in ( x[:n], x[n:] ):
+            if nparts == 2:
+                xi.real = y[:len(xi),0].reshape( xi.shape, order='F' )
+                xi.imag = y[:len(xi),1].reshape( xi.shape, order='F' )
+            else:
+                xi[:] = y[:len(xi),0].reshape( xi.shape, order='F' )
+
 #===============================================================================
 class SplineInterpolator1D():
 
     def __init__( self, basis, dtype = float ):
         assert isinstance( basis, BSplines )
         self._basis = basis
-        self._imat = self.collocation_matrix(basis.knots,basis.degree,basis.greville,basis.periodic)
+
+        # Build the interpolation matrix from the values of the basis
+        # functions at the Greville points, without a dense matrix
+        n = basis.nbasis
+        p = basis.degree
+        spans, values = self.basis_values( basis.knots, p, basis.greville )
+        rows = np.repeat( np.arange( n ), p+1 )
+        cols = ( ( spans[:,None] - p + np.arange( p+1 )[None,:] ) % n ).flatten()
+        nonzero = ( values.flatten() != 0.0 )
+        self._solver = CyclicBandedSolver( n, rows[nonzero], cols[nonzero],
+                                           values.flatten()[nonzero], basis.periodic )
+
         if basis.periodic:
-            self._splu = splu( csc_matrix(self._imat) )
             self._offset = self._basis.degree // 2
         else:
-            dmat = dia_matrix( self._imat )
-            self._l = abs( dmat.offsets.min() )
-            self._u =      dmat.offsets.max()
-            cmat = csr_matrix( dmat )
-            bmat = np.zeros( (1+self._u+2*self._l, cmat.shape[1]) )
-            for i,j in zip( *cmat.nonzero() ):
-                bmat[self._u+self._l+i-j,j] = cmat[i,j]
-            if (dtype==np.complex):
-                self._bmat, self._ipiv, self._finfo = zgbtrf(bmat, self._l, self._u)
+            self._l = self._solver.kl
+            self._u = self._solver.ku
+            if np.issubdtype( dtype, np.complexfloating ):
+                self._bmat, self._ipiv, self._finfo = zgbtrf(self._solver.band_matrix, self._l, self._u)
                 self._solveFunc = zgbtrs
             else:
-                self._bmat, self._ipiv, self._finfo = dgbtrf(bmat, self._l, self._u)
+                self._bmat, self._ipiv = self._solver.lu_f, self._solver.ipiv
                 self._solveFunc = dgbtrs
             self._sinfo = None
 
@@ -64,7 +284,7 @@ class SplineInterpolator1D():
         n = self._basis.nbasis
         p = self._basis.degree
 
-        c[0:n  ] = self._splu.solve( ug )
+        self._solver.solve( ug, c[0:n] )
         c[n:n+p] = c[0:p]
 
     # ...
@@ -74,7 +294,186 @@ class SplineInterpolator1D():
 
         assert c.shape == ug.shape
         c[:], self._sinfo = self._solveFunc(self._bmat, self._l, self._u, ug, self._ipiv)
-    
+
+    # ...
+    def compute_interpolant_batch( self, ug, coeffs, axis = -1 ):
+        """
+        Compute the spline coefficients of several interpolants at once.
+        The interpolation matrix is only factorised once and all the lines
+        are solved together with a multiple right hand side solve.
+
+        Parameters
+        ----------
+        ug : numpy.ndarray
+            The values at the Greville points. The interpolation is carried
+            out along the dimension axis.
+
+        coeffs : numpy.ndarray
+            Preallocated array in which the spline coefficients are stored.
+            It has the same shape as ug, except along the dimension axis
+            whose length is the number of spline coefficients.
+
+        axis : int - optional
+            The dimension along which the values are interpolated.
+            Default is the last dimension
+
+        """
+        n = self._basis.nbasis
+        p = self._basis.degree
+        nc = n+p if self._basis.periodic else n
+
+        assert ug.ndim == coeffs.ndim
+        assert ug.shape[axis] == n
+        assert coeffs.shape[axis] == nc
+        assert np.delete( ug.shape, axis ).tolist() == np.delete( coeffs.shape, axis ).tolist()
+
+        c = np.moveaxis( coeffs, axis, -1 )
+
+        if c.flags['C_CONTIGUOUS']:
+            # Reorder the data such that each row is one line. The
+            # coefficients can be written directly into coeffs
+            ug_lines = np.moveaxis( ug, axis, -1 ).reshape( -1, n )
+            self._solve_system_batch( ug_lines, c.reshape( -1, nc ) )
+        else:
+            self._solve_system_strided( np.moveaxis( ug    , axis, 0 ),
+                                        np.moveaxis( coeffs, axis, 0 ) )
+
+    # ...
+    def _solve_system_batch( self, ug, c ):
+
+        n = self._basis.nbasis
+        p = self._basis.degree
+
+        assert ug.shape[1] == n
+        assert c.shape[0] == ug.shape[0]
+        assert c.flags['C_CONTIGUOUS']
+
+        if self._basis.periodic:
+            self._solver.solve( ug.T, c[:,0:n].T )
+            c[:,n:n+p] = c[:,0:p]
+        else:
+            # The transpose of a C-contiguous array is Fortran-contiguous
+            # so LAPACK can solve for all right hand sides in place
+            c[:] = ug
+            x, self._sinfo = self._solveFunc(self._bmat, self._l, self._u, c.T,
+                                                self._ipiv, overwrite_b=True)
+            if not np.shares_memory( x, c ):
+                c[:] = x.T
+
+    # ...
+    def _solve_system_strided( self, ug, c, work = None ):
+        """
+        Interpolate along the first dimension of ug and c, which may be
+        arbitrary strided views. No copy of the lines is made except for
+        the work array of the solver, which can be provided.
+        """
+        n = self._basis.nbasis
+        p = self._basis.degree
+
+        assert ug.shape[0] == n
+        assert ug.shape[1:] == c.shape[1:]
+
+        # The solver fills the periodic "wrap around" coefficients
+        self._solver.solve( ug, c[0:n+p] if self._basis.periodic else c[0:n], work )
+
+    # ...
+    def interpolate_and_eval( self, ug, spans, basis_vals, y ):
+        """
+        Interpolate the values at the Greville points and evaluate the
+        resulting spline at a set of points in one pass. The spline
+        coefficients are never stored so no Spline1D object is needed.
+
+        This is useful when the same evaluation points are used many
+        times, as spans and basis_vals must be computed in advance (e.g.
+        VParallelAdvection.step with a constant advection parameter).
+
+        Parameters
+        ----------
+        ug : numpy.ndarray
+            The values at the Greville points. Several lines can be
+            provided at once, the interpolation is carried out along the
+            last dimension.
+
+        spans : 1D numpy.ndarray of int32
+            The spans of the evaluation points (see basis_values).
+
+        basis_vals : 2D numpy.ndarray
+            The values of the non-zero basis functions at the evaluation
+            points (see basis_values).
+
+        y : numpy.ndarray
+            C-contiguous array in which the values are stored. It has the
+            same shape as ug except along the last dimension whose length
+            is the number of evaluation points.
+
+        """
+        n = self._basis.nbasis
+
+        assert ug.shape[-1] == n
+        assert y.shape[-1] == len(spans)
+        assert ug.shape[:-1] == y.shape[:-1]
+        assert y.flags['C_CONTIGUOUS']
+
+        ug_lines = np.ascontiguousarray( ug ).reshape( -1, n )
+        y_lines  = y.reshape( -1, len(spans) )
+
+        solver   = self._solver
+        SEF.eval_interpolant_1d( ug_lines, solver.shift,
+                                solver.lu, solver.kl, solver.ku, solver.ipiv,
+                                solver.corrZ, solver.corrV,
+                                spans, basis_vals, y_lines )
+
+    @staticmethod
+    def basis_values( knots, degree, xgrid ):
+        """
+        Compute the span and the values of the non-zero B-spline basis
+        functions at each of the evaluation points.
+
+        Parameters
+        ----------
+        knots : 1D array_like
+            Knots sequence.
+
+        degree : int
+            Polynomial degree of B-splines.
+
+        xgrid : 1D array_like
+            Evaluation points.
+
+        Returns
+        -------
+        spans : 1D numpy.ndarray of int32
+            The knot span containing each point.
+
+        values : 2D numpy.ndarray
+            values[i,j] is the value of the basis function span-degree+j
+            at the point xgrid[i].
+
+        """
+        xgrid = np.asarray( xgrid, dtype=float )
+
+        # Knot span of each point (see find_span). The points outside the
+        # domain use the first or last span
+        low   = degree
+        high  = len(knots)-1-degree
+        spans = np.searchsorted( knots, xgrid, side='right' ) - 1
+        spans = np.clip( spans, low, high-1 ).astype( np.int32 )
+
+        # Algorithm A2.2 of basis_funs applied to all points at once
+        values = np.empty( (xgrid.size, degree+1) )
+        values[:,0] = 1.0
+        for j in range(degree):
+            saved = 0.0
+            for r in range(j+1):
+                left        = xgrid - knots[spans-j+r]
+                right       = knots[spans+1+r] - xgrid
+                temp        = values[:,r] / (right + left)
+                values[:,r] = saved + right * temp
+                saved       = left * temp
+            values[:,j+1] = saved
+
+        return spans, values
+
     @staticmethod
     def collocation_matrix( knots, degree, xgrid, periodic ):
         """
@@ -113,17 +512,14 @@ class SplineInterpolator1D():
         mat = np.zeros( (nx,nb) )
 
         # Indexing of basis functions (periodic or not) for a given span
+        spans, values = SplineInterpolator1D.basis_values( knots, degree, xgrid )
+        cols = spans[:,None] - degree + np.arange( degree+1 )[None,:]
         if periodic:
-            js = lambda span: [(span-degree+s) % nb for s in range( degree+1 )]
-        else:
-            js = lambda span: slice( span-degree, span+1 )
+            cols %= nb
 
-        basis = np.empty(degree+1)
-        # Fill in non-zero matrix values
-        for i,x in enumerate( xgrid ):
-            span  =  mod_context_1.find_span( knots, degree, x )
-            mod_context_1.basis_funs( knots, degree, x, span, basis )
-            mat[i,js(span)] = basis
+        # Fill in non-zero matrix values. If there are fewer periodic basis
+        # functions than non-zero values the contributions are summed
+        np.add.at( mat, (np.arange( nx )[:,None],cols), values )
 
         return mat
 
@@ -137,14 +533,9 @@ class SplineInterpolator2D():
 
         self._basis1  = basis1
         self._basis2  = basis2
-        self._spline1 = Spline1D( basis1, dtype )
-        self._spline2 = Spline1D( basis2, dtype )
         self._interp1 = SplineInterpolator1D( basis1, dtype )
         self._interp2 = SplineInterpolator1D( basis2, dtype )
-
-        n1,n2 = basis1.ncells, basis2.ncells
-        p1,p2 = basis1.degree, basis2.degree
-        self._bwork = np.zeros( (n2+p2,n1+p1) )
+        self._work    = None
 
     def compute_interpolant( self, ug, spl ):
 
@@ -152,36 +543,57 @@ class SplineInterpolator2D():
         basis1, basis2 = spl.basis
         assert basis1 is self._basis1
         assert basis2 is self._basis2
+        assert ug.shape == (basis1.nbasis,basis2.nbasis)
 
-        n1,n2 = basis1.nbasis, basis2.nbasis
-        p1,p2 = basis1.degree, basis2.degree
-        assert ug.shape == (n1,n2)
-
-        w  = spl.coeffs
-        wt = self._bwork
-
-        # Cycle over x1 position and interpolate f along x2 direction.
-        # Work on spl.coeffs
-        for i1 in range(n1):
-            self._interp2.compute_interpolant( ug[i1,:], self._spline2 )
-            w[i1,:] = self._spline2.coeffs
-
-        # Transpose coefficients to self._bwork
-        wt[:,:] = w.transpose()
+        self.compute_interpolant_batch( ug, spl.coeffs )
 
-        # Cycle over x2 position and interpolate w along x1 direction.
-        # Work on self._bwork
-        for i2 in range(n2):
-            self._interp1.compute_interpolant( wt[i2,:n1], self._spline1 )
-            wt[i2,:] = self._spline1.coeffs
+    def compute_interpolant_batch( self, ug, coeffs ):
+        """
+        Compute the spline coefficients of the 2D interpolants of one or
+        several planes at once. All the planes are folded into the right
+        hand sides so that each direction is interpolated with a single
+        multiple right hand side solve. The solver works directly on
+        strided views of ug and coeffs, so no line is transposed by the
+        caller. The work array of the solver is kept between calls, so
+        no memory is allocated once it is large enough for the stack.
 
-        # x2-periodic only: "wrap around" coefficients onto extended array
-        if (self._basis2.periodic):
-            wt[n2:n2+p2,:] = wt[:p2,:]
+        Parameters
+        ----------
+        ug : numpy.ndarray
+            The values at the Greville points. The last two dimensions are
+            the x1 and x2 directions, any leading dimensions index the
+            different planes.
 
-        # Transpose coefficients to spl.coeffs
-        w[:,:] = wt.transpose()
+        coeffs : numpy.ndarray
+            Preallocated array in which the spline coefficients are stored.
+            It has the same leading dimensions as ug, followed by the
+            shape of the coefficients of a Spline2D.
 
-        # x1-periodic only: "wrap around" coefficients onto extended array
-        if (self._basis1.periodic):
-            w[n1:n1+p1,:] = w[:p1,:]
+        """
+        n1,n2 = self._basis1.nbasis, self._basis2.nbasis
+        nc1   = self._basis1.ncells + self._basis1.degree
+        nc2   = self._basis2.ncells + self._basis2.degree
+
+        assert ug.shape[-2:] == (n1,n2)
+        assert coeffs.shape  == ug.shape[:-2] + (nc1,nc2)
+
+        nplanes = int( np.prod( ug.shape[:-2] ) )
+        nparts  = 2 if np.iscomplexobj( ug ) or np.iscomplexobj( coeffs ) else 1
+        size    = max( self._interp2._solver.work_size( nparts*nplanes*n1  ),
+                       self._interp1._solver.work_size( nparts*nplanes*nc2 ) )
+        if self._work is None or self._work.size < size:
+            self._work = np.empty( size )
+
+        # Interpolate f along x2 direction for all x1 positions of all
+        # planes
+        self._interp2._solve_system_strided( np.moveaxis( ug              , -1, 0 ),
+                                             np.moveaxis( coeffs[...,:n1,:], -1, 0 ),
+                                             self._work )
+
+        # Interpolate w along x1 direction for all x2 positions of all
+        # planes, including the x2-periodic "wrap around" coefficients.
+        # The solver copies the values before writing the result so this
+        # can be done in place
+        self._interp1._solve_system_strided( np.moveaxis( coeffs[...,:n1,:], -2, 0 ),
+                                             np.moveaxis( coeffs           , -2, 0 ),
+                                             self._work )
@@ -3,16 +3,14 @@
 
 import numpy as np
 from scipy.interpolate  import splev, bisplev
+from scipy.sparse       import csr_matrix
 
-from .      import spline_eval_funcs as SEF
+from ..backends import load_kernels
 
-__all__ = ['make_knots', 'BSplines', 'Spline1D', 'Spline2D']
+__all__ = ['make_knots', 'BSplines', 'Spline1D', 'Spline2D', 'SplineEvaluationPlan']
 
-if ('mod_pygyro_splines_spline_eval_funcs' in dir(SEF)):
-    SEF = SEF.mod_pygyro_splines_spline_eval_funcs
-    modFunc = np.transpose
-else:
-    modFunc = lambda c: c
+SEF = load_kernels('splines.spline_eval_funcs')
+mod_context_1 = load_kernels('splines.mod_context_1')
 
 #===============================================================================
 def make_knots( breaks, degree, periodic ):
@@ -96,6 +94,12 @@ class BSplines():
         self._nbasis   = self._ncells if periodic else self._ncells+degree
         self._offset   = degree//2 if periodic else 0
 
+        # Uniform breakpoints allow the cell containing a point to be
+        # found with a floor division
+        breaks = self.breaks
+        dx     = (breaks[-1]-breaks[0])/self._ncells
+        self._uniform = np.allclose( np.diff( breaks ), dx, rtol=1e-12, atol=0 )
+
     @property
     def degree( self ):
         """ Degree of B-splines.
@@ -120,6 +124,12 @@ class BSplines():
         """
         return self._periodic
 
+    @property
+    def uniform( self ):
+        """ True if the breakpoints are uniformly spaced, False otherwise.
+        """
+        return self._uniform
+
     @property
     def knots( self ):
         """ Knot sequence.
@@ -189,7 +199,16 @@ class BSplines():
         """
         a, b = self.domain
         assert( a <= x <= b )
-        return int( np.searchsorted( self.breaks, x, side='right' ) - 1 )
+        breaks = self.breaks
+        if self._uniform:
+            # Correct the floor division for rounding errors at breakpoints
+            i = min( int( (x-a)*self._ncells/(b-a) ), self._ncells-1 )
+            if x < breaks[i]:
+                i -= 1
+            elif i < self._ncells-1 and x >= breaks[i+1]:
+                i += 1
+            return i
+        return min( int( np.searchsorted( breaks, x, side='right' ) - 1 ), self._ncells-1 )
 
 #===============================================================================
 
@@ -224,13 +243,13 @@ class Spline1D():
 #===============================================================================
 class Spline2D():
 
-    def __init__( self, basis1, basis2 ):
+    def __init__( self, basis1, basis2, dtype = float ):
         assert isinstance( basis1, BSplines )
         assert isinstance( basis2, BSplines )
         shape = (basis1.ncells + basis1.degree, basis2.ncells + basis2.degree)
         self._basis1 = basis1
         self._basis2 = basis2
-        self._coeffs = np.zeros( shape )
+        self._coeffs = np.zeros( shape, dtype=dtype )
 
         if basis1.degree > 5:
             raise NotImplementedError( "scipy.interpolate.bisplev needs p1 <= 5" )
@@ -247,15 +266,22 @@ class Spline2D():
         return self._coeffs
 
     def eval( self, x1, x2, der1=0, der2=0 ):
+        if (np.iscomplexobj(self._coeffs)):
+            eval_cross  = SEF.eval_spline_2d_cross_complex
+            eval_scalar = SEF.eval_spline_2d_scalar_complex
+        else:
+            eval_cross  = SEF.eval_spline_2d_cross
+            eval_scalar = SEF.eval_spline_2d_scalar
+        
         if (hasattr(x1,'__len__')):
-            result = np.empty((len(x1),len(x2)))
-            SEF.eval_spline_2d_cross(x1,x2,self._basis1.knots,self._basis1.degree,
-                                        self._basis2.knots,self._basis2.degree,
-                                        modFunc(self._coeffs),modFunc(result),der1,der2)
+            result = np.empty((len(x1),len(x2)),dtype=self._coeffs.dtype)
+            eval_cross(x1,x2,self._basis1.knots,self._basis1.degree,
+                        self._basis2.knots,self._basis2.degree,
+                        self._coeffs,result,der1,der2)
         else:
-            result = SEF.eval_spline_2d_scalar(x1,x2,self._basis1.knots,self._basis1.degree,
-                                                 self._basis2.knots,self._basis2.degree,
-                                                 modFunc(self._coeffs),der1,der2)
+            result = eval_scalar(x1,x2,self._basis1.knots,self._basis1.degree,
+                                    self._basis2.knots,self._basis2.degree,
+                                    self._coeffs,der1,der2)
         return result
 
         """
@@ -268,3 +294,141 @@ class Spline2D():
         tck = (t1, t2, c, k1, k2)
         return bisplev( x1, x2, tck, der1, der2 )
         """
+
+    def eval_multi( self, x1, x2, ders ):
+        """
+        Evaluate several derivatives of the spline at the scattered points
+        (x1[i],x2[i]). The knot spans and the basis functions are only
+        computed once per point for all the derivatives.
+
+        Parameters
+        ----------
+        x1, x2 : 1D array_like
+            The coordinates of the evaluation points.
+
+        ders : list of tuple of int
+            The orders (der1,der2) of the derivatives (0 or 1).
+
+        Returns
+        -------
+        result : numpy.ndarray
+            result[k,i] is the k-th derivative at the i-th point.
+
+        """
+        x1     = np.asarray( x1, dtype=float )
+        x2     = np.asarray( x2, dtype=float )
+        ders   = np.array( ders, dtype=np.int32 ).reshape( -1, 2 )
+        assert x1.shape == x2.shape
+        assert np.all( (ders==0) | (ders==1) )
+
+        result = np.empty( (len(ders),x1.size) )
+        SEF.eval_spline_2d_multi_vector(x1,x2,self._basis1.knots,self._basis1.degree,
+                                        self._basis2.knots,self._basis2.degree,
+                                        self._coeffs,ders,result)
+        return result
+
+#===============================================================================
+class SplineEvaluationPlan():
+    """
+    Precomputed spans and basis function values used to evaluate splines
+    of a given basis at a fixed set of points. Once the plan is built,
+    evaluating a spline is a sparse matrix-vector product and no span
+    search or de Boor recursion is needed.
+
+    Parameters
+    ----------
+    basis : BSplines
+        The basis of the splines which will be evaluated.
+
+    points : 1D array_like
+        The evaluation points.
+
+    der : int - optional
+        The derivative which is evaluated (0 or 1). Default is 0.
+
+    """
+    def __init__( self, basis, points, der = 0 ):
+        assert isinstance( basis, BSplines )
+        assert der in (0, 1)
+
+        knots  = basis.knots
+        degree = basis.degree
+        points = np.asarray( points, dtype=float )
+
+        self._basis  = basis
+        self._points = points.copy()
+        self._spans  = np.empty( points.size, dtype=np.int32 )
+        self._values = np.empty( (points.size, degree+1) )
+
+        for i,x in enumerate( points ):
+            self._spans[i] = mod_context_1.find_span( knots, degree, x )
+            if (der==0):
+                mod_context_1.basis_funs( knots, degree, x, self._spans[i], self._values[i] )
+            else:
+                mod_context_1.basis_funs_1st_der( knots, degree, x, self._spans[i], self._values[i] )
+
+        # The coefficient multiplied by values[i,j] is span-degree+j
+        nCoeffs = basis.ncells + degree
+        cols    = self._spans[:,None] - degree + np.arange( degree+1 )[None,:]
+        rows    = np.repeat( np.arange( points.size ), degree+1 )
+        self._matrix = csr_matrix( (self._values.flatten(), (rows, cols.flatten())),
+                                    shape=(points.size, nCoeffs) )
+
+    @property
+    def basis( self ):
+        return self._basis
+
+    @property
+    def points( self ):
+        """ The evaluation points.
+        """
+        return self._points
+
+    @property
+    def spans( self ):
+        """ The knot span containing each evaluation point.
+        """
+        return self._spans
+
+    @property
+    def values( self ):
+        """ values[i,j] is the value (or derivative) of the basis function
+            spans[i]-degree+j at the i-th evaluation point.
+        """
+        return self._values
+
+    @property
+    def matrix( self ):
+        """ Sparse matrix mapping the spline coefficients to the values at
+            the evaluation points.
+        """
+        return self._matrix
+
+    def eval( self, coeffs, axis = -1 ):
+        """
+        Evaluate one or more splines at the points of the plan.
+
+        Parameters
+        ----------
+        coeffs : numpy.ndarray
+            The spline coefficients (as stored in Spline1D.coeffs) along
+            the dimension axis. Any other dimensions index different
+            splines.
+
+        axis : int - optional
+            The dimension containing the coefficients.
+            Default is the last dimension
+
+        Returns
+        -------
+        vals : numpy.ndarray
+            The values at the evaluation points. It has the same shape
+            as coeffs except along the dimension axis whose length is
+            the number of points.
+
+        """
+        assert coeffs.shape[axis] == self._matrix.shape[1]
+
+        c    = np.moveaxis( coeffs, axis, 0 )
+        vals = self._matrix.dot( c.reshape( c.shape[0], -1 ) )
+        return np.moveaxis( vals.reshape( (vals.shape[0],) + c.shape[1:] ), 0, axis )
@@ -9,7 +9,7 @@ from  .splines_error_bounds   import spline_1d_error_bound, spline_2d_error_boun
 from  .analytical_profiles_1d import AnalyticalProfile1D_Cos, AnalyticalProfile1D_Poly
 from  .analytical_profiles_2d import AnalyticalProfile2D_CosCos
 from ..splines                import make_knots, BSplines, Spline1D, Spline2D
-from ..spline_interpolators   import SplineInterpolator1D, SplineInterpolator2D
+from ..spline_interpolators   import SplineInterpolator1D, SplineInterpolator2D, CyclicBandedSolver
 
 #===============================================================================
 @pytest.mark.serial
@@ -77,6 +77,162 @@ def test_SplineInterpolator1D_cosine( ncells, degree, periodic ):
 
     assert max_norm_err < err_bound
 
+#===============================================================================
+@pytest.mark.serial
+@pytest.mark.parametrize( "ncells"  , [5,10,23] )
+@pytest.mark.parametrize( "degree"  , range(1,5) )
+@pytest.mark.parametrize( "periodic", [True,False] )
+@pytest.mark.parametrize( "axis"    , [0,1,2] )
+
+def test_SplineInterpolator1D_batch( ncells, degree, periodic, axis ):
+
+    domain = [-1.0, 1.0]
+
+    breaks = random_grid( domain, ncells, 0.5 )
+    knots  = make_knots( breaks, degree, periodic )
+    basis  = BSplines( knots, degree, periodic )
+    spline = Spline1D( basis )
+    interp = SplineInterpolator1D( basis )
+
+    shape       = [3,4,5]
+    shape[axis] = basis.nbasis
+    ug          = np.random.random_sample( shape )
+
+    shape[axis] = spline.coeffs.size
+    coeffs      = np.empty( shape )
+
+    interp.compute_interpolant_batch( ug, coeffs, axis=axis )
+
+    ug_lines = np.moveaxis( ug    , axis, -1 ).reshape( -1, basis.nbasis )
+    c_lines  = np.moveaxis( coeffs, axis, -1 ).reshape( -1, spline.coeffs.size )
+    for u,c in zip( ug_lines, c_lines ):
+        interp.compute_interpolant( u, spline )
+        assert np.allclose( c, spline.coeffs, rtol=1e-13, atol=1e-13 )
+
+#===============================================================================
+@pytest.mark.serial
+@pytest.mark.parametrize( "ncells"  , [5,10,23] )
+@pytest.mark.parametrize( "degree"  , range(1,6) )
+@pytest.mark.parametrize( "periodic", [True,False] )
+
+def test_SplineInterpolator1D_interpolate_and_eval( ncells, degree, periodic ):
+
+    domain = [-1.0, 1.0]
+
+    breaks = random_grid( domain, ncells, 0.5 )
+    knots  = make_knots( breaks, degree, periodic )
+    basis  = BSplines( knots, degree, periodic )
+    spline = Spline1D( basis )
+    interp = SplineInterpolator1D( basis )
+
+    xt = np.random.uniform( *domain, size=30 )
+    spans, vals = SplineInterpolator1D.basis_values( knots, degree, xt )
+
+    ug = np.random.random_sample( (3,4,basis.nbasis) )
+    y  = np.empty( (3,4,xt.size) )
+
+    interp.interpolate_and_eval( ug, spans, vals, y )
+
+    for u,v in zip( ug.reshape( -1, basis.nbasis ), y.reshape( -1, xt.size ) ):
+        interp.compute_interpolant( u, spline )
+        assert np.allclose( v, spline.eval( xt ), rtol=1e-12, atol=1e-12 )
+
+#===============================================================================
+@pytest.mark.serial
+@pytest.mark.parametrize( "ncells"  , [5,10,23] )
+@pytest.mark.parametrize( "degree"  , range(1,6) )
+@pytest.mark.parametrize( "periodic", [True,False] )
+
+def test_SplineInterpolator1D_collocation_matrix( ncells, degree, periodic ):
+
+    domain = [-1.0, 1.0]
+
+    breaks = random_grid( domain, ncells, 0.5 )
+    knots  = make_knots( breaks, degree, periodic )
+    basis  = BSplines( knots, degree, periodic )
+
+    xt  = np.concatenate( (breaks, np.random.uniform( *domain, size=20 )) )
+    mat = SplineInterpolator1D.collocation_matrix( knots, degree, xt, periodic )
+
+    for j in range( basis.nbasis ):
+        assert np.allclose( mat[:,j], basis[j].eval( xt ), rtol=1e-14, atol=1e-14 )
+
+#===============================================================================
+@pytest.mark.serial
+@pytest.mark.parametrize( "ncells"  , [5,10,23] )
+@pytest.mark.parametrize( "degree"  , range(1,6) )
+@pytest.mark.parametrize( "periodic", [True,False] )
+
+def test_SplineInterpolator1D_complex( ncells, degree, periodic ):
+
+    domain = [-1.0, 1.0]
+
+    breaks = random_grid( domain, ncells, 0.5 )
+    knots  = make_knots( breaks, degree, periodic )
+    basis  = BSplines( knots, degree, periodic )
+    spline = Spline1D( basis )
+    c_spl  = Spline1D( basis, np.complex128 )
+    interp = SplineInterpolator1D( basis )
+    c_int  = SplineInterpolator1D( basis, np.complex128 )
+
+    ug = np.random.random_sample( basis.nbasis ) + 1j*np.random.random_sample( basis.nbasis )
+
+    c_int.compute_interpolant( ug, c_spl )
+    interp.compute_interpolant( ug.real, spline )
+    assert np.allclose( c_spl.coeffs.real, spline.coeffs, rtol=1e-13, atol=1e-13 )
+    interp.compute_interpolant( ug.imag, spline )
+    assert np.allclose( c_spl.coeffs.imag, spline.coeffs, rtol=1e-13, atol=1e-13 )
+
+    # The interpolation conditions hold at the Greville points
+    mat = SplineInterpolator1D.collocation_matrix( knots, degree, basis.greville, periodic )
+    assert np.allclose( mat.dot( c_spl.coeffs[:basis.nbasis] ), ug, rtol=1e-13, atol=1e-13 )
+
+    # Several complex right hand sides at once
+    ug_lines = ug[None,:] * np.arange( 1, 4 )[:,None]
+    c_lines  = np.empty( (3, c_spl.coeffs.size), dtype=complex )
+    c_int.compute_interpolant_batch( ug_lines, c_lines )
+    assert np.allclose( c_lines, c_spl.coeffs[None,:] * np.arange( 1, 4 )[:,None],
+                        rtol=1e-13, atol=1e-13 )
+
+#===============================================================================
+@pytest.mark.serial
+@pytest.mark.parametrize( "n"        , [6,11,30] )
+@pytest.mark.parametrize( "bandwidth", [0,1,2] )
+@pytest.mark.parametrize( "periodic" , [True,False] )
+@pytest.mark.parametrize( "dtype"    , [float,complex] )
+
+def test_CyclicBandedSolver( n, bandwidth, periodic, dtype ):
+
+    # Diagonally dominant (cyclic) banded matrix whose largest entries
+    # are on the first super-diagonal
+    mat = np.zeros( (n,n) )
+    for i in range(n):
+        for d in range(-bandwidth,bandwidth+1):
+            j = i+1+d
+            if periodic:
+                mat[i,j%n] = np.random.random_sample()
+            elif 0 <= j < n:
+                mat[i,j] = np.random.random_sample()
+        mat[i,(i+1)%n] += 2*bandwidth+1
+    if not periodic:
+        mat[n-1,n-1] = 2*bandwidth+1
+
+    rows, cols = np.nonzero( mat )
+    solver = CyclicBandedSolver( n, rows, cols, mat[rows,cols], periodic )
+
+    b = np.random.random_sample( (n,4) ).astype( dtype )
+    if dtype is complex:
+        b += 1j*np.random.random_sample( (n,4) )
+
+    x = np.empty_like( b )
+    solver.solve( b, x )
+    assert np.allclose( mat.dot( x ), b, rtol=1e-12, atol=1e-12 )
+
+    # A single right hand side stored in a strided view
+    x = np.empty( (n,3), dtype=dtype )
+    solver.solve( b[:,1], x[:,2] )
+    assert np.allclose( mat.dot( x[:,2] ), b[:,1], rtol=1e-12, atol=1e-12 )
+
 #===============================================================================
 @pytest.mark.parametrize( "nc1", [1,5,10,23] )
 @pytest.mark.parametrize( "nc2", [1,5,10,23] )
@@ -124,6 +280,71 @@ def test_SplineInterpolator2D_exact( nc1, nc2, deg1, deg2 ):
     max_norm_err = np.max( abs( err ) )
     assert max_norm_err < 2.0e-14
 
+#===============================================================================
+@pytest.mark.serial
+@pytest.mark.parametrize( "nc1,nc2"  , [(5,8),(10,7)] )
+@pytest.mark.parametrize( "deg1,deg2", [(1,2),(3,3),(4,5)] )
+@pytest.mark.parametrize( "periodic1", [True,False] )
+@pytest.mark.parametrize( "periodic2", [True,False] )
+@pytest.mark.parametrize( "stack"    , [(),(3,),(2,3)] )
+
+def test_SplineInterpolator2D_batch( nc1, nc2, deg1, deg2, periodic1, periodic2, stack ):
+
+    basis1 = BSplines( make_knots( random_grid( [0.0,1.0], nc1, 0.0 ), deg1, periodic1 ), deg1, periodic1 )
+    basis2 = BSplines( make_knots( random_grid( [0.0,1.0], nc2, 0.0 ), deg2, periodic2 ), deg2, periodic2 )
+    n1, n2 = basis1.nbasis, basis2.nbasis
+
+    interp = SplineInterpolator2D( basis1, basis2 )
+
+    # The values are stored in a strided (transposed) view
+    ug     = np.random.random_sample( (n2,n1)+stack ).T
+    coeffs = np.empty( ug.shape[:-2]+Spline2D( basis1, basis2 ).coeffs.shape )
+    interp.compute_interpolant_batch( ug, coeffs )
+
+    # The interpolation conditions hold on each plane
+    mat1 = SplineInterpolator1D.collocation_matrix( basis1.knots, deg1, basis1.greville, periodic1 )
+    mat2 = SplineInterpolator1D.collocation_matrix( basis2.knots, deg2, basis2.greville, periodic2 )
+    vals = np.matmul( np.matmul( mat1, coeffs[...,:n1,:n2] ), mat2.T )
+    assert np.allclose( vals, ug, rtol=1e-12, atol=1e-12 )
+
+    # The periodic coefficients wrap around
+    if periodic1:
+        assert np.array_equal( coeffs[...,n1:,:], coeffs[...,:deg1,:] )
+    if periodic2:
+        assert np.array_equal( coeffs[...,:,n2:], coeffs[...,:,:deg2] )
+
+    # A single plane gives the same result as a Spline2D
+    spline = Spline2D( basis1, basis2 )
+    plane  = ug.reshape( (-1,n1,n2) )[-1]
+    interp.compute_interpolant( plane, spline )
+    assert np.allclose( spline.coeffs, coeffs.reshape( (-1,)+spline.coeffs.shape )[-1],
+                        rtol=1e-13, atol=1e-13 )
+
+#===============================================================================
+@pytest.mark.serial
+@pytest.mark.parametrize( "periodic1", [True,False] )
+@pytest.mark.parametrize( "periodic2", [True,False] )
+
+def test_SplineInterpolator2D_complex( periodic1, periodic2 ):
+
+    basis1 = BSplines( make_knots( random_grid( [0.0,1.0], 9, 0.0 ), 3, periodic1 ), 3, periodic1 )
+    basis2 = BSplines( make_knots( random_grid( [0.0,1.0], 7, 0.0 ), 2, periodic2 ), 2, periodic2 )
+
+    interp = SplineInterpolator2D( basis1, basis2, dtype=complex )
+    c_spl  = Spline2D( basis1, basis2, dtype=complex )
+    r_spl  = Spline2D( basis1, basis2 )
+    i_spl  = Spline2D( basis1, basis2 )
+
+    shape = (basis1.nbasis, basis2.nbasis)
+    ug    = np.random.random_sample( shape ) + 1j*np.random.random_sample( shape )
+
+    interp.compute_interpolant( ug, c_spl )
+    interp.compute_interpolant( ug.real, r_spl )
+    interp.compute_interpolant( ug.imag, i_spl )
+
+    assert np.allclose( c_spl.coeffs, r_spl.coeffs + 1j*i_spl.coeffs, rtol=1e-13, atol=1e-13 )
+    assert np.allclose( c_spl.eval( basis1.greville, basis2.greville ), ug, rtol=1e-12, atol=1e-12 )
+
 #===============================================================================
 @pytest.mark.parametrize( "ncells"   , [10,20,40,80,160] )
 @pytest.mark.parametrize( "degree"   , range(1,5)   )
@@ -4,7 +4,7 @@
 import pytest
 import numpy as np
 from itertools import product
-from ..splines import make_knots, BSplines, Spline1D, Spline2D
+from ..splines import make_knots, BSplines, Spline1D, Spline2D, SplineEvaluationPlan
 
 #===============================================================================
 def args_make_knots_periodic():
@@ -80,6 +80,49 @@ def test_Spline1D_unit( ncells, degree, periodic, npts=50, tol=1e-15 ):
 
     assert all( abs(1.0-f)<tol )
 
+#===============================================================================
+@pytest.mark.serial
+@pytest.mark.parametrize( "ncells,degree,periodic", args_BSplines() )
+@pytest.mark.parametrize( "der", [0,1] )
+def test_SplineEvaluationPlan( ncells, degree, periodic, der, npts=50, tol=1e-13 ):
+
+    breaks = np.linspace( 0.0, 1.0, ncells+1 )
+    knots  = make_knots( breaks, degree, periodic )
+    basis  = BSplines( knots, degree, periodic )
+    spline = Spline1D( basis )
+
+    x    = np.random.uniform( breaks[0], breaks[-1], npts ) # Test points
+    plan = SplineEvaluationPlan( basis, x, der )
+
+    coeffs = np.random.random_sample( (3, spline.coeffs.size, 2) )
+    f      = plan.eval( coeffs, axis=1 )
+    assert f.shape == (3, npts, 2)
+
+    for i,j in product( range(3), range(2) ):
+        spline.coeffs[:] = coeffs[i,:,j]
+        assert np.allclose( f[i,:,j], spline.eval( x, der ), rtol=tol, atol=tol )
+
+#===============================================================================
+@pytest.mark.serial
+@pytest.mark.parametrize( "ncells,degree,periodic", args_BSplines() )
+@pytest.mark.parametrize( "uniform", [True,False] )
+def test_BSplines_find_span( ncells, degree, periodic, uniform, npts=50 ):
+
+    breaks = np.linspace( 0.0, 1.0, ncells+1 )
+    if not uniform:
+        breaks[1:-1] += np.random.uniform( -0.3, 0.3, ncells-1 )/ncells
+    knots  = make_knots( breaks, degree, periodic )
+    basis  = BSplines( knots, degree, periodic )
+
+    assert basis.uniform == (uniform or ncells < 2)
+
+    # Test points include all the breakpoints
+    x     = np.concatenate( (breaks, np.random.uniform( 0.0, 1.0, npts )) )
+    cells = np.minimum( np.searchsorted( breaks, x, side='right' ) - 1, ncells-1 )
+
+    assert all( SplineEvaluationPlan( basis, x ).spans == cells + degree )
+    assert all( basis.find_cell( xi ) == c for xi,c in zip( x, cells ) )
+
 #===============================================================================
 def args_Spline2D_split():
     for ncells in [1,5,10,23]:
@@ -118,3 +161,56 @@ def test_Spline2D_unit( ncells, degree, periodic, npts=10, tol=1e-15 ):
     f  = spline.eval( x1, x2 )
 
     assert np.all( abs(1.0-f)<tol )
+
+#===============================================================================
+@pytest.mark.serial
+@pytest.mark.parametrize( "ncells,degree,periodic", [((5,8),(3,2),(True,False)),
+                                                      ((10,7),(1,4),(False,True)),
+                                                      ((6,6),(3,3),(True,True))] )
+@pytest.mark.parametrize( "der1,der2", [(0,0),(0,1),(1,0),(1,1)] )
+def test_Spline2D_complex( ncells, degree, periodic, der1, der2, npts=10, tol=1e-13 ):
+
+    bases = [BSplines( make_knots( np.linspace( 0.0, 1.0, n+1 ), d, P ), d, P )
+                for n,d,P in zip( ncells, degree, periodic )]
+
+    spline = Spline2D( *bases, dtype=complex )
+    real   = Spline2D( *bases )
+    imag   = Spline2D( *bases )
+    assert spline.coeffs.dtype == complex
+
+    real.coeffs[:] = np.random.random_sample( real.coeffs.shape )
+    imag.coeffs[:] = np.random.random_sample( imag.coeffs.shape )
+    spline.coeffs[:] = real.coeffs + 1j*imag.coeffs
+
+    x1 = np.linspace( 0.0, 1.0, npts ) # Test points
+    x2 = np.linspace( 0.0, 1.0, npts ) # Test points
+
+    f = spline.eval( x1, x2, der1, der2 )
+    assert f.dtype == complex
+    assert np.allclose( f, real.eval( x1, x2, der1, der2 ) + 1j*imag.eval( x1, x2, der1, der2 ),
+                        rtol=tol, atol=tol )
+
+    f = spline.eval( x1[3], x2[4], der1, der2 )
+    assert abs( f - real.eval( x1[3], x2[4], der1, der2 )
+                  - 1j*imag.eval( x1[3], x2[4], der1, der2 ) ) < tol
+
+#===============================================================================
+@pytest.mark.serial
+@pytest.mark.parametrize( "ncells,degree,periodic", args_Spline2D() )
+def test_Spline2D_eval_multi( ncells, degree, periodic, npts=20, tol=1e-13 ):
+
+    bases  = [BSplines( make_knots( np.linspace( 0.0, 1.0, n+1 ), d, P ), d, P )
+                for n,d,P in zip( ncells, degree, periodic )]
+    spline = Spline2D( *bases )
+    spline.coeffs[:] = np.random.random_sample( spline.coeffs.shape )
+
+    x1 = np.random.random_sample( npts ) # Scattered test points
+    x2 = np.random.random_sample( npts ) # Scattered test points
+
+    ders   = [(0,0),(0,1),(1,0),(1,1)]
+    result = spline.eval_multi( x1, x2, ders )
+    assert result.shape == (len(ders),npts)
+
+    for k,(der1,der2) in enumerate( ders ):
+        for i in range( npts ):
+            assert abs( result[k,i] - spline.eval( x1[i], x2[i], der1, der2 ) ) < tol
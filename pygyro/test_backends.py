@@ -0,0 +1,94 @@
+import os
+import types
+import numpy as np
+import pytest
+
+from .          import backends
+from .backends  import load_kernels, active_backends, FortranKernels
+
+@pytest.mark.serial
+def test_active_backends():
+    SEF = load_kernels('splines.spline_eval_funcs')
+    assert load_kernels('splines.spline_eval_funcs') is SEF
+
+    active = active_backends()
+    assert active['splines.spline_eval_funcs'] in ('python','numba','pyccel')
+    assert all(b in ('python','numba','pyccel') for b in active.values())
+
+@pytest.mark.serial
+def test_load_python(monkeypatch):
+    monkeypatch.setattr(backends,'_loaded',{})
+    monkeypatch.setattr(backends,'_active',{})
+    monkeypatch.setenv(backends.BACKEND_VARIABLE,'python')
+
+    SEF = load_kernels('splines.spline_eval_funcs')
+    assert os.path.splitext(SEF.__file__)[1]=='.py'
+    assert active_backends() == {'splines.spline_eval_funcs': 'python'}
+
+@pytest.mark.serial
+def test_unavailable_backend(monkeypatch):
+    detected = active_backends().get('splines.spline_eval_funcs',None)
+    if (detected is None):
+        load_kernels('splines.spline_eval_funcs')
+        detected = active_backends()['splines.spline_eval_funcs']
+    requested = 'pyccel' if detected=='numba' else 'numba'
+
+    monkeypatch.setattr(backends,'_loaded',{})
+    monkeypatch.setattr(backends,'_active',{})
+    monkeypatch.setenv(backends.BACKEND_VARIABLE,requested)
+    with pytest.raises(ImportError):
+        load_kernels('splines.spline_eval_funcs')
+
+    monkeypatch.setenv(backends.BACKEND_VARIABLE,'cuda')
+    with pytest.raises(ValueError):
+        load_kernels('splines.spline_eval_funcs')
+
+@pytest.mark.serial
+def test_FortranKernels():
+    class FortranModule:
+        @staticmethod
+        def kernel( x, a, n, b=None ):
+            return x.flags['C_CONTIGUOUS'], a.flags['F_CONTIGUOUS'], a.shape, b.shape
+
+    kernels = FortranKernels(FortranModule)
+
+    x = np.empty(5)
+    a = np.empty((2,3,4))
+    assert kernels.kernel(x,a,2,b=a) == (True,True,(4,3,2),(4,3,2))
+    assert kernels.kernel is kernels.kernel
+
+@pytest.mark.serial
+def test_FortranKernels_signature():
+    def kernel( x, a, n, b=None ):
+        """kernel(x,a,n,b,[n0_x,n0_a,n1_a,n0_b,n1_b])
+
+        Parameters
+        ----------
+        x : input rank-1 array('d') with bounds (n0_x)
+        a : input rank-2 array('d') with bounds (n0_a,n1_a)
+        n : input int
+        b : in/output rank-2 array('d') with bounds (n0_b,n1_b)
+        """
+        return x.flags['C_CONTIGUOUS'], a.flags['F_CONTIGUOUS'], a.shape, b.shape
+
+    def vector( x, n ):
+        """vector(x,n,[n0_x])
+
+        Parameters
+        ----------
+        x : input rank-1 array('d') with bounds (n0_x)
+        n : input int
+        """
+        return x.shape
+
+    FortranModule = types.SimpleNamespace(kernel=kernel,vector=vector)
+    kernels = FortranKernels(FortranModule)
+
+    x = np.empty(5)
+    a = np.empty((2,3))
+    assert kernels.kernel(x,a,2,b=a) == (True,True,(3,2),(3,2))
+    assert kernels.kernel(x,a,2,a)   == (True,True,(3,2),(3,2))
+
+    # Functions without multi-dimensional arrays are not wrapped
+    assert kernels.vector is vector
+    assert kernels.raw is FortranModule